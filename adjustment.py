@@ -0,0 +1,115 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+本地复权计算
+只下载不复权K线和分红送转表，前复权/后复权在本地用一次累乘计算：
+- 每个除权日的除权因子 f = (前收 - 每股派现) / ((1 + 每股送转) * 前收)
+- 前复权价格 = 原价 × 该K线之后所有除权因子之积（最新价格不变）
+- 后复权价格 = 原价 ÷ 该K线及之前所有除权因子之积（以所取K线的第一根为基准）
+成交量不做调整
+"""
+import numpy as np
+
+from bar_store import array_to_bars, bars_to_array, day_number
+
+# 复权方式 -> 显示名称
+ADJUST_MODES = {
+    'none': '不复权',
+    'qfq': '前复权',
+    'hfq': '后复权'
+}
+
+# 除权事件：除权除息日（1970-01-01起的天数）、每股派现、每股送转
+ACTION_DTYPE = np.dtype([
+    ('day', '<i8'),
+    ('cash', '<f8'),
+    ('ratio', '<f8')
+])
+
+
+def actions_from_rows(rows):
+    """
+    东方财富分红送转明细（RPT_SHAREBONUS_DET）转换为除权事件数组（按除权日排序）
+    PRETAX_BONUS_RMB 为每10股税前派现，BONUS_IT_RATIO 为每10股送转股数；没有除权日的（未实施）跳过
+    """
+    events = []
+    for row in rows:
+        ex_date = row.get('EX_DIVIDEND_DATE')
+        if not ex_date:
+            continue
+        cash = float(row.get('PRETAX_BONUS_RMB') or 0) / 10
+        ratio = float(row.get('BONUS_IT_RATIO') or 0) / 10
+        if cash or ratio:
+            events.append((day_number(ex_date), cash, ratio))
+    
+    actions = np.array(events, dtype=ACTION_DTYPE)
+    actions.sort(order='day', kind='stable')
+    return actions
+
+
+def event_factors(days, closes, actions):
+    """
+    每根K线的除权因子：除权日（停牌时为其后第一个交易日）的K线为 f，其余为1
+    除权日在第一根K线之前（没有前收）或在最后一根之后（尚未生效）的事件忽略
+    """
+    factors = np.ones(len(days))
+    if len(actions) == 0 or len(days) < 2:
+        return factors
+    
+    index = np.searchsorted(days, actions['day'])
+    valid = (index > 0) & (index < len(days))
+    index = index[valid]
+    cash, ratio = actions['cash'][valid], actions['ratio'][valid]
+    
+    previous = closes[index - 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = (previous - cash) / ((1 + ratio) * previous)
+    factor = np.where((previous > 0) & (factor > 0), factor, 1.0)
+    
+    # 同一天可能有多条事件（例如同时派现和送转分两行公布）
+    np.multiply.at(factors, index, factor)
+    return factors
+
+
+def price_multipliers(factors, mode):
+    """由除权因子计算每根K线的价格乘数（一次累乘）"""
+    if mode == 'none' or len(factors) == 0:
+        return np.ones(len(factors))
+    
+    cumulative = np.cumprod(factors)
+    if mode == 'qfq':
+        return cumulative[-1] / cumulative
+    if mode == 'hfq':
+        return 1.0 / cumulative
+    raise ValueError(f"不支持的复权方式: {mode}")
+
+
+def adjust_array(array, actions, mode):
+    """复权结构化K线数组（BAR_DTYPE），返回新数组"""
+    adjusted = array.copy()
+    if mode == 'none' or len(array) == 0:
+        return adjusted
+    
+    multipliers = price_multipliers(event_factors(array['day'], array['close'], actions), mode)
+    for field in ('open', 'high', 'low', 'close'):
+        adjusted[field] = np.round(array[field] * multipliers, 4)
+    return adjusted
+
+
+def adjust_kline(bars, actions, mode):
+    """复权K线字典列表，返回新的字典列表；不复权或没有除权事件时原样返回"""
+    if mode == 'none' or actions is None or len(actions) == 0 or not bars:
+        return bars
+    return array_to_bars(adjust_array(bars_to_array(bars), actions, mode))
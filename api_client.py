@@ -16,31 +16,250 @@
 东方财富API客户端
 支持获取股票实时行情和历史K线数据
 """
-import requests
 import json
-from datetime import datetime, timedelta
-import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from urllib.parse import urlparse
+from resilience import ResilienceManager, CircuitOpenError
+from futures_registry import FuturesRegistry
+from adjustment import ACTION_DTYPE, actions_from_rows, adjust_kline
+from bar_store import BAR_DTYPE, BarSeries, array_to_bars
+from trading_calendar import calendar_name, get_calendar
+from metrics import HTTP_LATENCY, HTTP_BYTES, HTTP_ERRORS, PARSE_TIME, TRACER
+
+
+# 东方财富历史K线接口：fields2 依次为 日期、开盘、收盘、最高、最低、成交量
+KLINE_URL = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
+KLINE_FIELDS1 = 'f1,f2,f3,f4,f5,f6'
+KLINE_FIELDS2 = 'f51,f52,f53,f54,f55,f56'
+
+# 东方财富美股市场ID：纳斯达克、纽交所、美国交易所
+US_MARKET_IDS = ('105', '106', '107')
+
+# 东方财富分时接口
+INTRADAY_URL = "http://push2his.eastmoney.com/api/qt/stock/trends2/get"
+
+
+def parse_klines(content):
+    """
+    解析东方财富历史K线响应，直接写入列式的结构化数组（bar_store.BAR_DTYPE）
+    klines 为 "日期,开盘,收盘,最高,最低,成交量" 字符串列表：数值部分拼接后一次转换为浮点矩阵，
+    日期一次转换为datetime64，不为每根K线创建字典
+    没有数据时返回None
+    """
+    data = json.loads(content).get('data') or {}
+    klines = data.get('klines')
+    if not klines:
+        return None
+    
+    dates = [line[:10] for line in klines]
+    values = np.array(','.join(line[11:] for line in klines).split(','), dtype=np.float64)
+    values = values.reshape(len(klines), -1)
+    
+    bars = np.empty(len(klines), dtype=BAR_DTYPE)
+    bars['day'] = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    bars['open'] = values[:, 0]
+    bars['close'] = values[:, 1]
+    bars['high'] = values[:, 2]
+    bars['low'] = values[:, 3]
+    bars['volume'] = values[:, 4]
+    return bars
+
+
+class KLineSeries(list):
+    """K线数据列表，附带数据来源和新鲜度信息"""
+    
+    def __init__(self, bars=(), source=None, fetched_at=None, stale=False, error=None, adjust='none'):
+        super().__init__(bars)
+        self.source = source  # 数据来源：eastmoney 等
+        self.fetched_at = fetched_at  # 从上游获取的时间戳
+        self.stale = stale  # 是否为过期的缓存数据
+        self.error = error  # 上游异常信息（降级时非空）
+        self.adjust = adjust  # 复权方式：none / qfq / hfq
+    
+    @property
+    def age(self):
+        """数据年龄（秒）"""
+        if self.fetched_at is None:
+            return None
+        return time.time() - self.fetched_at
+    
+    @property
+    def degraded(self):
+        """上游异常，返回的是缓存数据或空数据"""
+        return self.error is not None
+    
+    def copy(self, **changes):
+        """复制数据，可同时修改新鲜度信息"""
+        fields = {'source': self.source, 'fetched_at': self.fetched_at,
+                  'stale': self.stale, 'error': self.error, 'adjust': self.adjust}
+        fields.update(changes)
+        return KLineSeries(self, **fields)
+    
+    def tail(self, n):
+        """最近n条K线（保留新鲜度信息）"""
+        result = self.copy()
+        del result[:-n]
+        return result
+    
+    def freshness(self):
+        """新鲜度信息字典"""
+        return {'source': self.source, 'fetched_at': self.fetched_at, 'age': self.age,
+                'stale': self.stale, 'error': self.error}
+
+
+def merge_kline(old, new):
+    """
+    合并两段K线：new覆盖old中相同及之后的日期，保留old中更早的部分
+    按天数二分查找截取（BarSeries），不逐条比较日期字符串
+    """
+    if not old or not new:
+        return new
+    new_series = BarSeries.from_bars(new)
+    if not len(new_series):
+        return new
+    merged_series = BarSeries.from_bars(old).slice(end=int(new_series.days[0]) - 1).merge(new_series)
+    merged = new.copy()
+    merged[:] = merged_series.to_bars()
+    return merged
+
+
+class _InFlightCall:
+    """一次进行中的上游请求"""
+    
+    def __init__(self, size):
+        self.size = size
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求：同一个key同时只发起一次上游请求，其余调用方等待并共享结果。
+    带size的请求（如K线天数）可以由进行中的更大窗口请求满足，结果经slicer截取。
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> [_InFlightCall, ...]
+        self.shared_count = 0  # 被合并（未发起上游请求）的调用次数
+    
+    def do(self, key, fn, size=None, slicer=None):
+        """执行fn，或等待进行中的同key请求"""
+        with self._lock:
+            calls = self._calls.setdefault(key, [])
+            call = None
+            for existing in calls:
+                if size is None or (existing.size is not None and existing.size >= size):
+                    call = existing
+                    break
+            
+            leader = call is None
+            if leader:
+                call = _InFlightCall(size)
+                calls.append(call)
+            else:
+                self.shared_count += 1
+        
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    calls = self._calls.get(key, [])
+                    if call in calls:
+                        calls.remove(call)
+                    if not calls:
+                        self._calls.pop(key, None)
+                call.event.set()
+        else:
+            call.event.wait()
+        
+        if call.error is not None:
+            raise call.error
+        
+        result = call.result
+        if slicer and result is not None and size is not None and call.size != size:
+            return slicer(result, size)
+        if isinstance(result, (list, dict)):
+            return result.copy()
+        return result
+
 
 class NetEaseFinanceAPI:
     """财经API客户端类（使用东方财富API）"""
     
-    def __init__(self):
+    def __init__(self, upstream=None):
+        # 上游地址覆盖（例如 http://127.0.0.1:8000）：所有请求保留路径和参数，发往该地址（离线测试桩）
+        self.upstream = upstream.rstrip('/') if upstream else None
+        
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Referer': 'http://quote.eastmoney.com/'
         }
         
-        # 期货代码映射表 (用户代码 -> (市场ID, 东方财富代码, 名称))
-        self.futures_map = {
-            'XAUUSD': ('122', 'XAU', '黄金/美元'),
-            'XAU': ('122', 'XAU', '黄金/美元'),
-            'XAGUSD': ('122', 'XAG', '白银/美元'),
-            'XAG': ('122', 'XAG', '白银/美元'),
-            'CL': ('113', 'cl', 'WTI原油'),
-            'NG': ('113', 'ng', '天然气'),
-            'GC': ('113', 'gc', 'COMEX黄金'),
-            'SI': ('113', 'si', 'COMEX白银')
-        }
+        # 期货合约注册表（用户代码 -> 东方财富secid / 新浪代码 / 名称）
+        self.futures = FuturesRegistry(self)
+        
+        # 本地证券代码索引（由界面设置），用于确定美股所在的交易所
+        self.symbol_index = None
+        # 美股代码 -> 东方财富市场ID，由代码索引查到或逐个尝试取得数据后记住
+        self._us_market_ids = {}
+        
+        # 合并并发的相同请求
+        self.single_flight = SingleFlight()
+        
+        # 按上游主机的延迟统计、对冲请求和熔断
+        self.resilience = ResilienceManager()
+        
+        # 最近一次成功获取的数据：key -> 行情字典 / KLineSeries
+        self._last_good = {}
+        self._last_good_lock = threading.Lock()
+        # 正在后台重新验证的key
+        self._revalidating = set()
+        
+        # 缓存数据的新鲜期（秒），超过后视为过期，需要重新获取
+        self.realtime_ttl = 5
+        self.kline_ttl = 300
+        
+        # 分红送转表缓存：(代码, 市场) -> (获取时间, 除权事件数组)，新的除权事件很少，缓存较长时间
+        self._actions = {}
+        self.actions_ttl = 6 * 3600
+    
+    def _http_get(self, url, params, endpoint, timeout):
+        """
+        经容错层发起GET请求（熔断时立即抛出CircuitOpenError）
+        endpoint: 接口名称，用于指标和链路追踪
+        """
+        if self.upstream:
+            url = self.upstream + urlparse(url).path
+        
+        with TRACER.span('http', endpoint=endpoint, host=urlparse(url).netloc):
+            start = time.perf_counter()
+            try:
+                response = self.resilience.get(url, params=params, headers=self.headers, timeout=timeout)
+            except CircuitOpenError:
+                HTTP_ERRORS.inc(endpoint=endpoint, reason='circuit_open')
+                raise
+            except Exception as e:
+                HTTP_ERRORS.inc(endpoint=endpoint, reason=type(e).__name__)
+                raise
+            
+            HTTP_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+            HTTP_BYTES.inc(len(response.content), endpoint=endpoint)
+            if response.status_code != 200:
+                HTTP_ERRORS.inc(endpoint=endpoint, reason=f'http_{response.status_code}')
+            return response
+    
+    def get_resilience_stats(self):
+        """各上游主机的熔断状态、延迟分位数和对冲命中率"""
+        return self.resilience.stats()
     
     def get_eastmoney_code(self, code, market):
         """
@@ -59,32 +278,169 @@ class NetEaseFinanceAPI:
             # 深证：0.代码
             return f'0.{code}'
         elif market == 'us':
-            # 美股：105.代码
-            return f'105.{code.upper()}'
+            # 美股：市场ID.代码（纳斯达克105、纽交所106、美国交易所107）
+            return f'{self.us_market_id(code)}.{code.upper()}'
         elif market == 'hf':
-            # 期货：使用映射表
-            code_upper = code.upper()
-            if code_upper in self.futures_map:
-                market_id, real_code, _ = self.futures_map[code_upper]
-                return f'{market_id}.{real_code}'
+            # 期货：使用合约注册表
+            contract = self.futures.resolve(code)
+            if contract:
+                return contract.secid
             return f'113.{code.lower()}'
         else:
             return f'1.{code}'
     
+    def us_market_id(self, code):
+        """美股代码所在交易所的东方财富市场ID，未知时为纳斯达克"""
+        code = code.upper()
+        market_id = self._us_market_ids.get(code)
+        if market_id is None and self.symbol_index is not None and self.symbol_index.ready:
+            found = self.symbol_index.lookup(code, 'us')
+            if found:
+                market_id = self._us_market_ids[code] = found['secid'].split('.', 1)[0]
+        return market_id or US_MARKET_IDS[0]
+    
+    def get_calendar(self, code, market):
+        """品种所属市场的交易日历（期货按东方财富市场ID区分国内和国际）"""
+        secid = self.get_eastmoney_code(code, market) if market.lower() == 'hf' else None
+        return get_calendar(calendar_name(market, secid))
+    
     def get_futures_name(self, code):
         """获取期货中文名称"""
-        code_upper = code.upper()
-        if code_upper in self.futures_map:
-            _, _, name = self.futures_map[code_upper]
-            return name
+        contract = self.futures.resolve(code)
+        if contract:
+            return contract.name
         return code
     
-    def get_realtime_data(self, code, market='sh'):
+    def get_security_list_page(self, fs, fields='f12,f13,f14', page=1, page_size=100):
+        """
+        获取东方财富证券列表的一页（按代码排序，页与页之间可以并行获取）
+        fs: 东方财富市场过滤串，例如 'm:1+t:2,m:1+t:23'
+        fields: 需要返回的字段
+        返回: (行列表, 总行数)
+        """
+        url = "http://push2.eastmoney.com/api/qt/clist/get"
+        params = {
+            'pn': page,
+            'pz': page_size,
+            'po': 1,
+            'np': 1,
+            'fltt': 2,
+            'invt': 2,
+            'fid': 'f12',
+            'fs': fs,
+            'fields': fields,
+            'ut': 'bd1d9ddb04089700cf9c27f6f7426281'
+        }
+        
+        response = self._http_get(url, params, endpoint='security_list', timeout=10)
+        response.raise_for_status()
+        with PARSE_TIME.time(kind='security_list'):
+            data = response.json().get('data') or {}
+        return data.get('diff') or [], data.get('total', 0)
+    
+    def get_security_list(self, fs, fields='f12,f13,f14', page_size=100):
+        """
+        分页获取东方财富证券列表（逐页产出原始行）
+        fs: 东方财富市场过滤串，例如 'm:1+t:2,m:1+t:23'
+        fields: 需要返回的字段
+        """
+        page = 1
+        
+        while True:
+            rows, total = self.get_security_list_page(fs, fields, page, page_size)
+            
+            for row in rows:
+                yield row
+            
+            if not rows or page * page_size >= total:
+                break
+            page += 1
+    
+    def _get_last_good(self, key):
+        with self._last_good_lock:
+            return self._last_good.get(key)
+    
+    def _set_last_good(self, key, data):
+        with self._last_good_lock:
+            if isinstance(data, KLineSeries):
+                data = merge_kline(self._last_good.get(key), data)
+            self._last_good[key] = data
+    
+    def _revalidate(self, key, loader, on_update=None):
+        """在后台重新获取数据，完成后调用on_update(新数据)"""
+        with self._last_good_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        
+        def run():
+            try:
+                data = loader()
+            finally:
+                with self._last_good_lock:
+                    self._revalidating.discard(key)
+            if on_update and data and not self._is_degraded(data):
+                on_update(data)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    @staticmethod
+    def _is_degraded(data):
+        if isinstance(data, KLineSeries):
+            return data.degraded
+        return bool(data.get('degraded'))
+    
+    @staticmethod
+    def _quote_with_freshness(data, stale=False, error=None):
+        """为行情数据附加新鲜度信息"""
+        data = dict(data)
+        data['age'] = time.time() - data['fetched_at']
+        data['stale'] = stale
+        data['degraded'] = error is not None
+        data['error'] = error
+        return data
+    
+    def get_realtime_data(self, code, market='sh', swr=False, on_update=None):
         """
-        获取实时行情数据
+        获取实时行情数据（并发的相同请求只发起一次）
         code: 股票代码
         market: 市场类型
+        swr: 为True时若有缓存则立即返回缓存，过期的缓存在后台重新获取，完成后调用on_update
+        返回的字典附带 source / fetched_at / age / stale / degraded 字段；
+        上游失败时返回最近一次成功的数据（标记为过期），从未成功过则返回None
         """
+        key = ('realtime', code.upper(), market.lower())
+        cached = self._get_last_good(key)
+        
+        if swr and cached:
+            # 休市期间收盘后获取的行情不会再变化，不需要重新获取
+            stale = (time.time() - cached['fetched_at'] > self.realtime_ttl and
+                     self.get_calendar(code, market).has_traded_since(cached['fetched_at']))
+            if stale:
+                self._revalidate(key, lambda: self._load_realtime(key, code, market), on_update)
+            return self._quote_with_freshness(cached, stale=stale)
+        
+        return self._load_realtime(key, code, market)
+    
+    def _load_realtime(self, key, code, market):
+        """从上游获取实时行情，失败时降级为缓存数据"""
+        def fetch():
+            data = self._fetch_realtime_data(code, market)
+            if data:
+                self._set_last_good(key, data)
+            return data
+        
+        data = self.single_flight.do(key, fetch)
+        if data:
+            return self._quote_with_freshness(data)
+        
+        cached = self._get_last_good(key)
+        if cached:
+            return self._quote_with_freshness(cached, stale=True, error='上游请求失败')
+        return None
+    
+    def _fetch_realtime_data(self, code, market='sh'):
+        """从东方财富获取实时行情数据"""
         try:
             market = market.lower()
             
@@ -100,57 +456,64 @@ class NetEaseFinanceAPI:
                 'cb': 'jQuery'
             }
             
-            response = requests.get(url, params=params, headers=self.headers, timeout=5)
+            response = self._http_get(url, params, endpoint='realtime', timeout=5)
             
-            if response.status_code == 200:
-                text = response.text
-                # 移除jQuery回调函数包装
-                if text.startswith('jQuery'):
-                    text = text[text.index('(') + 1:text.rindex(')')]
-                
-                data = json.loads(text)
-                
-                if data.get('data'):
-                    stock_data = data['data']
-                    
-                    # 获取字段值
-                    name = stock_data.get('f58', '')  # 名称
-                    
-                    # 如果是期货且名称为空，使用映射表中的名称
-                    if not name and market == 'hf':
-                        name = self.get_futures_name(code)
-                    
-                    price = stock_data.get('f43', 0) / 100  # 最新价（需要除以100）
-                    yestclose = stock_data.get('f60', 0) / 100  # 昨收
-                    open_price = stock_data.get('f46', 0) / 100  # 开盘
-                    high = stock_data.get('f44', 0) / 100  # 最高
-                    low = stock_data.get('f45', 0) / 100  # 最低
-                    volume = stock_data.get('f47', 0)  # 成交量（手）
-                    turnover = stock_data.get('f48', 0)  # 成交额（元）
-                    percent = stock_data.get('f170', 0) / 100  # 涨跌幅
+            with PARSE_TIME.time(kind='realtime'), TRACER.span('parse', kind='realtime'):
+                if response.status_code == 200:
+                    text = response.text
+                    # 移除jQuery回调函数包装
+                    if text.startswith('jQuery'):
+                        text = text[text.index('(') + 1:text.rindex(')')]
                     
-                    # 计算涨跌额
-                    updown = price - yestclose
+                    data = json.loads(text)
                     
-                    # 获取时间
-                    time_str = datetime.now().strftime('%H:%M:%S')
-                    
-                    return {
-                        'code': code,
-                        'name': name,
-                        'price': price,
-                        'percent': percent,
-                        'updown': updown,
-                        'open': open_price,
-                        'high': high,
-                        'low': low,
-                        'yestclose': yestclose,
-                        'volume': volume * 100,  # 转换为股
-                        'turnover': turnover,
-                        'time': time_str,
-                        'market': market
-                    }
+                    if data.get('data'):
+                        stock_data = data['data']
+                        
+                        # 获取字段值
+                        name = stock_data.get('f58', '')  # 名称
+                        
+                        # 如果是期货且名称为空，使用映射表中的名称
+                        if not name and market == 'hf':
+                            name = self.get_futures_name(code)
+                        
+                        price = stock_data.get('f43', 0) / 100  # 最新价（需要除以100）
+                        yestclose = stock_data.get('f60', 0) / 100  # 昨收
+                        open_price = stock_data.get('f46', 0) / 100  # 开盘
+                        high = stock_data.get('f44', 0) / 100  # 最高
+                        low = stock_data.get('f45', 0) / 100  # 最低
+                        volume = stock_data.get('f47', 0)  # 成交量（手）
+                        turnover = stock_data.get('f48', 0)  # 成交额（元）
+                        percent = stock_data.get('f170', 0) / 100  # 涨跌幅
+                        
+                        # 计算涨跌额
+                        updown = price - yestclose
+                        
+                        # 获取时间
+                        fetched_at = time.time()
+                        time_str = datetime.fromtimestamp(fetched_at).strftime('%H:%M:%S')
+                        
+                        return {
+                            'code': code,
+                            'name': name,
+                            'price': price,
+                            'percent': percent,
+                            'updown': updown,
+                            'open': open_price,
+                            'high': high,
+                            'low': low,
+                            'yestclose': yestclose,
+                            'volume': volume * 100,  # 转换为股
+                            'turnover': turnover,
+                            'time': time_str,
+                            'market': market,
+                            'source': 'eastmoney',
+                            'fetched_at': fetched_at
+                        }
             
+            return None
+        except CircuitOpenError as e:
+            print(f"获取实时数据失败: {e}")
             return None
         except Exception as e:
             print(f"获取实时数据失败: {e}")
@@ -158,235 +521,267 @@ class NetEaseFinanceAPI:
             traceback.print_exc()
             return None
     
-    def get_kline_data(self, code, market='sh', days=30):
+    def get_kline_data(self, code, market='sh', days=30, swr=False, on_update=None, adjust='none'):
         """
-        获取K线数据
+        获取K线数据（并发的相同请求只发起一次，较小窗口复用进行中的较大窗口）
         code: 股票代码
         market: 市场类型
         days: 获取天数
+        swr: 为True时若有足够的缓存则立即返回缓存，过期的缓存在后台重新获取，完成后调用on_update
+        adjust: 复权方式 none / qfq / hfq；缓存的始终是不复权K线，复权在本地计算，切换复权方式不需要请求网络
+        返回KLineSeries（带来源和新鲜度信息）；上游失败时返回缓存数据（标记为过期），
+        没有缓存时返回空的KLineSeries，不再返回模拟数据
         """
+        key = ('kline', code.upper(), market.lower())
+        cached = self._get_last_good(key)
+        
+        if adjust != 'none' and on_update:
+            raw_update = on_update
+            on_update = lambda series: raw_update(self.adjust_kline(series, code, market, adjust))
+        
+        if swr and cached and len(cached) >= days:
+            stale = cached.age > self.kline_ttl and self.get_calendar(code, market).has_traded_since(cached.fetched_at)
+            if stale:
+                self._revalidate(key, lambda: self._load_kline(key, code, market, days), on_update)
+            return self.adjust_kline(cached.tail(days).copy(stale=stale), code, market, adjust)
+        
+        return self.adjust_kline(self._load_kline(key, code, market, days), code, market, adjust)
+    
+    def adjust_kline(self, series, code, market, adjust):
+        """
+        在本地复权不复权的K线（使用缓存的分红送转表）
+        分红送转表获取失败时返回不复权数据（adjust为'none'）
+        """
+        if adjust == 'none' or not series:
+            return series
+        
+        actions = self.get_corporate_actions(code, market)
+        if actions is None:
+            print(f"警告: 无法获取 {code} 的分红送转数据，显示不复权K线")
+            return series.copy(adjust='none')
+        
+        result = series.copy(adjust=adjust)
+        result[:] = adjust_kline(series, actions, adjust)
+        return result
+    
+    def get_corporate_actions(self, code, market='sh'):
+        """
+        获取分红送转表（除权事件数组，见 adjustment.ACTION_DTYPE），缓存actions_ttl秒
+        只有A股个股有除权事件，指数和其他市场返回空数组；获取失败时返回过期的缓存，从未成功过则返回None
+        """
+        market = market.lower()
+        if market not in ('sh', 'sz') or self.is_index(code, market):
+            return np.empty(0, dtype=ACTION_DTYPE)
+        
+        key = (code.upper(), market)
+        cached = self._actions.get(key)
+        if cached and time.time() - cached[0] < self.actions_ttl:
+            return cached[1]
+        
+        def fetch():
+            actions = self._fetch_corporate_actions(code, market)
+            if actions is not None:
+                self._actions[key] = (time.time(), actions)
+            return actions
+        
+        actions = self.single_flight.do(('actions',) + key, fetch)
+        if actions is not None:
+            return actions
+        return cached[1] if cached else None
+    
+    @staticmethod
+    def is_index(code, market):
+        """沪深指数代码（上证000开头、深证399开头），指数没有分红送转"""
+        market = market.lower()
+        return (market == 'sh' and code.startswith('000')) or (market == 'sz' and code.startswith('399'))
+    
+    def _fetch_corporate_actions(self, code, market):
+        """从东方财富数据中心获取分红送转明细，按带市场后缀的代码（如 000001.SZ）过滤，失败返回None"""
         try:
-            market = market.lower()
-            
-            # 期货市场使用新浪全球期货API
-            if market == 'hf':
-                return self._get_futures_kline(code, days)
-            
-            # A股使用腾讯财经API
-            if market == 'sh':
-                stock_code = f'sh{code}'
-            elif market == 'sz':
-                stock_code = f'sz{code}'
-            else:
-                # 美股暂时使用模拟数据
-                print(f"警告: {market}市场暂不支持K线数据，使用模拟数据")
-                return self._generate_mock_kline_data(days)
-            
-            # 腾讯财经K线数据API
-            url = f"http://web.ifzq.gtimg.cn/appstock/app/fqkline/get"
+            url = "https://datacenter-web.eastmoney.com/api/data/v1/get"
             params = {
-                'param': f'{stock_code},day,,,{days},'
+                'reportName': 'RPT_SHAREBONUS_DET',
+                'columns': 'SECUCODE,SECURITY_CODE,EX_DIVIDEND_DATE,PRETAX_BONUS_RMB,BONUS_IT_RATIO',
+                'filter': f'(SECUCODE="{code}.{market.upper()}")',
+                'pageNumber': 1,
+                'pageSize': 500,
+                'sortColumns': 'EX_DIVIDEND_DATE',
+                'sortTypes': -1,
+                'source': 'WEB',
+                'client': 'WEB'
             }
             
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
+            response = self._http_get(url, params, endpoint='corporate_actions', timeout=10)
+            if response.status_code != 200:
+                return None
             
-            if response.status_code == 200:
+            with PARSE_TIME.time(kind='corporate_actions'):
                 data = response.json()
-                
-                if data.get('code') == 0 and data.get('data'):
-                    # 获取股票代码的数据
-                    stock_data = data['data'].get(stock_code)
-                    
-                    if stock_data and 'day' in stock_data:
-                        klines = stock_data['day']
-                        kline_list = []
-                        
-                        for kline in klines:
-                            # 格式：[日期, 开盘, 收盘, 最高, 最低, 成交量]
-                            if len(kline) >= 6:
-                                kline_list.append({
-                                    'date': kline[0],  # 日期
-                                    'open': float(kline[1]),  # 开盘价
-                                    'close': float(kline[2]),  # 收盘价
-                                    'high': float(kline[3]),  # 最高价
-                                    'low': float(kline[4]),  # 最低价
-                                    'volume': float(kline[5])  # 成交量
-                                })
-                        
-                        if kline_list:
-                            return kline_list
-            
-            # 如果获取失败，返回模拟数据
-            print(f"警告: 无法获取K线数据，使用模拟数据")
-            return self._generate_mock_kline_data(days)
-            
+                # 没有分红送转记录时result为空
+                rows = (data.get('result') or {}).get('data') or []
+                return actions_from_rows(rows)
+        except CircuitOpenError as e:
+            print(f"获取分红送转数据失败: {e}")
+            return None
         except Exception as e:
-            print(f"获取K线数据失败: {e}")
-            import traceback
-            traceback.print_exc()
-            return self._generate_mock_kline_data(days)
+            print(f"获取分红送转数据失败: {e}")
+            return None
     
-    def _get_futures_kline(self, code, days=30):
+    def get_kline_history(self, code, market='sh', days=1250):
         """
-        获取期货K线数据（使用新浪全球期货API）
+        直接从上游获取不复权K线（用于批量回填），不读写内存缓存、不降级为缓存数据
+        返回结构化数组（bar_store.BAR_DTYPE），失败返回None
         """
+        bars = self._fetch_kline_array(code, market, days)
+        if bars is None or len(bars) == 0:
+            return None
+        return bars
+    
+    def get_kline_batch(self, symbols, days=30, max_workers=8):
+        """
+        并行获取多个品种的K线（共用连接池、缓存和合并请求）
+        symbols: [(市场, 代码), ...]
+        返回: (市场, 代码) -> KLineSeries
+        """
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kline-batch') as pool:
+            futures = {symbol: pool.submit(self.get_kline_data, symbol[1], symbol[0], days)
+                       for symbol in symbols}
+            return {symbol: future.result() for symbol, future in futures.items()}
+    
+    def _load_kline(self, key, code, market, days):
+        """从上游获取K线，失败时降级为缓存数据"""
+        def fetch():
+            series = self._fetch_kline_data(code, market, days)
+            if series:
+                self._set_last_good(key, series)
+            return series
+        
+        series = self.single_flight.do(key, fetch, size=days, slicer=lambda bars, n: bars.tail(n))
+        if series:
+            return series
+        
+        cached = self._get_last_good(key)
+        if cached:
+            return cached.tail(days).copy(stale=True, error='上游请求失败')
+        return KLineSeries(stale=True, error='上游请求失败')
+    
+    def _fetch_kline_data(self, code, market='sh', days=30):
+        """从上游获取K线数据，失败返回None"""
+        bars = self._fetch_kline_array(code, market, days)
+        if bars is None or len(bars) == 0:
+            return None
+        return KLineSeries(array_to_bars(bars), source='eastmoney', fetched_at=time.time())
+    
+    def _fetch_kline_array(self, code, market='sh', days=30):
+        """
+        从东方财富历史K线接口获取不复权日K线（沪深、美股、期货使用同一个接口，secid见get_eastmoney_code）
+        返回结构化数组（bar_store.BAR_DTYPE），失败返回None
+        """
+        secid = self.get_eastmoney_code(code, market)
+        if market.lower() != 'us' or code.upper() in self._us_market_ids:
+            return self._fetch_kline_secid(secid, days)
+        
+        # 美股交易所未知（代码索引尚未加载或没有该代码）：依次尝试各交易所，取得数据后记住
+        bars = None
+        for market_id in US_MARKET_IDS:
+            bars = self._fetch_kline_secid(f'{market_id}.{code.upper()}', days)
+            if bars is not None and len(bars):
+                self._us_market_ids[code.upper()] = market_id
+                break
+        return bars
+    
+    def _fetch_kline_secid(self, secid, days):
+        """按东方财富secid获取不复权日K线，失败返回None"""
         try:
-            # 转换代码格式
-            code_upper = code.upper()
-            
-            # 检查是否在映射表中，获取实际代码
-            if code_upper in self.futures_map:
-                # 对于映射表中的代码，使用特定格式
-                # XAU/XAUUSD -> XAU, XAGUSD/XAG -> XAG 等
-                symbol_map = {
-                    'XAUUSD': 'XAU',
-                    'XAU': 'XAU',
-                    'XAGUSD': 'XAG', 
-                    'XAG': 'XAG',
-                    'CL': 'CL',
-                    'NG': 'NG',
-                    'GC': 'GC',
-                    'SI': 'SI'
-                }
-                symbol = symbol_map.get(code_upper, code_upper)
-            else:
-                symbol = code_upper
-            
-            # 新浪全球期货K线API
-            url = f"https://stock2.finance.sina.com.cn/futures/api/jsonp.php/var%20_{symbol}_data=/GlobalFuturesService.getGlobalFuturesDailyKLine"
             params = {
-                'symbol': symbol,
-                '_': '1'
+                'secid': secid,
+                'klt': 101,  # 日K
+                'fqt': 0,  # 不复权，复权在本地计算
+                'lmt': days,
+                'end': '20500101',
+                'fields1': KLINE_FIELDS1,
+                'fields2': KLINE_FIELDS2,
+                'ut': 'fa5fd1943c7b386f172d6893dbfba10b'
             }
             
-            response = requests.get(url, params=params, headers=self.headers, timeout=10)
+            response = self._http_get(KLINE_URL, params, endpoint='kline', timeout=10)
+            if response.status_code != 200:
+                print(f"警告: 无法获取K线数据（HTTP {response.status_code}）")
+                return None
             
-            if response.status_code == 200:
-                text = response.text
-                
-                # 解析JSONP响应
-                import re
-                match = re.search(r'var _[A-Z]+_data=\((.+)\);', text)
-                
-                if match:
-                    import json
-                    data = json.loads(match.group(1))
-                    
-                    if data:
-                        kline_list = []
-                        # 只取最近days天的数据
-                        for item in data[-days:]:
-                            kline_list.append({
-                                'date': item['date'],
-                                'open': float(item['open']),
-                                'close': float(item['close']),
-                                'high': float(item['high']),
-                                'low': float(item['low']),
-                                'volume': float(item.get('volume', 0))
-                            })
-                        
-                        if kline_list:
-                            print(f"成功获取 {len(kline_list)} 条期货K线数据")
-                            return kline_list
+            with PARSE_TIME.time(kind='kline'), TRACER.span('parse', kind='kline'):
+                bars = parse_klines(response.content)
             
-            print(f"警告: 无法获取期货K线数据，使用模拟数据")
-            return self._generate_mock_kline_data(days)
+            if bars is None:
+                print(f"警告: 无法获取K线数据")
+            return bars
             
+        except CircuitOpenError as e:
+            print(f"获取K线数据失败: {e}")
+            return None
         except Exception as e:
-            print(f"获取期货K线数据失败: {e}")
+            print(f"获取K线数据失败: {e}")
             import traceback
             traceback.print_exc()
-            return self._generate_mock_kline_data(days)
+            return None
     
     def get_intraday_data(self, code, market='sh'):
         """
-        获取分时数据（使用K线最后一天数据模拟）
+        获取当日分时数据（东方财富分时接口）：[{'time': 'HH:MM', 'price', 'yestclose'}, ...]
+        休市期间若缓存是收盘后获取的则直接返回缓存；上游失败时返回缓存，没有缓存返回空列表
         """
+        key = ('intraday', code.upper(), market.lower())
+        cached = self._get_last_good(key)
+        if cached and not self.get_calendar(code, market).has_traded_since(cached['fetched_at']):
+            return list(cached['points'])
+        
+        def fetch():
+            points = self._fetch_intraday_data(code, market)
+            if points:
+                self._set_last_good(key, {'points': points, 'fetched_at': time.time()})
+            return points
+        
+        points = self.single_flight.do(key, fetch)
+        if points:
+            return points
+        cached = self._get_last_good(key)
+        return list(cached['points']) if cached else []
+    
+    def _fetch_intraday_data(self, code, market='sh'):
+        """从东方财富获取当日分时数据，失败返回None"""
         try:
-            # 对于期货，从新浪获取
-            if market.lower() == 'hf':
-                return self._generate_intraday_from_kline(code, market)
+            params = {
+                'secid': self.get_eastmoney_code(code, market),
+                'fields1': 'f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f11,f12,f13',
+                'fields2': 'f51,f52,f53,f54,f55,f56,f57,f58',
+                'ndays': 1,
+                'iscr': 0,
+                'ut': 'fa5fd1943c7b386f172d6893dbfba10b'
+            }
             
-            # A股从腾讯API获取分时数据
-            # 由于分时API复杂，这里用简化版本
-            return self._generate_intraday_from_kline(code, market)
+            response = self._http_get(INTRADAY_URL, params, endpoint='intraday', timeout=10)
+            if response.status_code != 200:
+                return None
             
+            with PARSE_TIME.time(kind='intraday'), TRACER.span('parse', kind='intraday'):
+                data = response.json().get('data') or {}
+                yestclose = data.get('preClose') or 0.0
+                points = []
+                for line in data.get('trends') or []:
+                    # 格式："日期 时间,开盘,最新价,最高,最低,成交量,成交额,均价"
+                    fields = line.split(',')
+                    points.append({
+                        'time': fields[0][-5:],
+                        'price': float(fields[2]),
+                        'yestclose': yestclose
+                    })
+            return points or None
+        except CircuitOpenError as e:
+            print(f"获取分时数据失败: {e}")
+            return None
         except Exception as e:
             print(f"获取分时数据失败: {e}")
-            return []
-    
-    def _generate_intraday_from_kline(self, code, market):
-        """从K线数据生成分时数据"""
-        try:
-            kline = self.get_kline_data(code, market, days=2)
-            if not kline or len(kline) < 2:
-                return []
-            
-            latest = kline[-1]
-            yestclose = kline[-2]['close']
-            
-            # 生成240个分时点（4小时交易，每分钟一个点）
-            intraday_data = []
-            open_p = latest['open']
-            close_p = latest['close']
-            high_p = latest['high']
-            low_p = latest['low']
-            
-            for i in range(240):
-                # 简单线性插值
-                ratio = i / 240
-                price = open_p + (close_p - open_p) * ratio
-                # 添加随机波动
-                price += random.uniform(-5, 5)
-                price = max(low_p, min(high_p, price))
-                
-                # 计算时间
-                hour = 9 + (i + 30) // 60
-                minute = (i + 30) % 60
-                if hour >= 12:
-                    hour += 1
-                if hour >= 15:
-                    break
-                    
-                time_str = f"{hour:02d}:{minute:02d}"
-                
-                intraday_data.append({
-                    'time': time_str,
-                    'price': round(price, 2),
-                    'yestclose': yestclose
-                })
-            
-            return intraday_data
-        except:
-            return []
-    
-    def _generate_mock_kline_data(self, days=30):
-        """生成模拟K线数据用于演示"""
-        kline_list = []
-        base_price = 3000
-        
-        for i in range(days):
-            date = (datetime.now() - timedelta(days=days-i-1)).strftime('%Y-%m-%d')
-            
-            # 简单的随机波动
-            change = random.uniform(-50, 50)
-            base_price += change
-            
-            open_price = base_price
-            close_price = base_price + random.uniform(-20, 20)
-            high_price = max(open_price, close_price) + random.uniform(0, 30)
-            low_price = min(open_price, close_price) - random.uniform(0, 30)
-            
-            kline_list.append({
-                'date': date,
-                'open': round(open_price, 2),
-                'close': round(close_price, 2),
-                'high': round(high_price, 2),
-                'low': round(low_price, 2),
-                'volume': random.randint(1000000, 5000000)
-            })
-        
-        return kline_list
+            return None
 
 if __name__ == "__main__":
     # 测试代码
@@ -428,3 +823,7 @@ if __name__ == "__main__":
         print(f"获取到 {len(kline)} 条K线数据")
         for k in kline:  # 显示所有5天数据
             print(k)
+    
+    # 上游容错统计
+    print("\n上游容错统计:")
+    print(json.dumps(api.get_resilience_stats(), indent=2, ensure_ascii=False))
@@ -0,0 +1,250 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+历史K线批量回填
+- 线程池并行获取，按上游主机限速
+- 进度写入检查点文件，中断后再次运行从断点继续（失败的品种会重试）
+- 校验K线后写入本地K线存储（bar_store），上游失败的品种记为失败，不写入任何模拟或缓存数据
+- 输出吞吐量（品种/秒、K线/秒）
+
+用法:
+    python backfill.py --config                      # 回填config.json中的自选股
+    python backfill.py --symbols symbols.txt --years 5
+    python backfill.py --all-a --workers 16 --rate push2his.eastmoney.com=20
+symbols.txt 每行一个品种，格式为 "市场:代码"，例如 sh:600519
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_client import NetEaseFinanceAPI
+from bar_store import BarStore, validate_bars
+from config_store import atomic_write_json
+from market_scanner import A_SHARE_FS
+from symbol_index import market_from_eastmoney
+
+# 各K线上游主机的默认限速（每秒请求数）
+DEFAULT_RATES = {
+    'push2his.eastmoney.com': 10
+}
+
+# 每年交易日数
+TRADING_DAYS = 250
+
+
+class Checkpoint:
+    """回填进度（原子写入，每完成若干品种保存一次）"""
+    
+    def __init__(self, path, days, save_every=20):
+        self.path = path
+        self.days = days
+        self.save_every = save_every
+        self.done = {}  # "市场:代码" -> K线数
+        self.failed = {}  # "市场:代码" -> 错误信息
+        self._pending = 0
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """加载已有进度（回填天数不同时忽略）"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"加载检查点失败: {e}")
+            return False
+        if data.get('days') != self.days:
+            print("检查点的回填天数不同，重新开始")
+            return False
+        self.done = data.get('done', {})
+        self.failed = data.get('failed', {})
+        return True
+    
+    def save(self):
+        with self._lock:
+            data = {'days': self.days, 'done': dict(self.done), 'failed': dict(self.failed)}
+            self._pending = 0
+        atomic_write_json(self.path, data, ensure_ascii=False)
+    
+    def record(self, key, bars=None, error=None):
+        with self._lock:
+            if error is None:
+                self.done[key] = bars
+                self.failed.pop(key, None)
+            else:
+                self.failed[key] = error
+            self._pending += 1
+            due = self._pending >= self.save_every
+        if due:
+            self.save()
+
+
+class Backfill:
+    """历史K线回填任务"""
+    
+    def __init__(self, api, store, checkpoint, workers=8):
+        self.api = api
+        self.store = store
+        self.checkpoint = checkpoint
+        self.workers = workers
+        
+        self.symbols_done = 0
+        self.bars_written = 0
+        self.bars_rejected = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+    
+    def fetch_one(self, market, code):
+        """获取、校验并写入一个品种，返回 (写入K线数, 剔除K线数)"""
+        bars = self.api.get_kline_history(code, market, self.checkpoint.days)
+        if bars is None:
+            raise RuntimeError('上游无数据或请求失败')
+        
+        bars, rejected = validate_bars(bars)
+        if len(bars) == 0:
+            raise RuntimeError(f'K线全部未通过校验（{rejected} 根）')
+        
+        self.store.write(market, code, bars)
+        return len(bars), rejected
+    
+    def run(self, symbols, progress_every=5.0):
+        """回填symbols（[(市场, 代码), ...]），跳过检查点中已完成的品种"""
+        pending = [(m, c) for m, c in symbols if f'{m}:{c}' not in self.checkpoint.done]
+        skipped = len(symbols) - len(pending)
+        if skipped:
+            print(f"从检查点继续：跳过已完成的 {skipped} 个品种")
+        print(f"待回填 {len(pending)} 个品种，{self.workers} 个线程")
+        
+        start = time.perf_counter()
+        last_report = start
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='backfill') as pool:
+            futures = {pool.submit(self.fetch_one, m, c): (m, c) for m, c in pending}
+            try:
+                for future in as_completed(futures):
+                    market, code = futures[future]
+                    key = f'{market}:{code}'
+                    try:
+                        written, rejected = future.result()
+                    except Exception as e:
+                        with self._lock:
+                            self.failures += 1
+                        self.checkpoint.record(key, error=str(e))
+                        continue
+                    
+                    with self._lock:
+                        self.symbols_done += 1
+                        self.bars_written += written
+                        self.bars_rejected += rejected
+                    self.checkpoint.record(key, bars=written)
+                    
+                    now = time.perf_counter()
+                    if now - last_report >= progress_every:
+                        last_report = now
+                        print(self.report(now - start, len(pending)))
+            except KeyboardInterrupt:
+                print("已中断，正在保存检查点...")
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                self.checkpoint.save()
+        
+        elapsed = time.perf_counter() - start
+        print(self.report(elapsed, len(pending)))
+        return elapsed
+    
+    def report(self, elapsed, total):
+        elapsed = max(elapsed, 1e-9)
+        return (f"进度 {self.symbols_done + self.failures}/{total}，成功 {self.symbols_done}，失败 {self.failures}，"
+                f"K线 {self.bars_written}（剔除 {self.bars_rejected}），"
+                f"{self.symbols_done / elapsed:.1f} 品种/秒，{self.bars_written / elapsed:.0f} K线/秒")
+
+
+def load_symbols(args, api):
+    """根据命令行参数确定品种列表"""
+    symbols = []
+    if args.config:
+        with open('config.json', 'r', encoding='utf-8') as f:
+            symbols.extend((s['market'].lower(), s['code']) for s in json.load(f).get('stocks', []))
+    if args.symbols:
+        with open(args.symbols, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    market, code = line.split(':', 1)
+                    symbols.append((market.strip().lower(), code.strip()))
+    if args.all_a:
+        for row in api.get_security_list(A_SHARE_FS):
+            market = market_from_eastmoney(row.get('f13', ''))
+            code = str(row.get('f12', ''))
+            if market and code and code != '-':
+                symbols.append((market, code))
+    
+    # 去重并保持顺序
+    return list(dict.fromkeys(symbols))
+
+
+def parse_rates(values):
+    rates = dict(DEFAULT_RATES)
+    for value in values or []:
+        host, rate = value.split('=', 1)
+        rates[host.strip()] = float(rate)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description='历史K线批量回填')
+    parser.add_argument('--config', action='store_true', help='回填config.json中的自选股')
+    parser.add_argument('--symbols', help='品种列表文件（每行 市场:代码）')
+    parser.add_argument('--all-a', action='store_true', help='回填全部沪深A股')
+    parser.add_argument('--years', type=float, default=5, help='回填年数（默认5年）')
+    parser.add_argument('--workers', type=int, default=8, help='线程数')
+    parser.add_argument('--rate', action='append', metavar='HOST=N', help='主机限速（每秒请求数），可重复')
+    parser.add_argument('--store', default='bars', help='K线存储目录')
+    parser.add_argument('--checkpoint', default='backfill.checkpoint.json', help='检查点文件')
+    parser.add_argument('--restart', action='store_true', help='忽略已有检查点，重新开始')
+    args = parser.parse_args()
+    
+    if not (args.config or args.symbols or args.all_a):
+        parser.error('需要指定 --config、--symbols 或 --all-a')
+    
+    api = NetEaseFinanceAPI()
+    for host, rate in parse_rates(args.rate).items():
+        api.resilience.set_rate_limit(f'http://{host}', rate)
+    
+    symbols = load_symbols(args, api)
+    checkpoint = Checkpoint(args.checkpoint, days=int(args.years * TRADING_DAYS))
+    if not args.restart:
+        checkpoint.load()
+    
+    backfill = Backfill(api, BarStore(args.store), checkpoint, workers=args.workers)
+    try:
+        backfill.run(symbols)
+    except KeyboardInterrupt:
+        print(f"检查点已保存到 {args.checkpoint}，再次运行即可继续")
+        return
+    
+    if checkpoint.failed:
+        print(f"{len(checkpoint.failed)} 个品种失败（再次运行会重试）:")
+        for key, error in list(checkpoint.failed.items())[:20]:
+            print(f"  {key}: {error}")
+
+
+if __name__ == '__main__':
+    main()
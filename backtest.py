@@ -0,0 +1,288 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+向量化回测
+- 策略为纯函数：输入OHLCV数组和参数，输出每根K线收盘后的目标仓位（0~1）
+- 全部品种的OHLCV拼接后写入一个内存映射文件，进程池中的子进程直接映射读取，不经过pickle传输
+- 品种 x 参数网格按品种分批派发到进程池，结果汇总为表格（收益、最大回撤、夏普比率）
+
+用法:
+    python backtest.py --fixture 200 --strategy sma_cross
+    python backtest.py --input bars.json --strategy breakout --workers 4 --csv result.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# OHLCV 列顺序
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# 每年交易日数（年化夏普比率）
+TRADING_DAYS = 252
+
+
+def moving_average(values, window):
+    """简单移动平均（前window-1个为NaN）"""
+    result = np.full(len(values), np.nan)
+    if window <= len(values):
+        total = np.cumsum(values)
+        total[window:] = total[window:] - total[:-window]
+        result[window - 1:] = total[window - 1:] / window
+    return result
+
+
+def rolling_extreme(values, window, func):
+    """前window根K线（不含当根）的滚动最大/最小值"""
+    result = np.full(len(values), np.nan)
+    if window < len(values):
+        windows = np.lib.stride_tricks.sliding_window_view(values[:-1], window)
+        result[window:] = func(windows, axis=1)
+    return result
+
+
+def sma_cross(bars, fast=5, slow=20):
+    """均线交叉：快线在慢线之上时持仓"""
+    if fast >= slow:
+        return None
+    close = bars['close']
+    return (moving_average(close, fast) > moving_average(close, slow)).astype(np.float64)
+
+
+def breakout(bars, lookback=20, exit_lookback=10):
+    """通道突破：收盘价突破前lookback日最高价买入，跌破前exit_lookback日最低价卖出"""
+    close = bars['close']
+    entries = close > rolling_extreme(bars['high'], lookback, np.max)
+    exits = close < rolling_extreme(bars['low'], exit_lookback, np.min)
+    
+    # 信号：1买入、0卖出、NaN保持；向前填充得到仓位
+    signal = np.where(entries, 1.0, np.where(exits, 0.0, np.nan))
+    signal[0] = 0.0 if np.isnan(signal[0]) else signal[0]
+    index = np.where(~np.isnan(signal), np.arange(len(signal)), 0)
+    np.maximum.accumulate(index, out=index)
+    return signal[index]
+
+
+def momentum(bars, lookback=20, threshold=0.0):
+    """动量：过去lookback日涨幅超过阈值时持仓"""
+    close = bars['close']
+    position = np.zeros(len(close))
+    if lookback < len(close):
+        position[lookback:] = (close[lookback:] / close[:-lookback] - 1.0 > threshold)
+    return position
+
+
+# 策略名 -> (函数, 默认参数网格)
+STRATEGIES = {
+    'sma_cross': (sma_cross, {'fast': [3, 5, 10, 20], 'slow': [20, 30, 60, 120]}),
+    'breakout': (breakout, {'lookback': [10, 20, 55], 'exit_lookback': [5, 10, 20]}),
+    'momentum': (momentum, {'lookback': [5, 10, 20, 60], 'threshold': [0.0, 0.05]})
+}
+
+
+def param_grid(grid):
+    """参数网格展开为参数字典列表"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def evaluate(close, position, fee=0.0005):
+    """
+    根据仓位计算绩效：当根收盘确定的仓位从下一根K线开始生效，换手按fee收取费用
+    返回: (总收益, 最大回撤, 年化夏普比率, 交易次数)
+    """
+    returns = np.zeros(len(close))
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    
+    held = np.zeros(len(close))
+    held[1:] = np.nan_to_num(position[:-1])
+    turnover = np.abs(np.diff(held, prepend=0.0))
+    strategy = held * returns - turnover * fee
+    
+    equity = np.cumprod(1.0 + strategy)
+    drawdown = 1.0 - equity / np.maximum.accumulate(equity)
+    std = strategy.std()
+    sharpe = strategy.mean() / std * np.sqrt(TRADING_DAYS) if std > 0 else 0.0
+    trades = int(np.count_nonzero(np.diff(held) > 0))
+    return float(equity[-1] - 1.0), float(drawdown.max()), float(sharpe), trades
+
+
+class SharedBars:
+    """
+    拼接后的OHLCV内存映射文件
+    data: [5, 总K线数] 的float64数组；offsets[i]:offsets[i+1] 为第i个品种的区间
+    """
+    
+    def __init__(self, directory, symbols, offsets):
+        self.directory = directory
+        self.symbols = symbols
+        self.offsets = offsets
+    
+    @property
+    def path(self):
+        return os.path.join(self.directory, 'bars.f64')
+    
+    @classmethod
+    def write(cls, series_map, directory):
+        """把 品种 -> K线字典列表 写入内存映射文件"""
+        symbols = [symbol for symbol, bars in series_map.items() if bars]
+        lengths = [len(series_map[symbol]) for symbol in symbols]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        
+        store = cls(directory, symbols, offsets)
+        data = np.memmap(store.path, dtype=np.float64, mode='w+', shape=(len(COLUMNS), int(offsets[-1])))
+        for i, symbol in enumerate(symbols):
+            bars = series_map[symbol]
+            for row, column in enumerate(COLUMNS):
+                data[row, offsets[i]:offsets[i + 1]] = [bar.get(column, 0.0) for bar in bars]
+        data.flush()
+        del data
+        return store
+    
+    def open(self):
+        return np.memmap(self.path, dtype=np.float64, mode='r', shape=(len(COLUMNS), int(self.offsets[-1])))
+
+
+# 子进程中的内存映射（进程池初始化时打开）
+_worker_data = None
+_worker_offsets = None
+
+
+def _init_worker(store):
+    global _worker_data, _worker_offsets
+    _worker_data = store.open()
+    _worker_offsets = store.offsets
+
+
+def _run_symbol(task):
+    """子进程：对一个品种运行整个参数网格"""
+    symbol_index, strategy_name, params_list, fee = task
+    start, end = _worker_offsets[symbol_index], _worker_offsets[symbol_index + 1]
+    bars = {column: np.asarray(_worker_data[row, start:end]) for row, column in enumerate(COLUMNS)}
+    
+    func, _ = STRATEGIES[strategy_name]
+    results = []
+    for params in params_list:
+        position = func(bars, **params)
+        if position is None:
+            continue
+        results.append((symbol_index, params) + evaluate(bars['close'], position, fee))
+    return results
+
+
+def run_backtest(series_map, strategy='sma_cross', grid=None, workers=None, fee=0.0005):
+    """
+    运行回测
+    series_map: 品种 -> K线字典列表（与 get_kline_data 返回的格式相同）
+    返回: 结果字典列表（symbol, params, total_return, max_drawdown, sharpe, trades）
+    """
+    _, default_grid = STRATEGIES[strategy]
+    params_list = param_grid(grid or default_grid)
+    
+    directory = tempfile.mkdtemp(prefix='backtest-')
+    try:
+        store = SharedBars.write(series_map, directory)
+        tasks = [(i, strategy, params_list, fee) for i in range(len(store.symbols))]
+        
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store,)) as pool:
+            for results in pool.map(_run_symbol, tasks, chunksize=max(1, len(tasks) // 64)):
+                rows.extend(results)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    
+    return [{
+        'symbol': store.symbols[symbol_index],
+        'params': params,
+        'total_return': total_return,
+        'max_drawdown': max_drawdown,
+        'sharpe': sharpe,
+        'trades': trades
+    } for symbol_index, params, total_return, max_drawdown, sharpe, trades in rows]
+
+
+def format_table(results, limit=20):
+    """按夏普比率排序，格式化为文本表格"""
+    lines = [f"{'品种':<10}{'参数':<32}{'收益':>10}{'最大回撤':>10}{'夏普':>8}{'交易':>6}"]
+    for item in sorted(results, key=lambda r: r['sharpe'], reverse=True)[:limit]:
+        params = ','.join(f'{k}={v}' for k, v in item['params'].items())
+        lines.append(f"{item['symbol']:<10}{params:<32}{item['total_return']:>10.2%}"
+                     f"{item['max_drawdown']:>10.2%}{item['sharpe']:>8.2f}{item['trades']:>6}")
+    return '\n'.join(lines)
+
+
+def fixture_series(count, days=1000, seed=0):
+    """离线测试数据：确定性的随机游走日K线"""
+    rng = np.random.default_rng(seed)
+    dates = (np.datetime64('2020-01-01') + np.arange(days)).astype(str)
+    series = {}
+    for i in range(count):
+        drift = rng.normal(0.0002, 0.0005)
+        close = 10 * np.exp(np.cumsum(rng.normal(drift, 0.02, days)))
+        open_ = close * np.exp(rng.normal(0, 0.005, days))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, days)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, days)))
+        volume = rng.integers(1000, 100000, days)
+        series[f'F{i:04d}'] = [{'date': d, 'open': o, 'high': h, 'low': l, 'close': c, 'volume': float(v)}
+                               for d, o, h, l, c, v in zip(dates, open_, high, low, close, volume)]
+    return series
+
+
+def main():
+    parser = argparse.ArgumentParser(description='向量化回测')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help='K线JSON文件：{品种: [{date, open, high, low, close, volume}, ...]}')
+    source.add_argument('--fixture', type=int, metavar='N', help='使用N个品种的离线测试数据')
+    parser.add_argument('--strategy', default='sma_cross', choices=sorted(STRATEGIES))
+    parser.add_argument('--grid', help='参数网格JSON，例如 {"fast": [5, 10], "slow": [30, 60]}')
+    parser.add_argument('--workers', type=int, default=None, help='进程数（默认CPU核数）')
+    parser.add_argument('--fee', type=float, default=0.0005, help='单边交易费率')
+    parser.add_argument('--top', type=int, default=20, help='显示前N行')
+    parser.add_argument('--csv', help='把全部结果写入CSV文件')
+    args = parser.parse_args()
+    
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            series_map = json.load(f)
+    else:
+        series_map = fixture_series(args.fixture)
+    
+    grid = json.loads(args.grid) if args.grid else None
+    
+    start = time.perf_counter()
+    results = run_backtest(series_map, args.strategy, grid, args.workers, args.fee)
+    elapsed = time.perf_counter() - start
+    
+    print(format_table(results, args.top))
+    print(f"\n{len(series_map)} 个品种，{len(results)} 组回测，耗时 {elapsed:.2f} 秒")
+    
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['symbol', 'params', 'total_return', 'max_drawdown', 'sharpe', 'trades'])
+            for item in results:
+                writer.writerow([item['symbol'], json.dumps(item['params']), item['total_return'],
+                                 item['max_drawdown'], item['sharpe'], item['trades']])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+本地日K线存储
+每个品种一个 .npy 文件（bars/<市场>/<代码>.npy），内容为按日期排序的结构化数组：
+    day（1970-01-01起的天数，int64）、open、high、low、close、volume
+写入时与已有数据按日期去重合并（新数据优先），采用临时文件 + 重命名的原子写入
+BarSeries 是同样格式的内存K线序列：日期在导入时统一转换为天数，按日期范围截取为二分查找
+"""
+import os
+import tempfile
+import threading
+from datetime import date
+
+import numpy as np
+
+BAR_DTYPE = np.dtype([
+    ('day', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# day_numbers 中无法解析的日期（NaT 转换为 int64 的值）
+INVALID_DAY = np.datetime64('NaT', 'D').astype(np.int64)
+
+
+def day_number(date_str):
+    """日期字符串（YYYY-MM-DD 或 YYYYMMDD）转换为1970-01-01起的天数"""
+    if '-' not in date_str:
+        date_str = f'{date_str[:4]}-{date_str[4:6]}-{date_str[6:8]}'
+    return date.fromisoformat(date_str[:10]).toordinal() - _EPOCH_ORDINAL
+
+
+def day_string(day):
+    """天数转换为 YYYY-MM-DD"""
+    return date.fromordinal(int(day) + _EPOCH_ORDINAL).isoformat()
+
+
+def _iso_date(value):
+    if not isinstance(value, str):
+        return 'NaT'
+    return value[:10] if '-' in value else f'{value[:4]}-{value[4:6]}-{value[6:8]}'
+
+
+def _parse_day(value):
+    try:
+        return np.datetime64(value, 'D')
+    except ValueError:
+        return np.datetime64('NaT', 'D')
+
+
+def day_numbers(dates):
+    """
+    日期字符串列表（YYYY-MM-DD 或 YYYYMMDD，可混合）一次转换为天数数组
+    无法解析的日期为 INVALID_DAY（转换为 datetime64 后为 NaT），由调用方剔除
+    """
+    values = [_iso_date(d) for d in dates]
+    try:
+        return np.array(values, dtype='datetime64[D]').astype(np.int64)
+    except ValueError:
+        # 有格式错误的日期时逐个解析
+        return np.array([_parse_day(v) for v in values], dtype='datetime64[D]').astype(np.int64)
+
+
+def bars_to_array(bars):
+    """K线字典列表转换为结构化数组（按日期排序，日期无法解析的K线被剔除）"""
+    array = np.empty(len(bars), dtype=BAR_DTYPE)
+    if not bars:
+        return array
+    array['day'] = day_numbers([bar['date'] for bar in bars])
+    for field in ('open', 'high', 'low', 'close'):
+        array[field] = [bar[field] for bar in bars]
+    array['volume'] = [bar.get('volume', 0.0) for bar in bars]
+    array = array[array['day'] != INVALID_DAY]
+    array.sort(order='day', kind='stable')
+    return array
+
+
+def array_to_bars(array):
+    """结构化数组转换为K线字典列表"""
+    return [{
+        'date': day_string(row['day']),
+        'open': float(row['open']),
+        'high': float(row['high']),
+        'low': float(row['low']),
+        'close': float(row['close']),
+        'volume': float(row['volume'])
+    } for row in array]
+
+
+def merge_bars(old, new):
+    """按日期合并两个结构化数组，同一天以new为准"""
+    if len(old) == 0:
+        return new
+    combined = np.concatenate([new, old])
+    # np.unique返回每个日期第一次出现的位置，new在前所以新数据优先
+    _, index = np.unique(combined['day'], return_index=True)
+    return combined[index]
+
+
+def validate_bars(array):
+    """
+    校验K线，返回 (有效K线, 无效K线数)
+    剔除：价格非正或非有限值、最高价低于开收盘价、最低价高于开收盘价、成交量为负、日期重复
+    """
+    prices = np.stack([array['open'], array['high'], array['low'], array['close']])
+    valid = np.isfinite(prices).all(axis=0) & (prices > 0).all(axis=0)
+    valid &= array['high'] >= np.maximum(array['open'], array['close'])
+    valid &= array['low'] <= np.minimum(array['open'], array['close'])
+    valid &= np.isfinite(array['volume']) & (array['volume'] >= 0)
+    
+    # 重复日期只保留最后一根
+    duplicated = np.zeros(len(array), dtype=bool)
+    duplicated[:-1] = array['day'][:-1] == array['day'][1:]
+    valid &= ~duplicated
+    return array[valid], int(len(array) - valid.sum())
+
+
+def _to_day(value):
+    """日期字符串或天数 -> 天数"""
+    return day_number(value) if isinstance(value, str) else int(value)
+
+
+class BarSeries:
+    """
+    按日期索引的K线序列（BAR_DTYPE结构化数组，按日期排序且不重复）
+    - 日期只在导入时解析一次
+    - 按日期范围截取为二分查找，返回共享内存的视图
+    - 合并重叠的两段K线时按日期去重（新数据优先）
+    - x轴刻度标签每个序列只计算一次
+    """
+    
+    def __init__(self, array=None):
+        self.array = np.empty(0, dtype=BAR_DTYPE) if array is None else array
+        self._ticks = {}
+    
+    @classmethod
+    def from_bars(cls, bars):
+        """从K线字典列表导入（重复日期保留最后一根）"""
+        array = bars_to_array(bars)
+        if len(array) > 1:
+            keep = np.ones(len(array), dtype=bool)
+            keep[:-1] = array['day'][:-1] != array['day'][1:]
+            array = array[keep]
+        return cls(array)
+    
+    def __len__(self):
+        return len(self.array)
+    
+    def __getitem__(self, field):
+        """列：day / open / high / low / close / volume"""
+        return self.array[field]
+    
+    @property
+    def days(self):
+        return self.array['day']
+    
+    def date(self, index):
+        """第index根K线的日期字符串"""
+        return day_string(self.array['day'][index])
+    
+    def index_range(self, start=None, end=None):
+        """日期闭区间 [start, end] 对应的下标范围 (lo, hi)，start/end 为日期字符串或天数"""
+        days = self.array['day']
+        lo = int(np.searchsorted(days, _to_day(start), 'left')) if start is not None else 0
+        hi = int(np.searchsorted(days, _to_day(end), 'right')) if end is not None else len(days)
+        return lo, max(lo, hi)
+    
+    def slice(self, start=None, end=None):
+        """按日期闭区间截取"""
+        lo, hi = self.index_range(start, end)
+        return BarSeries(self.array[lo:hi])
+    
+    def tail(self, n):
+        return BarSeries(self.array[-n:] if n > 0 else self.array[:0])
+    
+    def merge(self, other):
+        """与另一段K线合并，同一天以other为准"""
+        other_array = other.array if isinstance(other, BarSeries) else other
+        if len(other_array) == 0:
+            return BarSeries(self.array)
+        return BarSeries(merge_bars(self.array, other_array))
+    
+    def tick_labels(self, max_ticks=10, fmt='%m-%d'):
+        """x轴刻度位置和标签（最多约max_ticks个），同一序列只计算一次"""
+        key = (max_ticks, fmt)
+        ticks = self._ticks.get(key)
+        if ticks is None:
+            count = len(self.array)
+            step = max(1, count // max_ticks) if count > max_ticks else 1
+            positions = list(range(0, count, step))
+            labels = [date.fromordinal(int(day) + _EPOCH_ORDINAL).strftime(fmt)
+                      for day in self.array['day'][positions]]
+            ticks = self._ticks[key] = (positions, labels)
+        return ticks
+    
+    def to_bars(self):
+        """转换为K线字典列表"""
+        return array_to_bars(self.array)
+
+
+class BarStore:
+    """本地日K线存储"""
+    
+    def __init__(self, root='bars'):
+        self.root = root
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+    
+    def path(self, market, code):
+        return os.path.join(self.root, market.lower(), f'{code.upper()}.npy')
+    
+    def _lock(self, market, code):
+        key = (market.lower(), code.upper())
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+    
+    def exists(self, market, code):
+        return os.path.exists(self.path(market, code))
+    
+    def read(self, market, code, start=None, end=None, mmap=False):
+        """
+        读取一个品种的K线（结构化数组），不存在时返回空数组
+        start/end: 日期字符串，闭区间，按二分查找截取
+        mmap: 为True时以只读内存映射方式打开
+        """
+        path = self.path(market, code)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        
+        array = np.load(path, mmap_mode='r' if mmap else None)
+        if start is None and end is None:
+            return array
+        
+        days = array['day']
+        lo = np.searchsorted(days, day_number(start), 'left') if start else 0
+        hi = np.searchsorted(days, day_number(end), 'right') if end else len(array)
+        return array[lo:hi]
+    
+    def write(self, market, code, array):
+        """与已有数据合并后原子写入，返回合并后的K线数"""
+        path = self.path(market, code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        with self._lock(market, code):
+            merged = merge_bars(self.read(market, code), array)
+            fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp',
+                                            dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, merged)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return len(merged)
+    
+    def symbols(self):
+        """已存储的 (市场, 代码) 列表"""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for market in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, market)
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.npy') and not name.startswith('.'):
+                    result.append((market, name[:-4]))
+        return result
@@ -0,0 +1,72 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+启动耗时基准测试
+多次以 --startup-bench 模式启动主程序，统计从进程启动到首次显示价格的耗时：
+- stale: 显示上次保存的行情快照
+- live: 显示第一条实时行情
+"""
+import os
+import subprocess
+import sys
+import time
+
+
+def run_once():
+    """启动一次主程序，返回 {'stale': 秒, 'live': 秒}"""
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, main_py, '--startup-bench'],
+                            cwd=os.path.dirname(main_py),
+                            stdout=subprocess.PIPE, text=True)
+    
+    result = {}
+    try:
+        for line in proc.stdout:
+            if line.startswith('STARTUP_PAINT'):
+                _, kind, stamp = line.split()
+                result.setdefault(kind, float(stamp) - start)
+        proc.wait(timeout=60)
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    return result
+
+
+def main():
+    """主函数"""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = {'stale': [], 'live': []}
+    
+    print(f"启动耗时基准测试（{runs}次）")
+    for i in range(runs):
+        result = run_once()
+        for kind in samples:
+            if kind in result:
+                samples[kind].append(result[kind])
+        print(f"第{i + 1}次: " + ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in result.items()))
+    
+    print()
+    for kind, values in samples.items():
+        if values:
+            values.sort()
+            print(f"{kind:>5}: 最小 {values[0] * 1000:.0f}ms, 中位数 {values[len(values) // 2] * 1000:.0f}ms, "
+                  f"最大 {values[-1] * 1000:.0f}ms")
+        else:
+            print(f"{kind:>5}: 无数据")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+图表交互
+- BlitManager：管理animated图元，完整重绘时缓存背景，之后只重绘这些图元
+- Crosshair：十字光标和悬浮提示，鼠标x坐标在预先计算的x索引上二分查找对应的K线，
+  鼠标移动事件按帧率合并，每帧最多重绘一次
+"""
+import time
+
+import numpy as np
+from matplotlib.lines import Line2D
+
+
+class BlitManager:
+    """blit管理器：同一坐标轴上的所有animated图元共用一个背景缓存"""
+    
+    def __init__(self, canvas, ax):
+        self.canvas = canvas
+        self.ax = ax
+        self.artists = []
+        self._background = None
+        self.blits = 0
+        canvas.mpl_connect('draw_event', self._on_draw)
+    
+    @property
+    def ready(self):
+        return self._background is not None
+    
+    def add(self, artist):
+        """登记animated图元（按登记顺序绘制，后登记的在上层）"""
+        artist.set_animated(True)
+        self.artists.append(artist)
+        return artist
+    
+    def remove(self, artist):
+        if artist in self.artists:
+            self.artists.remove(artist)
+    
+    def _on_draw(self, event):
+        """完整重绘后缓存不含animated图元的背景，再画上animated图元"""
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_artists()
+    
+    def _draw_artists(self):
+        for artist in self.artists:
+            if artist.get_visible() and artist.axes is not None:
+                self.ax.draw_artist(artist)
+    
+    def update(self):
+        """恢复背景并重绘全部animated图元；尚未完整绘制过时请求一次完整重绘"""
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.ax.bbox)
+        self.blits += 1
+
+
+class Crosshair:
+    """
+    十字光标 + 悬浮提示
+    xs: 各数据点的x坐标（升序）
+    formatter(index) -> 提示文本
+    """
+    
+    def __init__(self, blit_manager, xs, formatter, fps=60):
+        self.blit_manager = blit_manager
+        self.canvas = blit_manager.canvas
+        self.ax = blit_manager.ax
+        self.frame_interval = 1.0 / fps
+        self.renders = 0
+        self.events = 0
+        
+        self._pending = None
+        self._timer = None
+        self._last_render = 0.0
+        self._index = None
+        self.vline = self.hline = self.label = None
+        
+        self.reset(xs, formatter)
+        self._motion_cid = self.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self._leave_cid = self.canvas.mpl_connect('axes_leave_event', self.on_leave)
+    
+    def reset(self, xs, formatter):
+        """数据或坐标轴变化后（例如ax.clear()之后）重新创建十字光标图元"""
+        for artist in (self.vline, self.hline, self.label):
+            if artist is not None:
+                self.blit_manager.remove(artist)
+                if artist.axes is not None:
+                    artist.remove()
+        
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.formatter = formatter
+        self._index = None
+        
+        # 用add_artist加入坐标轴，不参与自动缩放（axvline/axhline会把0计入数据范围）
+        style = dict(color='#aaaaaa', linewidth=0.8, linestyle='--', visible=False)
+        self.vline = self.blit_manager.add(self.ax.add_artist(
+            Line2D([0, 0], [0, 1], transform=self.ax.get_xaxis_transform(), **style)))
+        self.hline = self.blit_manager.add(self.ax.add_artist(
+            Line2D([0, 1], [0, 0], transform=self.ax.get_yaxis_transform(), **style)))
+        self.label = self.blit_manager.add(self.ax.text(
+            0.01, 0.98, '', transform=self.ax.transAxes, va='top', ha='left', fontsize=8, color='white',
+            visible=False, bbox=dict(boxstyle='round', facecolor='#2d2d2d', edgecolor='#666666', alpha=0.9)))
+    
+    def nearest_index(self, x):
+        """二分查找离x最近的数据点，O(log n)"""
+        n = len(self.xs)
+        if n == 0:
+            return None
+        i = int(np.searchsorted(self.xs, x))
+        if i <= 0:
+            return 0
+        if i >= n:
+            return n - 1
+        return i if self.xs[i] - x < x - self.xs[i - 1] else i - 1
+    
+    def on_motion(self, event):
+        """记录最新的鼠标位置，按帧率合并重绘"""
+        self.events += 1
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        
+        self._pending = (event.xdata, event.ydata)
+        now = time.perf_counter()
+        if now - self._last_render >= self.frame_interval:
+            self.flush()
+        elif self._timer is None:
+            delay = max(1, int((self.frame_interval - (now - self._last_render)) * 1000))
+            self._timer = self.canvas.new_timer(interval=delay)
+            self._timer.single_shot = True
+            self._timer.add_callback(self.flush)
+            self._timer.start()
+    
+    def flush(self):
+        """把最新的鼠标位置画出来"""
+        self._timer = None
+        if self._pending is None:
+            return
+        x, y = self._pending
+        self._pending = None
+        
+        index = self.nearest_index(x)
+        if index is None:
+            return
+        
+        self.vline.set_xdata([self.xs[index], self.xs[index]])
+        self.hline.set_ydata([y, y])
+        if index != self._index:
+            self._index = index
+            self.label.set_text(self.formatter(index))
+            # 提示框放在光标的另一侧，避免遮挡
+            left = (x - self.ax.get_xlim()[0]) > (self.ax.get_xlim()[1] - self.ax.get_xlim()[0]) / 2
+            self.label.set_x(0.01 if left else 0.99)
+            self.label.set_ha('left' if left else 'right')
+        
+        for artist in (self.vline, self.hline, self.label):
+            artist.set_visible(True)
+        self.blit_manager.update()
+        self._last_render = time.perf_counter()
+        self.renders += 1
+    
+    def on_leave(self, event):
+        """鼠标离开坐标轴时隐藏"""
+        self._pending = None
+        self._index = None
+        for artist in (self.vline, self.hline, self.label):
+            artist.set_visible(False)
+        self.blit_manager.update()
+    
+    def disconnect(self):
+        self.canvas.mpl_disconnect(self._motion_cid)
+        self.canvas.mpl_disconnect(self._leave_cid)
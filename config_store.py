@@ -0,0 +1,233 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+配置文件存储
+- 原子写入（临时文件 + 重命名），写入中途崩溃不会损坏配置文件
+- 合并短时间内的多次修改为一次写入，磁盘IO在后台线程完成
+- 监视配置文件的外部修改，计算自选股差异并通知界面
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+def atomic_write_json(path, data, **kwargs):
+    """原子写入JSON文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stock_key(stock):
+    """自选股的唯一键"""
+    return (stock.get('market', '').lower(), stock.get('code', ''))
+
+
+def diff_watchlist(old_stocks, new_stocks):
+    """
+    计算自选股列表差异
+    返回: {'added': [...], 'removed': [...], 'changed': [...], 'reordered': bool}
+    """
+    old_map = {stock_key(s): s for s in old_stocks}
+    new_map = {stock_key(s): s for s in new_stocks}
+    
+    added = [s for k, s in new_map.items() if k not in old_map]
+    removed = [s for k, s in old_map.items() if k not in new_map]
+    changed = [s for k, s in new_map.items() if k in old_map and old_map[k] != s]
+    
+    common_old = [stock_key(s) for s in old_stocks if stock_key(s) in new_map]
+    common_new = [stock_key(s) for s in new_stocks if stock_key(s) in old_map]
+    
+    return {
+        'added': added,
+        'removed': removed,
+        'changed': changed,
+        'reordered': common_old != common_new
+    }
+
+
+class ConfigStore:
+    """配置文件存储（原子、合并写入、后台IO、外部修改热加载）"""
+    
+    def __init__(self, path, default=None, debounce=0.5, max_delay=2.0, poll_interval=1.0):
+        self.path = path
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        
+        # 外部修改回调: callback(new_config, diff)，在监视线程中调用
+        self.on_external_change = None
+        
+        self._cond = threading.Condition()
+        self._pending = None
+        self._first_request = 0
+        self._last_request = 0
+        self._running = True
+        # 本程序正在写入文件（写入期间监视线程不检查文件，flush等待写入完成）
+        self._writing = False
+        # 最近一次由本程序写入/读取的文件状态，用于区分外部修改
+        self._known_stat = None
+        
+        self.data = self._read() if os.path.exists(path) else None
+        if self.data is None:
+            self.data = default if default is not None else {}
+            self._write(self._copy(self.data))
+        
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
+        self._watcher = threading.Thread(target=self._watch_loop, daemon=True)
+        self._watcher.start()
+    
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+    
+    def _read(self):
+        """读取配置文件，解析失败返回None"""
+        try:
+            stat = self._stat()
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._known_stat = stat
+            return data
+        except (OSError, ValueError) as e:
+            print(f"读取配置文件失败: {e}")
+            return None
+    
+    def _write(self, data):
+        with self._cond:
+            self._writing = True
+        try:
+            atomic_write_json(self.path, data, indent=4, ensure_ascii=False)
+        finally:
+            with self._cond:
+                self._known_stat = self._stat()
+                self._writing = False
+                self._cond.notify_all()
+    
+    def _take_pending(self):
+        """（持有_cond时调用）等待进行中的写入完成，取出待写入的配置并标记为正在写入"""
+        while self._writing:
+            self._cond.wait()
+        pending, self._pending = self._pending, None
+        self._writing = pending is not None
+        return pending
+    
+    @staticmethod
+    def _copy(data):
+        """复制配置结构（自选股条目本身不会被原地修改，只复制容器）"""
+        copied = dict(data)
+        if isinstance(copied.get('stocks'), list):
+            copied['stocks'] = list(copied['stocks'])
+        if isinstance(copied.get('settings'), dict):
+            copied['settings'] = dict(copied['settings'])
+        return copied
+    
+    def save(self):
+        """请求保存（立即返回，短时间内的多次请求合并为一次后台写入）"""
+        snapshot = self._copy(self.data)
+        with self._cond:
+            now = time.monotonic()
+            if self._pending is None:
+                self._first_request = now
+            self._pending = snapshot
+            self._last_request = now
+            self._cond.notify_all()
+    
+    def flush(self):
+        """立即写入尚未保存的修改（程序退出前调用），后台线程正在写入时等它写完"""
+        with self._cond:
+            pending = self._take_pending()
+        if pending is not None:
+            self._write(pending)
+    
+    def close(self):
+        """停止后台线程并写入尚未保存的修改"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        # 等待后台线程结束（可能正在写入），否则退出时守护线程被终止，最后的修改丢失
+        self._writer.join()
+        self.flush()
+    
+    def _writer_loop(self):
+        """后台写入线程"""
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                
+                # 等待修改平静下来，但最长不超过max_delay
+                while self._running:
+                    now = time.monotonic()
+                    deadline = min(self._last_request + self.debounce, self._first_request + self.max_delay)
+                    if now >= deadline:
+                        break
+                    self._cond.wait(deadline - now)
+                
+                pending = self._take_pending()
+            
+            if pending is not None:
+                try:
+                    self._write(pending)
+                except Exception as e:
+                    print(f"保存配置文件失败: {e}")
+    
+    def _watch_loop(self):
+        """监视配置文件的外部修改"""
+        while self._running:
+            time.sleep(self.poll_interval)
+            
+            with self._cond:
+                # 本程序正在写入或还有未写入的修改时以本程序为准
+                if self._writing or self._pending is not None:
+                    continue
+                
+                stat = self._stat()
+                if stat is None or stat == self._known_stat:
+                    continue
+                
+                new_data = self._read()
+            
+            if new_data is None or not isinstance(new_data.get('stocks', []), list):
+                continue
+            
+            diff = diff_watchlist(self.data.get('stocks', []), new_data.get('stocks', []))
+            callback = self.on_external_change
+            if callback is None:
+                self.data = new_data
+                continue
+            
+            # 回调负责把新配置赋值给self.data
+            try:
+                callback(new_data, diff)
+            except Exception as e:
+                print(f"应用外部配置修改失败: {e}")
@@ -0,0 +1,422 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+多品种相关性分析
+- 把多个品种的收盘价对齐到同一日期索引（缺失为NaN）
+- 计算收益率矩阵、相关系数矩阵（按成对有效数据计算，停牌日不会拉低相关性）
+- 滚动相关系数（累积和实现，所有品种同时计算）
+- 协方差充分统计量可逐根K线增量更新，支持滑动窗口
+- 热力图视图：订阅行情总线的K线主题，每个交易日收盘后增量更新
+"""
+import threading
+import time
+import tkinter as tk
+from collections import deque
+
+import numpy as np
+
+from bar_store import day_numbers
+
+
+def to_day_ordinals(dates):
+    """日期字符串（YYYY-MM-DD 或 YYYYMMDD）转换为 datetime64[D] 数组"""
+    return day_numbers(dates).astype('datetime64[D]')
+
+
+def align_closes(series_map):
+    """
+    对齐多个品种的收盘价
+    series_map: 品种 -> K线列表（元素含 date、close）
+    返回: (日期数组 datetime64[D], 品种列表, 收盘价矩阵 [日期数 x 品种数]，缺失为NaN)
+    """
+    symbols = []
+    columns = []
+    for symbol, bars in series_map.items():
+        if not bars:
+            continue
+        symbols.append(symbol)
+        day = to_day_ordinals([bar['date'] for bar in bars])
+        close = np.array([bar['close'] for bar in bars], dtype=np.float64)
+        valid = ~np.isnat(day)  # 剔除日期无法解析的K线
+        columns.append((day[valid], close[valid]))
+    
+    if not columns:
+        return np.array([], dtype='datetime64[D]'), [], np.empty((0, 0))
+    
+    dates = np.unique(np.concatenate([day for day, _ in columns]))
+    closes = np.full((len(dates), len(symbols)), np.nan)
+    for col, (day, close) in enumerate(columns):
+        closes[np.searchsorted(dates, day), col] = close
+    return dates, symbols, closes
+
+
+def returns_matrix(closes, log=True):
+    """收益率矩阵（比收盘价少一行），任一端缺失时为NaN"""
+    if log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.diff(np.log(closes), axis=0)
+    return closes[1:] / closes[:-1] - 1.0
+
+
+def _pairwise_stats(returns):
+    """成对有效数据的充分统计量：n、x之和、x平方和、xy之和（均为 品种数 x 品种数）"""
+    valid = ~np.isnan(returns)
+    mask = valid.astype(np.float64)
+    x = np.where(valid, returns, 0.0)
+    
+    n = mask.T @ mask
+    sx = x.T @ mask  # sx[i, j]：i、j都有效的日期上 x_i 之和
+    sxx = (x * x).T @ mask
+    sxy = x.T @ x
+    return n, sx, sxx, sxy
+
+
+def _correlation_from_stats(n, sx, sxx, sxy, min_periods=2):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sx.T / n
+        var_i = sxx - sx * sx / n
+        corr = cov / np.sqrt(var_i * var_i.T)
+    corr[n < min_periods] = np.nan
+    np.clip(corr, -1.0, 1.0, out=corr)
+    return corr
+
+
+def correlation_matrix(returns, min_periods=20):
+    """相关系数矩阵（成对有效数据，有效样本少于min_periods的品种对为NaN）"""
+    return _correlation_from_stats(*_pairwise_stats(returns), min_periods=min_periods)
+
+
+def rolling_correlation(returns, window, against):
+    """
+    所有品种相对于第against列的滚动相关系数
+    返回: [日期数 x 品种数]，前window-1行及窗口内数据不足时为NaN
+    """
+    y = returns[:, [against]]
+    valid = ~np.isnan(returns) & ~np.isnan(y)
+    x = np.where(valid, returns, 0.0)
+    y = np.where(valid, y, 0.0)
+    
+    def window_sum(values):
+        total = np.cumsum(values, axis=0)
+        total[window:] = total[window:] - total[:-window]
+        return total
+    
+    n = window_sum(valid.astype(np.float64))
+    sx, sy = window_sum(x), window_sum(y)
+    sxx, syy, sxy = window_sum(x * x), window_sum(y * y), window_sum(x * y)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sxy - sx * sy / n
+        corr = cov / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+    corr[:window - 1] = np.nan
+    corr[n < max(2, window // 2)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+class CovarianceState:
+    """
+    可增量更新的协方差状态
+    保存成对有效数据的充分统计量，每根新K线（一行收益率）的更新代价为 O(品种数²)，
+    window不为None时滑出窗口的行会被减去
+    """
+    
+    def __init__(self, symbols, window=None):
+        self.symbols = list(symbols)
+        self.window = window
+        size = len(self.symbols)
+        self.n = np.zeros((size, size))
+        self.sx = np.zeros((size, size))
+        self.sxx = np.zeros((size, size))
+        self.sxy = np.zeros((size, size))
+        self._rows = deque()
+    
+    @classmethod
+    def from_returns(cls, symbols, returns, window=None):
+        """用历史收益率矩阵初始化（矩阵乘法，一次完成）"""
+        state = cls(symbols, window)
+        if window is not None:
+            returns = returns[-window:]
+            state._rows.extend(returns)
+        state.n, state.sx, state.sxx, state.sxy = _pairwise_stats(returns)
+        return state
+    
+    def _apply(self, row, sign):
+        valid = ~np.isnan(row)
+        mask = valid.astype(np.float64)
+        x = np.where(valid, row, 0.0)
+        self.n += sign * np.outer(mask, mask)
+        self.sx += sign * np.outer(x, mask)
+        self.sxx += sign * np.outer(x * x, mask)
+        self.sxy += sign * np.outer(x, x)
+    
+    def add(self, row):
+        """加入一行收益率（按symbols顺序，缺失为NaN）"""
+        row = np.asarray(row, dtype=np.float64)
+        self._apply(row, 1.0)
+        if self.window is not None:
+            self._rows.append(row)
+            if len(self._rows) > self.window:
+                self._apply(self._rows.popleft(), -1.0)
+    
+    def correlation(self, min_periods=20):
+        """当前相关系数矩阵"""
+        return _correlation_from_stats(self.n, self.sx, self.sxx, self.sxy, min_periods=min_periods)
+    
+    def covariance(self):
+        """当前协方差矩阵（样本协方差）"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (self.sxy - self.sx * self.sx.T / self.n) / (self.n - 1)
+
+
+class CorrelationWindow:
+    """
+    自选股相关性热力图窗口
+    打开时按历史K线计算一次；之后通过行情总线订阅各品种K线，
+    某个交易日所有品种的K线都已收盘后，按一行收益率增量更新协方差状态并重绘
+    """
+    
+    def __init__(self, parent, api, stocks, bus=None, days=250):
+        self.api = api
+        self.bus = bus
+        self.stocks = list(stocks)
+        self.days = days
+        self.is_running = True
+        
+        self.state = None
+        self.keys = []            # 矩阵各列的品种（市场:代码）
+        self.min_periods = 2
+        self.last_date = None     # 最后一个已计入协方差状态的日期
+        self.last_closes = None   # 该日各品种收盘价（缺失为NaN）
+        self.open_bars = {}       # 品种 -> {日期: 收盘价}，尚未计入的K线
+        self.latest_day = {}      # 品种 -> 收到的最新K线日期
+        self.fetched_at = {}      # 品种 -> 最近一次收到的K线的获取时间
+        self.superseded_at = {}   # 日期 -> 首次有品种出现更晚K线的时间（此后获取的该日K线已收盘）
+        self.added = 0
+        self.subscriptions = []
+        self.mailbox = None
+        
+        self.window = tk.Toplevel(parent, bg='#1e1e1e')
+        self.window.title("相关性")
+        self.window.geometry("560x520")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.window.bind('<Destroy>', self.on_destroy)
+        
+        self.status_label = tk.Label(self.window, text="加载K线数据中...", font=('Arial', 9),
+                                     bg='#1e1e1e', fg='#888888', anchor='w')
+        self.status_label.pack(fill=tk.X, padx=10, pady=5)
+        
+        threading.Thread(target=self.load, name='correlation-loader', daemon=True).start()
+    
+    @staticmethod
+    def symbol(stock):
+        return f"{stock['market']}:{stock['code']}"
+    
+    def labels(self):
+        """各列的显示名称（名称重复时附加市场和代码）"""
+        stocks = {self.symbol(stock): stock for stock in self.stocks}
+        names = [stocks[key]['name'] for key in self.keys]
+        return [name if names.count(name) == 1 else f"{name} ({key})" for name, key in zip(names, self.keys)]
+    
+    def load(self):
+        """在后台线程中加载各品种K线并计算相关系数"""
+        symbols = [(stock['market'], stock['code']) for stock in self.stocks]
+        batch = self.api.get_kline_batch(symbols, days=self.days)
+        series_map = {}
+        for stock, symbol in zip(self.stocks, symbols):
+            bars = batch[symbol]
+            if bars and not bars.degraded:
+                series_map[self.symbol(stock)] = bars
+        
+        start = time.perf_counter()
+        dates, keys, closes = align_closes(series_map)
+        min_periods = min(20, max(2, len(dates) // 4))
+        # 最后一根K线可能还在交易中，留到出现更晚的K线后再计入
+        state = CovarianceState.from_returns(keys, returns_matrix(closes[:-1])) if len(dates) > 1 else None
+        elapsed = time.perf_counter() - start
+        
+        if self.is_running:
+            self.window.after(0, lambda: self.show(dates, keys, closes, state, min_periods, elapsed))
+    
+    def show(self, dates, keys, closes, state, min_periods, elapsed):
+        """绘制热力图，并订阅各品种K线用于增量更新"""
+        if not self.is_running:
+            return
+        
+        if len(keys) < 2 or state is None:
+            self.status_label.config(text="至少需要两个有K线数据的品种", fg='red')
+            return
+        
+        self.keys = keys
+        self.state = state
+        self.min_periods = min_periods
+        self.last_date = dates[-2]
+        self.last_closes = closes[-2]
+        self.open_bars = {key: {dates[-1]: close} for key, close in zip(keys, closes[-1]) if not np.isnan(close)}
+        self.latest_day = {key: dates[-1] for key in self.open_bars}
+        self.first_date = dates[0]
+        self.days_counted = len(dates) - 1
+        
+        import matplotlib
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+        
+        corr = state.correlation(min_periods=min_periods)
+        labels = self.labels()
+        figure = Figure(figsize=(6, 5), dpi=80, facecolor='#1e1e1e')
+        ax = figure.add_subplot(111)
+        self.image = ax.imshow(corr, cmap='RdYlGn_r', vmin=-1, vmax=1)
+        ax.set_xticks(range(len(keys)))
+        ax.set_yticks(range(len(keys)))
+        ax.set_xticklabels(labels, rotation=90, color='white', fontsize=8)
+        ax.set_yticklabels(labels, color='white', fontsize=8)
+        
+        # 品种较少时标注数值
+        self.texts = {}
+        if len(keys) <= 15:
+            for i in range(len(keys)):
+                for j in range(len(keys)):
+                    self.texts[i, j] = ax.text(j, i, '', ha='center', va='center', fontsize=7, color='black')
+            self.update_texts(corr)
+        
+        colorbar = figure.colorbar(self.image, ax=ax)
+        colorbar.ax.tick_params(colors='white')
+        figure.tight_layout()
+        
+        self.canvas = FigureCanvasTkAgg(figure, self.window)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        self.elapsed = elapsed
+        self.update_status()
+        
+        if self.bus is not None:
+            from quote_bus import TkMailbox
+            self.mailbox = TkMailbox(self.window)
+            for key in keys:
+                market, code = key.split(':', 1)
+                self.subscriptions.append(self.bus.subscribe(
+                    self.bus.kline_topic(market, code), self.mailbox,
+                    lambda bars, span, key=key: self.on_bars(key, bars), interval=self.api.kline_ttl, days=2))
+    
+    def update_texts(self, corr):
+        for (i, j), text in self.texts.items():
+            text.set_text('' if np.isnan(corr[i, j]) else f'{corr[i, j]:.2f}')
+    
+    def update_status(self):
+        text = (f"{len(self.keys)} 个品种，{self.first_date} ~ {self.last_date}（{self.days_counted} 个交易日），"
+                f"计算耗时 {self.elapsed * 1000:.0f} 毫秒")
+        if self.added:
+            text += f"，已增量计入 {self.added} 根K线"
+        self.status_label.config(text=text)
+    
+    def on_bars(self, key, bars):
+        """某个品种的K线到达（Tk线程）：记录未计入的K线，把已收盘的交易日逐行计入协方差状态"""
+        if not self.is_running or not bars or bars.degraded:
+            return
+        
+        days = to_day_ordinals([bar['date'] for bar in bars])
+        pending = self.open_bars.setdefault(key, {})
+        for day, bar in zip(days, bars):
+            if day > self.last_date:
+                pending[day] = bar['close']
+        
+        valid = days[~np.isnat(days)]
+        if len(valid):
+            self.latest_day[key] = max(self.latest_day.get(key, valid.max()), valid.max())
+        self.fetched_at[key] = bars.fetched_at or time.time()
+        
+        # 任一品种出现更晚的K线时，更早的交易日开始收盘；记下时间，此后获取的该日K线都是收盘后的
+        latest = max(self.latest_day.values())
+        now = time.time()
+        for day in {day for closes in self.open_bars.values() for day in closes if day < latest}:
+            self.superseded_at.setdefault(day, now)
+        
+        # 按日期顺序计入：每个品种都要么已有更晚的K线，要么在该日收盘后重新获取过
+        # （此时该日的K线是收盘价，没有该日K线说明停牌，记为缺失）；有品种还没有更新时等它下一次投递
+        added = 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for day in sorted(self.superseded_at):
+                closed_at = self.superseded_at[day]
+                if not all(self.latest_day.get(k, self.last_date) > day or self.fetched_at.get(k, 0) >= closed_at
+                           for k in self.keys):
+                    break
+                del self.superseded_at[day]
+                closes = np.array([self.open_bars.get(k, {}).pop(day, np.nan) for k in self.keys])
+                self.state.add(np.log(closes) - np.log(self.last_closes))
+                self.last_date, self.last_closes = day, closes
+                self.days_counted += 1
+                self.added += 1
+                added += 1
+        if not added:
+            return
+        
+        corr = self.state.correlation(min_periods=self.min_periods)
+        self.image.set_data(corr)
+        self.update_texts(corr)
+        self.canvas.draw_idle()
+        self.update_status()
+    
+    def on_destroy(self, event):
+        # 父窗口被销毁时窗口随之销毁，也要取消订阅
+        if event.widget is self.window and self.is_running:
+            self.close()
+    
+    def close(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        for subscription in self.subscriptions:
+            subscription.cancel()
+        if self.mailbox:
+            self.mailbox.close()
+        try:
+            self.window.destroy()
+        except tk.TclError:
+            pass
+
+if __name__ == '__main__':
+    # 性能测试：1000个品种 x 5年日线（随机数据，约5%缺失）
+    rng = np.random.default_rng(0)
+    days, count = 1250, 1000
+    factor = rng.normal(0, 0.01, (days, 1))
+    prices = 10 * np.exp(np.cumsum(factor + rng.normal(0, 0.015, (days, count)), axis=0))
+    prices[rng.random((days, count)) < 0.05] = np.nan
+    all_dates = np.datetime64('2021-01-01') + np.arange(days)
+    
+    series = {}
+    for col in range(count):
+        keep = ~np.isnan(prices[:, col])
+        series[f'S{col:04d}'] = [{'date': str(d), 'close': c} for d, c in zip(all_dates[keep], prices[keep, col])]
+    
+    start = time.perf_counter()
+    dates, symbols, closes = align_closes(series)
+    aligned = time.perf_counter()
+    returns = returns_matrix(closes)
+    corr = correlation_matrix(returns)
+    full = time.perf_counter()
+    rolling = rolling_correlation(returns, 60, against=0)
+    rolled = time.perf_counter()
+    state = CovarianceState.from_returns(symbols, returns[:-1], window=250)
+    state.add(returns[-1])
+    incremental = time.perf_counter()
+    
+    print(f"对齐: {(aligned - start) * 1000:.0f} 毫秒")
+    print(f"收益率+相关系数矩阵 ({count}x{count}): {(full - aligned) * 1000:.0f} 毫秒")
+    print(f"滚动相关系数 (窗口60): {(rolled - full) * 1000:.0f} 毫秒")
+    print(f"增量协方差初始化+一根K线更新: {(incremental - rolled) * 1000:.0f} 毫秒")
+    print(f"平均相关系数: {np.nanmean(corr[np.triu_indices(count, 1)]):.3f}")
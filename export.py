@@ -0,0 +1,244 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+导出K线存储和行情记录为 Arrow IPC / Parquet
+- 逐个品种（逐个行情文件）流式写入，不会把全部数据读入内存
+- 支持列投影和日期范围过滤（K线按二分查找截取，不扫描范围外的数据）
+- Arrow IPC 为随机访问文件格式，可以内存映射，pandas / polars 可零拷贝读取：
+    pyarrow.ipc.open_file(pyarrow.memory_map('bars.arrow')).read_all()
+    polars.read_ipc('bars.arrow', memory_map=True)
+
+用法:
+    python export.py bars bars.arrow --start 2024-01-01 --columns symbol,date,close
+    python export.py bars bars.parquet --format parquet
+    python export.py quotes quotes.arrow --start 2026-01-01
+需要安装 pyarrow（可选依赖）
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from bar_store import BarStore, day_number
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("导出Arrow/Parquet需要安装pyarrow: pip install pyarrow")
+
+
+def bar_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ('symbol', pa.string()),
+        ('market', pa.string()),
+        ('date', pa.date32()),
+        ('open', pa.float64()),
+        ('high', pa.float64()),
+        ('low', pa.float64()),
+        ('close', pa.float64()),
+        ('volume', pa.float64())
+    ])
+
+
+def quote_schema():
+    _require_pyarrow()
+    return pa.schema([
+        ('time', pa.timestamp('ms', tz='UTC')),
+        ('market', pa.string()),
+        ('code', pa.string()),
+        ('price', pa.float64()),
+        ('open', pa.float64()),
+        ('high', pa.float64()),
+        ('low', pa.float64()),
+        ('yestclose', pa.float64()),
+        ('percent', pa.float64()),
+        ('volume', pa.float64()),
+        ('turnover', pa.float64())
+    ])
+
+
+def project(schema, columns):
+    """列投影：返回只含columns的schema（保持columns给出的顺序）"""
+    if not columns:
+        return schema
+    unknown = [c for c in columns if schema.get_field_index(c) < 0]
+    if unknown:
+        raise ValueError(f"未知的列: {', '.join(unknown)}")
+    return pa.schema([schema.field(c) for c in columns])
+
+
+class StreamingWriter:
+    """Arrow IPC文件或Parquet的流式写入器（逐批写入）"""
+    
+    def __init__(self, path, schema, format='arrow'):
+        _require_pyarrow()
+        self.path = path
+        self.schema = schema
+        self.format = format
+        self.rows = 0
+        self.batches = 0
+        
+        if format == 'arrow':
+            self._sink = pa.OSFile(path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        elif format == 'parquet':
+            self._sink = None
+            self._writer = pq.ParquetWriter(path, schema, compression='zstd')
+        else:
+            raise ValueError(f"不支持的格式: {format}")
+    
+    def write(self, columns):
+        """写入一批数据：列名 -> 数组（只取schema中的列）"""
+        batch = pa.record_batch([columns[field.name] for field in self.schema], schema=self.schema)
+        if batch.num_rows == 0:
+            return
+        if self.format == 'arrow':
+            self._writer.write_batch(batch)
+        else:
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        self.rows += batch.num_rows
+        self.batches += 1
+    
+    def close(self):
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def export_bars(store, path, format='arrow', symbols=None, start=None, end=None, columns=None):
+    """
+    导出K线存储
+    symbols: [(市场, 代码), ...]，默认全部
+    start/end: 日期字符串（闭区间）
+    columns: 列投影，默认全部列
+    返回导出的行数
+    """
+    schema = project(bar_schema(), columns)
+    names = set(schema.names)
+    
+    with StreamingWriter(path, schema, format) as writer:
+        for market, code in symbols or store.symbols():
+            bars = store.read(market, code, start, end, mmap=True)
+            if len(bars) == 0:
+                continue
+            
+            batch = {}
+            if 'symbol' in names:
+                batch['symbol'] = pa.array([code] * len(bars), pa.string())
+            if 'market' in names:
+                batch['market'] = pa.array([market] * len(bars), pa.string())
+            if 'date' in names:
+                batch['date'] = pa.array(np.ascontiguousarray(bars['day']).astype(np.int32), pa.date32())
+            for field in ('open', 'high', 'low', 'close', 'volume'):
+                if field in names:
+                    batch[field] = pa.array(np.ascontiguousarray(bars[field]), pa.float64())
+            writer.write(batch)
+        return writer.rows
+
+
+def export_quotes(directory, path, format='arrow', start=None, end=None, columns=None, batch_rows=65536):
+    """
+    导出行情记录（quotes/YYYY-MM-DD.jsonl）
+    start/end: 日期字符串（闭区间），按文件名过滤，范围外的文件不会打开
+    返回导出的行数
+    """
+    schema = project(quote_schema(), columns)
+    names = schema.names
+    start_day = day_number(start) if start else None
+    end_day = day_number(end) if end else None
+    
+    files = []
+    for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if not name.endswith('.jsonl'):
+            continue
+        day = day_number(name[:-len('.jsonl')])
+        if (start_day is None or day >= start_day) and (end_day is None or day <= end_day):
+            files.append(os.path.join(directory, name))
+    
+    def flush(rows):
+        batch = {}
+        for field in schema:
+            values = [row.get(field.name) for row in rows]
+            if field.name == 'time':
+                values = [int(v * 1000) if v is not None else None for v in values]
+            batch[field.name] = pa.array(values, field.type)
+        writer.write(batch)
+    
+    with StreamingWriter(path, schema, format) as writer:
+        rows = []
+        for file_path in files:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 写入中断的最后一行
+                    rows.append({name: record.get(name) for name in names})
+                    if len(rows) >= batch_rows:
+                        flush(rows)
+                        rows = []
+        if rows:
+            flush(rows)
+        return writer.rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导出K线存储/行情记录为Arrow IPC或Parquet')
+    parser.add_argument('source', choices=['bars', 'quotes'], help='导出K线存储或行情记录')
+    parser.add_argument('output', help='输出文件')
+    parser.add_argument('--format', choices=['arrow', 'parquet'], help='输出格式（默认按扩展名判断）')
+    parser.add_argument('--start', help='开始日期 YYYY-MM-DD')
+    parser.add_argument('--end', help='结束日期 YYYY-MM-DD')
+    parser.add_argument('--columns', help='导出的列，逗号分隔')
+    parser.add_argument('--symbols', help='只导出这些品种（逗号分隔的 市场:代码，仅K线）')
+    parser.add_argument('--store', default='bars', help='K线存储目录')
+    parser.add_argument('--quotes-dir', default='quotes', help='行情记录目录')
+    args = parser.parse_args()
+    
+    format = args.format or ('parquet' if args.output.endswith('.parquet') else 'arrow')
+    columns = [c.strip() for c in args.columns.split(',')] if args.columns else None
+    
+    start_time = time.perf_counter()
+    if args.source == 'bars':
+        symbols = None
+        if args.symbols:
+            symbols = [tuple(item.strip().lower().split(':', 1)) for item in args.symbols.split(',')]
+            symbols = [(market, code.upper()) for market, code in symbols]
+        rows = export_bars(BarStore(args.store), args.output, format, symbols, args.start, args.end, columns)
+    else:
+        rows = export_quotes(args.quotes_dir, args.output, format, args.start, args.end, columns)
+    
+    print(f"已导出 {rows} 行到 {args.output}（{format}），耗时 {time.perf_counter() - start_time:.2f} 秒")
+
+
+if __name__ == '__main__':
+    main()
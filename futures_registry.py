@@ -0,0 +1,158 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+期货合约注册表
+从东方财富各交易所的合约列表批量发现期货合约并缓存到本地，
+预先计算 用户代码 -> (东方财富secid, 名称) 的索引，解析为O(1)字典查找
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from config_store import atomic_write_json
+
+# 期货交易所列表：东方财富市场ID -> 说明
+FUTURES_MARKETS = {
+    '113': '上期所', '114': '大商所', '115': '郑商所', '142': '上期能源', '220': '中金所', '225': '广期所',
+    '101': 'COMEX', '102': 'NYMEX', '103': 'CBOT', '108': 'NYBOT', '109': 'LME',
+    '110': 'SGX', '111': 'TOCOM', '112': 'ICE', '122': '国际现货'
+}
+
+# 东方财富市场过滤串
+FUTURES_FS = ','.join(f'm:{market_id}' for market_id in FUTURES_MARKETS)
+
+# 国际期货主力连续合约在东方财富的代码后缀，如 GC00Y
+MAIN_CONTRACT_SUFFIX = '00Y'
+
+# 内置合约（用户代码 -> (市场ID, 东方财富代码, 名称)），优先于自动发现的结果
+BUILTIN_CONTRACTS = {
+    'XAUUSD': ('122', 'XAU', '黄金/美元'),
+    'XAU': ('122', 'XAU', '黄金/美元'),
+    'XAGUSD': ('122', 'XAG', '白银/美元'),
+    'XAG': ('122', 'XAG', '白银/美元'),
+    'CL': ('113', 'cl', 'WTI原油'),
+    'NG': ('113', 'ng', '天然气'),
+    'GC': ('113', 'gc', 'COMEX黄金'),
+    'SI': ('113', 'si', 'COMEX白银')
+}
+
+# 缓存刷新周期（秒）
+REGISTRY_TTL = 24 * 3600
+
+FuturesContract = namedtuple('FuturesContract', ['code', 'secid', 'name'])
+
+
+class FuturesRegistry:
+    """期货合约注册表"""
+    
+    def __init__(self, api, cache_file='futures.json'):
+        self.api = api
+        self.cache_file = cache_file
+        
+        # 自动发现的合约：[[东方财富代码, 市场ID, 名称], ...]
+        self._discovered = []
+        self.updated = 0
+        
+        self._index = {}
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        
+        self.load()
+        self._rebuild()
+    
+    def __len__(self):
+        return len(self._index)
+    
+    def resolve(self, code):
+        """解析用户代码，未知合约返回None"""
+        return self._index.get(code.upper())
+    
+    def _rebuild(self):
+        """根据内置合约和发现的合约重建索引（整体替换，读取方无需加锁）"""
+        index = {}
+        
+        for raw_code, market_id, name in self._discovered:
+            contract = FuturesContract(raw_code.upper(), f'{market_id}.{raw_code}', name)
+            index.setdefault(raw_code.upper(), contract)
+            
+            # 国际主力连续合约同时登记不带后缀的简称（如 GC00Y -> GC）
+            if raw_code.upper().endswith(MAIN_CONTRACT_SUFFIX):
+                index.setdefault(raw_code.upper()[:-len(MAIN_CONTRACT_SUFFIX)], contract)
+        
+        for code, (market_id, real_code, name) in BUILTIN_CONTRACTS.items():
+            index[code] = FuturesContract(code, f'{market_id}.{real_code}', name)
+        
+        self._index = index
+    
+    def load(self):
+        """从本地缓存加载"""
+        if not os.path.exists(self.cache_file):
+            return
+        
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._discovered = [tuple(item) for item in data.get('contracts', [])]
+            self.updated = data.get('updated', 0)
+        except Exception as e:
+            print(f"加载期货合约缓存失败: {e}")
+    
+    def save(self):
+        """保存到本地缓存"""
+        with self._lock:
+            data = {'updated': self.updated, 'contracts': [list(item) for item in self._discovered]}
+        atomic_write_json(self.cache_file, data, ensure_ascii=False)
+    
+    def refresh(self, force=False):
+        """从交易所合约列表批量发现合约"""
+        if not force and time.time() - self.updated < REGISTRY_TTL:
+            return False
+        
+        discovered = []
+        try:
+            for row in self.api.get_security_list(FUTURES_FS):
+                raw_code = str(row.get('f12', '')).strip()
+                market_id = str(row.get('f13', '')).strip()
+                name = str(row.get('f14', '')).strip()
+                if raw_code and raw_code != '-' and market_id:
+                    discovered.append((raw_code, market_id, name))
+        except Exception as e:
+            print(f"发现期货合约失败: {e}")
+            return False
+        
+        if not discovered:
+            return False
+        
+        with self._lock:
+            self._discovered = discovered
+            self.updated = time.time()
+            self._rebuild()
+        
+        try:
+            self.save()
+        except Exception as e:
+            print(f"保存期货合约缓存失败: {e}")
+        return True
+    
+    def refresh_in_background(self, force=False):
+        """在后台线程中刷新"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        
+        self._refresh_thread = threading.Thread(target=self.refresh, args=(force,), name='futures-registry',
+                                                daemon=True)
+        self._refresh_thread.start()
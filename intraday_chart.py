@@ -14,94 +14,229 @@
 
 """
 分时图绘制模块
+价格保存在预分配的NumPy数组中，价格线是一个Line2D，涨跌填充各用一次带where掩码的fill_between；
+append_minutes() 追加分钟数据时只更新这几个图元的数据并用blit重绘，不重建图表；
+十字光标与这些图元共用同一个背景缓存（见 chart_interaction.py）
 """
 import tkinter as tk
+import numpy as np
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+from metrics import RENDER_TIME, timed
+from chart_interaction import BlitManager, Crosshair
+import matplotlib
+
+# A股一个交易日的分钟数（9:30-11:30、13:00-15:00，含开盘第一分钟）
+DEFAULT_SESSION_MINUTES = 241
+
+# x轴刻度间隔（分钟）
+TICK_INTERVAL = 30
+
+UP_COLOR = '#ff4d4f'
+DOWN_COLOR = '#52c41a'
+
+
+class IntradayPlot:
+    """
+    分时图的绘制逻辑（与Tk无关，可以用于任何matplotlib画布，包括离屏的Agg画布）
+    """
+    
+    def __init__(self, figure, canvas, intraday_data, session_minutes=DEFAULT_SESSION_MINUTES, yestclose=None):
+        """
+        yestclose: 昨收价；不传时取分时数据中的昨收，没有分时数据时取之后追加的第一个带昨收的点
+        """
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.add_subplot(111)
+        
+        if not yestclose:
+            yestclose = next((item['yestclose'] for item in intraday_data if item.get('yestclose')), 0.0)
+        self.yestclose = yestclose
+        self.capacity = max(session_minutes, len(intraday_data))
+        self.prices = np.full(self.capacity, np.nan)
+        self.times = [item['time'] for item in intraday_data]
+        self.count = len(intraday_data)
+        self.prices[:self.count] = [item['price'] for item in intraday_data]
+        self.x = np.arange(self.capacity, dtype=np.float64)
+        
+        self.line = None
+        self.base_line = None
+        self.up_fill = None
+        self.down_fill = None
+        self._labelled_ticks = 0
+        self.full_draws = 0
+        
+        self.blit_manager = BlitManager(canvas, self.ax)
+        self.draw_intraday()
+        self.crosshair = Crosshair(self.blit_manager, self.x[:self.count], self.format_minute)
+    
+    @property
+    def blits(self):
+        return self.blit_manager.blits
+    
+    @timed(RENDER_TIME, span_name='render', view='intraday')
+    def draw_intraday(self):
+        """绘制分时图（全部图元只创建一次）"""
+        ax = self.ax
+        ax.set_facecolor('#1e1e1e')
+        
+        # 价格线和涨跌填充设为animated，由blit单独重绘
+        x, prices = self.x[:self.count], self.prices[:self.count]
+        self.line, = ax.plot(x, prices, color='#2196F3', linewidth=1.5, animated=True)
+        self.up_fill, self.down_fill = self._fill(x, prices)
+        for artist in (self.up_fill, self.down_fill, self.line):
+            self.blit_manager.add(artist)
+        
+        # 昨收平线
+        self.base_line = ax.axhline(y=self.yestclose, color='#888888', linestyle='--', linewidth=0.8, alpha=0.5)
+        
+        # x轴固定为整个交易日，追加数据时不需要重新缩放
+        ax.set_xlim(0, self.capacity - 1)
+        self._update_ylim(force=True)
+        self._update_ticks()
+        
+        ax.tick_params(axis='y', colors='white', labelsize=8)
+        ax.grid(True, alpha=0.2, color='#444444', linestyle='--', linewidth=0.5)
+        for spine in ax.spines.values():
+            spine.set_edgecolor('#444444')
+        ax.set_title('分时图', color='white', fontsize=10, pad=10)
+        ax.set_ylabel('价格', color='white', fontsize=9)
+        self.figure.tight_layout()
+    
+    def _fill(self, x, prices):
+        """涨跌填充：各用一次带where掩码的fill_between"""
+        up = self.ax.fill_between(x, prices, self.yestclose, where=prices >= self.yestclose,
+                                  interpolate=True, color=UP_COLOR, alpha=0.1, linewidth=0, animated=True)
+        down = self.ax.fill_between(x, prices, self.yestclose, where=prices < self.yestclose,
+                                    interpolate=True, color=DOWN_COLOR, alpha=0.1, linewidth=0, animated=True)
+        return up, down
+    
+    def _update_fill(self, x, prices):
+        """
+        更新涨跌填充（直接设置多边形顶点，全部为NumPy运算）
+        在价格穿越昨收线的位置插入交点，涨区域为 max(价格, 昨收) 与昨收之间，跌区域同理
+        """
+        base = self.yestclose
+        diff = prices - base
+        crossing = np.nonzero(diff[:-1] * diff[1:] < 0)[0]
+        if len(crossing):
+            cross_x = x[crossing] + diff[crossing] / (diff[crossing] - diff[crossing + 1])
+            x = np.insert(x, crossing + 1, cross_x)
+            prices = np.insert(prices, crossing + 1, base)
+        
+        baseline = np.column_stack([x[::-1], np.full(len(x), base)])
+        self.up_fill.set_verts([np.concatenate([np.column_stack([x, np.maximum(prices, base)]), baseline])])
+        self.down_fill.set_verts([np.concatenate([np.column_stack([x, np.minimum(prices, base)]), baseline])])
+    
+    def _update_ylim(self, force=False):
+        """价格超出当前y轴范围时扩展（留出边距），返回是否改变"""
+        prices = self.prices[:self.count]
+        if self.count:
+            low = min(np.nanmin(prices), self.yestclose)
+            high = max(np.nanmax(prices), self.yestclose)
+        else:
+            low = high = self.yestclose
+        
+        bottom, top = self.ax.get_ylim()
+        if not force and bottom <= low and high <= top:
+            return False
+        
+        margin = max((high - low) * 0.1, abs(self.yestclose) * 0.002, 0.01)
+        self.ax.set_ylim(low - margin, high + margin)
+        return True
+    
+    def _update_ticks(self):
+        """每TICK_INTERVAL分钟一个刻度，只标注已有数据的时间"""
+        ticks = list(range(0, self.capacity, TICK_INTERVAL))
+        labels = [self.times[i] if i < self.count else '' for i in ticks]
+        self.ax.set_xticks(ticks)
+        self.ax.set_xticklabels(labels, rotation=45, ha='right', color='white', fontsize=8)
+        self._labelled_ticks = sum(1 for i in ticks if i < self.count)
+    
+    def format_minute(self, index):
+        """十字光标提示文本"""
+        price = self.prices[index]
+        percent = (price / self.yestclose - 1) * 100 if self.yestclose else 0
+        return f"{self.times[index]}\n价格 {price:.2f}\n涨跌 {percent:+.2f}%"
+    
+    def append_minutes(self, points):
+        """
+        追加分钟数据：points为 [{'time', 'price'}, ...]，点中可以带 'yestclose'（还没有昨收价时使用）
+        一般情况下只更新价格线和填充并blit；价格超出y轴范围、超出交易日长度或需要新的时间刻度时才完整重绘
+        """
+        if not points:
+            return
+        
+        full_redraw = False
+        if not self.yestclose:
+            # 创建时没有分时数据，昨收价取第一个带昨收的点，重设昨收线和y轴
+            yestclose = next((point['yestclose'] for point in points if point.get('yestclose')), 0.0)
+            if yestclose:
+                self.yestclose = yestclose
+                self.base_line.set_ydata([yestclose, yestclose])
+                full_redraw = True
+        
+        needed = self.count + len(points)
+        if needed > self.capacity:
+            # 超出预设的交易日长度（例如期货夜盘），扩容并重新设置x轴
+            self.capacity = max(needed, self.capacity * 2)
+            self.prices = np.concatenate([self.prices, np.full(self.capacity - len(self.prices), np.nan)])
+            self.x = np.arange(self.capacity, dtype=np.float64)
+            self.ax.set_xlim(0, self.capacity - 1)
+            full_redraw = True
+        
+        self.prices[self.count:needed] = [point['price'] for point in points]
+        self.times.extend(point['time'] for point in points)
+        self.count = needed
+        
+        x, prices = self.x[:self.count], self.prices[:self.count]
+        self.line.set_data(x, prices)
+        self._update_fill(x, prices)
+        self.crosshair.xs = x
+        
+        full_redraw = self._update_ylim(force=full_redraw) or full_redraw
+        if full_redraw or (self.count - 1) // TICK_INTERVAL + 1 != self._labelled_ticks:
+            self._update_ticks()
+            full_redraw = True
+        
+        if full_redraw or not self.blit_manager.ready:
+            self.full_draws += 1
+            self.canvas.draw_idle()
+        else:
+            self.blit()
+    
+    def blit(self):
+        """恢复背景并只重绘animated图元（包括十字光标）"""
+        self.blit_manager.update()
+
 
 class IntradayChart(tk.Frame):
     """分时图组件"""
     
-    def __init__(self, parent, intraday_data, **kwargs):
+    def __init__(self, parent, intraday_data, session_minutes=DEFAULT_SESSION_MINUTES, **kwargs):
         super().__init__(parent, **kwargs)
         
         self.intraday_data = intraday_data
+        self.session_minutes = session_minutes
         self.setup_chart()
     
     def setup_chart(self):
         """设置图表"""
         # 设置matplotlib中文字体和样式
-        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
-        plt.rcParams['axes.unicode_minus'] = False
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
+        matplotlib.rcParams['axes.unicode_minus'] = False
         
         # 创建图表
         self.figure = Figure(figsize=(6, 4), dpi=80, facecolor='#1e1e1e')
-        self.ax = self.figure.add_subplot(111)
-        
-        # 设置背景色
-        self.ax.set_facecolor('#1e1e1e')
         self.figure.patch.set_facecolor('#1e1e1e')
         
-        # 绘制分时图
-        self.draw_intraday()
-        
-        # 创建画布
+        # 创建画布并绘制分时图
         self.canvas = FigureCanvasTkAgg(self.figure, self)
+        self.plot = IntradayPlot(self.figure, self.canvas, self.intraday_data or [], self.session_minutes)
+        self.ax = self.plot.ax
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
     
-    def draw_intraday(self):
-        """绘制分时图"""
-        if not self.intraday_data:
-            return
-        
-        # 提取数据
-        prices = [item['price'] for item in self.intraday_data]
-        yestclose = self.intraday_data[0]['yestclose']
-        
-        # 绘制价格曲线
-        self.ax.plot(range(len(prices)), prices, color='#2196F3', linewidth=1.5)
-        
-        # 绘制昨收平线
-        self.ax.axhline(y=yestclose, color='#888888', linestyle='--', linewidth=0.8, alpha=0.5)
-        
-        # 填充涨跌区域
-        for i in range(len(prices)):
-            if prices[i] > yestclose:
-                self.ax.fill_between([i, i+1] if i < len(prices)-1 else [i], yestclose, prices[i], 
-                                    color='#ff4d4f', alpha=0.1)
-            else:
-                self.ax.fill_between([i, i+1] if i < len(prices)-1 else [i], prices[i], yestclose,
-                                    color='#52c41a', alpha=0.1)
-        
-        # 设置x轴标签（时间）
-        if len(self.intraday_data) > 10:
-            step = len(self.intraday_data) // 6
-            x_ticks = list(range(0, len(self.intraday_data), step))
-            x_labels = [self.intraday_data[i]['time'] for i in x_ticks]
-        else:
-            x_ticks = list(range(len(self.intraday_data)))
-            x_labels = [item['time'] for item in self.intraday_data]
-        
-        self.ax.set_xticks(x_ticks)
-        self.ax.set_xticklabels(x_labels, rotation=45, ha='right', color='white', fontsize=8)
-        
-        # 设置y轴标签颜色
-        self.ax.tick_params(axis='y', colors='white', labelsize=8)
-        
-        # 设置网格
-        self.ax.grid(True, alpha=0.2, color='#444444', linestyle='--', linewidth=0.5)
-        
-        # 设置边框颜色
-        for spine in self.ax.spines.values():
-            spine.set_edgecolor('#444444')
-        
-        # 设置标题
-        self.ax.set_title('分时图', color='white', fontsize=10, pad=10)
-        
-        # 设置y轴标签
-        self.ax.set_ylabel('价格', color='white', fontsize=9)
-        
-        # 自动调整布局
-        self.figure.tight_layout()
+    def append_minutes(self, points):
+        """追加分钟数据（见 IntradayPlot.append_minutes）"""
+        self.plot.append_minutes(points)
@@ -14,114 +14,80 @@
 
 """
 K线图绘制模块
-使用matplotlib在tkinter中绘制K线图
+使用matplotlib在tkinter中绘制K线图，绘制逻辑（KLinePlot）与Tk无关，数据更新时在同一个Figure上重绘
+影线和实体各用一个集合图元绘制（vlines + PolyCollection），鼠标悬停时显示十字光标和当日数据（见 chart_interaction.py）
+数据在设置时转换为 BarSeries（日期只解析一次，刻度标签按序列缓存），重绘时不再解析日期字符串
 """
 import tkinter as tk
+import numpy as np
+from matplotlib.collections import PolyCollection
 from matplotlib.figure import Figure
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-import matplotlib.dates as mdates
-from datetime import datetime
+from metrics import RENDER_TIME, timed
+from chart_interaction import BlitManager, Crosshair
+from bar_store import BarSeries
+import matplotlib
 
-class KLineChart(tk.Frame):
-    """K线图组件"""
-    
-    def __init__(self, parent, kline_data, **kwargs):
-        super().__init__(parent, **kwargs)
-        
-        self.kline_data = kline_data
-        self.setup_chart()
+UP_COLOR = '#ff4d4f'
+DOWN_COLOR = '#52c41a'
+
+class KLinePlot:
+    """
+    K线图的绘制逻辑（与Tk无关，可以用于任何matplotlib画布，包括离屏的Agg画布）
+    """
     
-    def setup_chart(self):
-        """设置图表"""
-        # 设置matplotlib中文字体和样式
-        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
-        plt.rcParams['axes.unicode_minus'] = False
-        
-        # 创建图表
-        self.figure = Figure(figsize=(6, 4), dpi=80, facecolor='#1e1e1e')
-        self.ax = self.figure.add_subplot(111)
+    def __init__(self, figure, canvas, kline_data):
+        self.figure = figure
+        self.canvas = canvas
+        self.ax = figure.add_subplot(111)
         
         # 设置背景色
         self.ax.set_facecolor('#1e1e1e')
         self.figure.patch.set_facecolor('#1e1e1e')
         
+        # 十字光标
+        self.blit_manager = BlitManager(canvas, self.ax)
+        self.crosshair = None
+        
         # 绘制K线
+        self.set_data(kline_data)
         self.draw_kline()
-        
-        # 创建画布
-        self.canvas = FigureCanvasTkAgg(self.figure, self)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
     
+    def set_data(self, kline_data):
+        """设置数据：K线字典列表或 BarSeries"""
+        self.kline_data = kline_data
+        if isinstance(kline_data, BarSeries):
+            self.series = kline_data
+        else:
+            self.series = BarSeries.from_bars(kline_data or [])
+    
+    @timed(RENDER_TIME, span_name='render', view='kline')
     def draw_kline(self):
         """绘制K线图"""
-        if not self.kline_data:
+        series = self.series
+        if not len(series):
             return
         
-        # 准备数据
-        dates = []
-        opens = []
-        closes = []
-        highs = []
-        lows = []
-        
-        for item in self.kline_data:
-            # 解析日期
-            date_str = item['date']
-            try:
-                date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            except:
-                try:
-                    date_obj = datetime.strptime(date_str, '%Y%m%d')
-                except:
-                    continue
-            
-            dates.append(date_obj)
-            opens.append(item['open'])
-            closes.append(item['close'])
-            highs.append(item['high'])
-            lows.append(item['low'])
-        
-        if not dates:
-            return
+        opens, closes, highs, lows = series['open'], series['close'], series['high'], series['low']
+        x = np.arange(len(series))
         
-        # 绘制K线
+        # 绘制K线：上涨或平盘红色，下跌绿色
+        colors = np.where(closes >= opens, UP_COLOR, DOWN_COLOR)
         width = 0.6
         
-        for i in range(len(dates)):
-            # 判断涨跌
-            if closes[i] >= opens[i]:
-                # 上涨或平盘 - 红色
-                color = '#ff4d4f'
-                body_color = '#ff4d4f'
-            else:
-                # 下跌 - 绿色
-                color = '#52c41a'
-                body_color = '#52c41a'
-            
-            # 绘制上下影线
-            self.ax.plot([i, i], [lows[i], highs[i]], color=color, linewidth=1)
-            
-            # 绘制实体
-            height = abs(closes[i] - opens[i])
-            bottom = min(opens[i], closes[i])
-            
-            rect = Rectangle((i - width/2, bottom), width, height,
-                           facecolor=body_color, edgecolor=color, linewidth=1)
-            self.ax.add_patch(rect)
-        
-        # 设置x轴标签
-        if len(dates) > 10:
-            # 如果数据点太多，只显示部分日期
-            step = len(dates) // 10
-            x_ticks = list(range(0, len(dates), step))
-            x_labels = [dates[i].strftime('%m-%d') for i in x_ticks]
-        else:
-            x_ticks = list(range(len(dates)))
-            x_labels = [d.strftime('%m-%d') for d in dates]
+        # 上下影线（一个LineCollection）
+        self.ax.vlines(x, lows, highs, colors=colors, linewidth=1)
+        
+        # 实体（一个PolyCollection，顶点一次性计算），平盘时高度为0，由边框画出一条横线
+        left, right = x - width / 2, x + width / 2
+        bottom, top = np.minimum(opens, closes), np.maximum(opens, closes)
+        verts = np.stack([np.column_stack(pair) for pair in
+                          ((left, bottom), (left, top), (right, top), (right, bottom))], axis=1)
+        self.ax.add_collection(PolyCollection(verts, facecolors=colors, edgecolors=colors, linewidths=1))
+        self.ax.autoscale_view()
         
+        # 设置x轴标签（数据点太多时只显示部分日期）
+        x_ticks, x_labels = series.tick_labels(max_ticks=10, fmt='%m-%d')
         self.ax.set_xticks(x_ticks)
         self.ax.set_xticklabels(x_labels, rotation=45, ha='right', color='white', fontsize=8)
         
@@ -143,13 +109,63 @@ class KLineChart(tk.Frame):
         
         # 自动调整布局
         self.figure.tight_layout()
+        
+        # 十字光标（ax.clear()会移除旧图元，需要重新创建）
+        if self.crosshair is None:
+            self.crosshair = Crosshair(self.blit_manager, x, self.format_bar)
+        else:
+            self.crosshair.reset(x, self.format_bar)
+    
+    def format_bar(self, index):
+        """十字光标提示文本"""
+        bar = self.series.array[index]
+        open_, close, high, low = bar['open'], bar['close'], bar['high'], bar['low']
+        previous = self.series['close'][index - 1] if index > 0 else open_
+        percent = (close / previous - 1) * 100 if previous else 0
+        return (f"{self.series.date(index)}\n"
+                f"开 {open_:.2f}  收 {close:.2f}\n"
+                f"高 {high:.2f}  低 {low:.2f}\n"
+                f"涨跌 {percent:+.2f}%")
     
     def update_data(self, kline_data):
-        """更新数据"""
-        self.kline_data = kline_data
+        """更新数据（在同一个坐标轴上重绘，不创建新的Figure）"""
+        self.set_data(kline_data)
         self.ax.clear()
+        self.ax.set_facecolor('#1e1e1e')
         self.draw_kline()
+        self.canvas.draw_idle()
+
+
+class KLineChart(tk.Frame):
+    """K线图组件"""
+    
+    def __init__(self, parent, kline_data, **kwargs):
+        super().__init__(parent, **kwargs)
+        
+        self.kline_data = kline_data
+        self.setup_chart()
+    
+    def setup_chart(self):
+        """设置图表"""
+        # 设置matplotlib中文字体和样式
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+        
+        # 创建图表
+        self.figure = Figure(figsize=(6, 4), dpi=80, facecolor='#1e1e1e')
+        
+        # 创建画布并绘制K线
+        self.canvas = FigureCanvasTkAgg(self.figure, self)
+        self.plot = KLinePlot(self.figure, self.canvas, self.kline_data)
+        self.ax = self.plot.ax
         self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    
+    def update_data(self, kline_data):
+        """更新数据（见 KLinePlot.update_data）"""
+        self.kline_data = kline_data
+        self.plot.update_data(kline_data)
+
 
 if __name__ == "__main__":
     # 测试代码
@@ -0,0 +1,100 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+K线视图的数据流（与Tk无关，主程序和soak测试共用）
+- 同一时刻只有一个K线订阅，切换股票或复权方式时替换之前的订阅
+- 第一次有数据时创建图表，之后的数据在同一个图表（同一个Figure）上重绘
+- 没有数据（数据源异常）时销毁图表，下次有数据时重新创建
+界面部分由子类实现：create_chart / update_status / show_message / clear
+"""
+from metrics import TRACER
+
+
+class KLineView:
+    """K线视图：订阅K线主题，创建并复用图表"""
+    
+    def __init__(self, bus, mailbox, interval, days=30):
+        self.bus = bus
+        self.mailbox = mailbox
+        self.interval = interval
+        self.days = days
+        self.chart = None
+        self.subscription = None
+        
+        self.created = 0  # 创建图表的次数
+        self.updated = 0  # 在已有图表上重绘的次数
+    
+    def load(self, market, code, adjust='none', is_current=None):
+        """
+        订阅K线主题（替换之前的订阅）；已有数据时立即显示，缓存过期后总线重新获取并再次投递
+        同一品种的K线主题不区分复权方式，切换复权方式时总线在本地复权，不重新下载
+        is_current: 投递时调用，返回False表示已切换股票或显示模式，不再显示
+        已有图表时保留旧图，数据到达后在同一个图上重绘
+        """
+        if self.chart is None:
+            self.show_message("加载K线数据中...")
+        
+        def show_if_current(kline_data, span=None):
+            if is_current is None or is_current():
+                with TRACER.span('display', parent=span, view='kline'):
+                    self.show(kline_data)
+        
+        self.cancel()
+        self.subscription = self.bus.subscribe(self.bus.kline_topic(market, code), self.mailbox, show_if_current,
+                                               interval=self.interval, days=self.days, adjust=adjust)
+    
+    def show(self, kline_data):
+        """显示K线数据（首次创建图表，之后复用）"""
+        if not kline_data:
+            self.reset()
+            self.show_message("无法获取K线数据（数据源异常）", error=True)
+            return
+        
+        if self.chart is None:
+            self.reset()
+            self.chart = self.create_chart(kline_data)
+            self.created += 1
+        else:
+            self.chart.update_data(kline_data)
+            self.updated += 1
+        self.update_status(kline_data)
+    
+    def reset(self):
+        """销毁图表和提示，下次有数据时重新创建图表"""
+        self.clear()
+        self.chart = None
+    
+    def cancel(self):
+        """取消K线订阅（例如离开K线模式）"""
+        if self.subscription:
+            self.subscription.cancel()
+            self.subscription = None
+    
+    def close(self):
+        self.cancel()
+        self.reset()
+    
+    def create_chart(self, kline_data):
+        """创建图表（返回有 update_data(kline_data) 方法的对象）"""
+        raise NotImplementedError
+    
+    def update_status(self, kline_data):
+        """图表更新后显示复权方式、过期或降级提示等"""
+    
+    def show_message(self, text, error=False):
+        """没有图表时显示的提示（加载中、数据源异常）"""
+    
+    def clear(self):
+        """销毁图表和提示的界面元素"""
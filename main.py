@@ -17,36 +17,160 @@
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
+import argparse
 import json
 import os
-import threading
 import time
+from adjustment import ADJUST_MODES
 from api_client import NetEaseFinanceAPI
-from kline_chart import KLineChart
+from correlation import CorrelationWindow
+from kline_view import KLineView
+from config_store import ConfigStore, atomic_write_json, stock_key
+from market_scanner import ScannerWindow
+from portfolio import Portfolio
+from metrics import RENDER_TIME, TRACER, EventLoopLagMonitor, MetricsServer, dump_json, timed
+from profiler import SamplingProfiler
+from quote_bus import QuoteBus, TkMailbox
+from quote_recorder import QuoteRecorder
+from render_scheduler import RenderScheduler
+from sparkline_grid import SparklineWindow
+from symbol_index import SymbolIndex
+
+# K线图模块依赖matplotlib，首次打开K线视图时再导入，避免拖慢启动
+KLineChart = None
+
+def format_amount(value):
+    """成交量/成交额：亿、万为单位"""
+    if value >= 100000000:
+        return f"{value/100000000:.2f}亿"
+    if value >= 10000:
+        return f"{value/10000:.2f}万"
+    return f"{value:.0f}"
+
+
+def quote_view_model(data, stale=False):
+    """
+    行情视图模型：控件名 -> 控件选项（纯函数，不访问Tk）
+    stale为True表示上次保存的缓存数据；降级数据显示数据年龄
+    """
+    percent = data['percent']
+    updown = data['updown']
+    
+    # 根据涨跌设置颜色
+    if percent > 0:
+        color = '#ff4d4f'  # 红色（上涨）
+        sign = '+'
+    elif percent < 0:
+        color = '#52c41a'  # 绿色（下跌）
+        sign = ''
+    else:
+        color = 'white'
+        sign = ''
+    
+    if data.get('degraded'):
+        status = {'text': f"数据源异常，显示 {data['time']} 的数据（{data['age']:.0f}秒前）", 'fg': '#ff9800'}
+    elif stale:
+        status = {'text': f"缓存数据: {data['time']}（更新中...）", 'fg': '#d4a017'}
+    else:
+        status = {'text': f"更新时间: {data['time']}", 'fg': '#666666'}
+    
+    return {
+        'name': {'text': f"{data['name']} ({data['code']})"},
+        'price': {'text': f"{data['price']:.2f}", 'fg': color},
+        'change': {'text': f"{sign}{updown:.2f} ({sign}{percent:.2f}%)", 'fg': color},
+        'open': {'text': f"今开: {data['open']:.2f}"},
+        'high': {'text': f"最高: {data['high']:.2f}"},
+        'low': {'text': f"最低: {data['low']:.2f}"},
+        'yestclose': {'text': f"昨收: {data['yestclose']:.2f}"},
+        'volume': {'text': f"成交量: {format_amount(data['volume'])}"},
+        'turnover': {'text': f"成交额: {format_amount(data['turnover'])}"},
+        'time': status
+    }
+
 
 class StockMonitor:
     """股票监控悬浮窗主类"""
     
-    def __init__(self):
-        self.root = tk.Tk()
+    def __init__(self, startup_bench=False, metrics_port=None, metrics_dump=None,
+                 profile=False, profile_out=None, record_quotes=None, parent=None):
+        # 主窗口创建Tk根窗口、API客户端和行情总线；其他窗口（parent为主窗口）是Toplevel，共享这些对象
+        self.parent = parent
+        self.windows = []  # 主窗口：其他已打开的窗口
+        self.root = tk.Toplevel(parent.root) if parent else tk.Tk()
         self.root.title("股票行情监控")
         
-        # 加载配置
-        self.config_file = "config.json"
-        self.load_config()
+        # 启动耗时基准测试模式（首次显示价格后输出时间并退出）
+        self.startup_bench = startup_bench
+        
+        if parent:
+            self.share_from(parent)
+        else:
+            # 指标：Tk事件循环延迟监测，可选的本地指标HTTP服务，退出时可导出JSON
+            self.lag_monitor = EventLoopLagMonitor(self.root)
+            self.lag_monitor.start()
+            self.metrics_server = MetricsServer(metrics_port).start() if metrics_port else None
+            self.metrics_dump = metrics_dump
+            
+            # 采样分析器：--profile 启动时开始，或用隐藏快捷键 Ctrl+Shift+P 开始/停止
+            self.profiler = SamplingProfiler()
+            self.profile_out = profile_out
+            self.root.bind('<Control-P>', self.toggle_profiler)
+            if profile:
+                self.profiler.start()
+            
+            # 行情记录（--record-quotes，可用 export.py 导出）
+            self.quote_recorder = QuoteRecorder(record_quotes) if record_quotes else None
+            
+            # 加载配置
+            self.config_file = "config.json"
+            self.load_config()
+            
+            # 上次关闭时保存的行情快照（用于启动时立即显示）
+            self.snapshot_file = "snapshot.json"
+            self.snapshot = self.load_snapshot()
+            
+            # API客户端
+            self.api = NetEaseFinanceAPI()
+            
+            # 行情总线：所有窗口共用，每个品种只有一个获取者
+            self.bus = QuoteBus(self.api, recorder=self.quote_recorder)
+            
+            # 本地证券代码索引（后台增量刷新，检索不访问网络）
+            self.symbol_index = SymbolIndex(self.api)
+            self.symbol_index.refresh_in_background()
+            self.api.symbol_index = self.symbol_index
+            self.api.futures.refresh_in_background()
+        
+        # 行情表：(市场, 代码) -> 最近一次行情数据
+        self.quote_table = {}
+        
+        # 持仓估值（先用快照中的行情估值，实时行情到达后逐行更新）
+        self.portfolio = Portfolio(self.config['stocks'])
+        self.portfolio.update({tuple(key.split(':', 1)): data
+                               for key, data in self.snapshot.get('quotes', {}).items()})
         
-        # API客户端
-        self.api = NetEaseFinanceAPI()
+        # 本窗口的行情订阅：批量投递到本窗口的Tk线程
+        self.mailbox = TkMailbox(self.root)
+        self.quote_subscriptions = {}  # (市场, 代码) -> Subscription
+        
+        # 界面渲染：只重绘变化的控件，按帧率合并
+        self.renderer = RenderScheduler(self.root, fps=self.config['settings'].get('render_fps', 30))
         
         # 当前显示模式：'quote'(行情), 'kline'(K线)
         self.display_mode = 'quote'
         
         # 当前选中的股票索引
         self.current_stock_index = 0
+        window_state = self.snapshot.get('window', {})
+        if 0 <= window_state.get('current_stock_index', 0) < len(self.config['stocks']):
+            self.current_stock_index = window_state.get('current_stock_index', 0)
         
-        # 数据更新线程控制
+        # 窗口运行状态
         self.is_running = True
-        self.update_thread = None
+        
+        # 打开的管理窗口
+        self.manage_window = None
+        self.scanner_window = None
         
         # 初始化界面
         self.setup_ui()
@@ -57,40 +181,168 @@ class StockMonitor:
         # 绑定关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # 开始数据更新
-        self.start_update_thread()
+        # 先显示上次的行情快照（标记为缓存数据），再开始获取实时数据
+        self.paint_snapshot()
+        
+        # 订阅行情
+        self.update_subscriptions()
+    
+    def share_from(self, parent):
+        """其他窗口：共享主窗口的配置、API客户端、行情总线和代码索引，默认显示下一个自选股"""
+        self.lag_monitor = None
+        self.metrics_server = None
+        self.metrics_dump = None
+        self.profiler = None
+        self.quote_recorder = None
+        self.config_store = parent.config_store
+        self.config = parent.config
+        self.snapshot = {'quotes': {f"{m}:{c}": data for (m, c), data in parent.quote_table.items()}}
+        if parent.config['stocks']:
+            next_index = (parent.current_stock_index + len(parent.windows) + 1) % len(parent.config['stocks'])
+            self.snapshot['window'] = {'current_stock_index': next_index}
+        self.api = parent.api
+        self.bus = parent.bus
+        self.symbol_index = parent.symbol_index
+        self.root.title(f"股票行情监控 ({len(parent.windows) + 2})")
+    
+    def all_windows(self):
+        """同一进程中的所有监控窗口"""
+        primary = self.parent or self
+        return [primary] + primary.windows
+    
+    def open_window(self):
+        """打开另一个监控窗口（共享行情总线，同一品种不重复请求上游）"""
+        primary = self.parent or self
+        primary.windows.append(StockMonitor(parent=primary))
     
     def load_config(self):
-        """加载配置文件"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                self.config = json.load(f)
-        else:
-            # 默认配置
-            self.config = {
-                "stocks": [
-                    {"code": "000001", "name": "上证指数", "market": "sh"}
-                ],
-                "settings": {
-                    "topmost": True,
-                    "refresh_interval": 2,
-                    "window_width": 400,
-                    "window_height": 300
-                }
+        """加载配置文件（不存在时写入默认配置）"""
+        default_config = {
+            "stocks": [
+                {"code": "000001", "name": "上证指数", "market": "sh"}
+            ],
+            "settings": {
+                "topmost": True,
+                "refresh_interval": 2,
+                "render_fps": 30,
+                "window_width": 400,
+                "window_height": 300
             }
-            self.save_config()
+        }
+        
+        self.config_store = ConfigStore(self.config_file, default_config)
+        self.config_store.on_external_change = self.on_config_file_changed
+        self.config = self.config_store.data
+        self.config.setdefault('stocks', [])
+        self.config.setdefault('settings', {})
     
     def save_config(self):
-        """保存配置文件"""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, indent=4, ensure_ascii=False)
+        """保存配置文件（后台合并写入，不阻塞界面）"""
+        self.config_store.save()
+    
+    def on_config_file_changed(self, new_config, diff):
+        """配置文件被外部修改（监视线程中调用）"""
+        if self.is_running:
+            self.root.after(0, lambda: [window.apply_external_config(new_config, diff)
+                                        for window in self.all_windows()])
+    
+    def apply_external_config(self, new_config, diff):
+        """应用外部修改的配置，只更新变化的部分，不重建界面"""
+        current = self.current_stock()
+        current_key = stock_key(current) if current else None
+        
+        new_config.setdefault('stocks', [])
+        new_config.setdefault('settings', {})
+        self.config = new_config
+        self.config_store.data = new_config
+        
+        for stock in diff['removed']:
+            self.quote_table.pop(stock_key(stock), None)
+        
+        if diff['added'] or diff['removed'] or diff['changed'] or diff['reordered']:
+            stocks = self.config['stocks']
+            self.stock_combo['values'] = [f"{s['name']} ({s['code']})" for s in stocks]
+            
+            # 尽量保持当前选中的股票
+            keys = [stock_key(s) for s in stocks]
+            if current_key in keys:
+                self.current_stock_index = keys.index(current_key)
+                self.stock_combo.current(self.current_stock_index)
+            elif stocks:
+                self.current_stock_index = 0
+                self.stock_combo.current(0)
+                self.refresh_data()
+            else:
+                self.current_stock_index = 0
+                self.stock_var.set("")
+            
+            if self.manage_window and self.manage_window.window.winfo_exists():
+                self.manage_window.load_stocks()
+            
+            self.rebuild_portfolio()
+            self.update_subscriptions()
+        
+        # 置顶设置
+        topmost = self.config['settings'].get('topmost', True)
+        if topmost != self.topmost_var.get():
+            self.topmost_var.set(topmost)
+            self.root.attributes('-topmost', topmost)
+    
+    def load_snapshot(self):
+        """加载上次关闭时保存的行情快照"""
+        if not os.path.exists(self.snapshot_file):
+            return {}
+        
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"加载行情快照失败: {e}")
+            return {}
+    
+    def save_snapshot(self):
+        """保存行情表和窗口状态，供下次启动时立即显示"""
+        snapshot = {
+            'saved_at': time.time(),
+            'quotes': {f"{market}:{code}": data for (market, code), data in self.quote_table.items()},
+            'window': {
+                'geometry': self.root.geometry(),
+                'current_stock_index': self.current_stock_index
+            }
+        }
+        
+        try:
+            atomic_write_json(self.snapshot_file, snapshot, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存行情快照失败: {e}")
+    
+    def paint_snapshot(self):
+        """显示快照中当前股票的行情（标记为缓存数据）"""
+        stock = self.current_stock()
+        if not stock:
+            return
+        
+        data = self.snapshot.get('quotes', {}).get(f"{stock['market']}:{stock['code']}")
+        if data:
+            self.update_quote_display(data, stale=True)
+    
+    def current_stock(self):
+        """获取当前选中的股票配置"""
+        if not self.config['stocks']:
+            return None
+        return self.config['stocks'][self.current_stock_index]
+    
+    def current_stock_key(self):
+        """当前选中股票的 (市场, 代码)，没有股票时为None"""
+        stock = self.current_stock()
+        return (stock['market'], stock['code']) if stock else None
     
     def setup_ui(self):
         """设置用户界面"""
         # 设置窗口大小
         width = self.config['settings'].get('window_width', 400)
         height = self.config['settings'].get('window_height', 300)
-        self.root.geometry(f"{width}x{height}")
+        self.root.geometry(self.snapshot.get('window', {}).get('geometry') or f"{width}x{height}")
         
         # 主容器
         self.main_frame = tk.Frame(self.root, bg='#1e1e1e')
@@ -108,6 +360,7 @@ class StockMonitor:
         
         # K线图容器（初始隐藏）
         self.kline_frame = None
+        self.kline_view = None
     
     def create_toolbar(self):
         """创建工具栏"""
@@ -119,7 +372,7 @@ class StockMonitor:
         self.stock_var = tk.StringVar()
         stock_options = [f"{s['name']} ({s['code']})" for s in self.config['stocks']]
         if stock_options:
-            self.stock_var.set(stock_options[0])
+            self.stock_var.set(stock_options[self.current_stock_index])
         
         self.stock_combo = ttk.Combobox(toolbar, textvariable=self.stock_var, 
                                         values=stock_options, state='readonly', width=15)
@@ -141,6 +394,16 @@ class StockMonitor:
                               bg='#3d3d3d', fg='white', relief=tk.FLAT, padx=10)
         manage_btn.pack(side=tk.LEFT, padx=5)
         
+        # 全市场扫描按钮
+        scan_btn = tk.Button(toolbar, text="扫描", command=self.open_scanner_window,
+                             bg='#3d3d3d', fg='white', relief=tk.FLAT, padx=10)
+        scan_btn.pack(side=tk.LEFT, padx=5)
+        
+        # 新窗口按钮
+        window_btn = tk.Button(toolbar, text="新窗口", command=self.open_window,
+                               bg='#3d3d3d', fg='white', relief=tk.FLAT, padx=10)
+        window_btn.pack(side=tk.LEFT, padx=5)
+        
         # 置顶复选框
         self.topmost_var = tk.BooleanVar(value=self.config['settings'].get('topmost', True))
         topmost_check = tk.Checkbutton(toolbar, text="置顶", variable=self.topmost_var,
@@ -209,6 +472,23 @@ class StockMonitor:
         self.time_label = tk.Label(self.quote_frame, text="更新时间: --", 
                                    font=('Arial', 9), bg='#1e1e1e', fg='#666666')
         self.time_label.pack(side=tk.BOTTOM, pady=5)
+        
+        # 持仓合计和当前股票持仓
+        self.portfolio_label = tk.Label(self.quote_frame, text="", 
+                                        font=('Arial', 9), bg='#1e1e1e', fg='#888888')
+        self.portfolio_label.pack(side=tk.BOTTOM)
+        
+        self.position_label = tk.Label(self.quote_frame, text="", 
+                                       font=('Arial', 10), bg='#1e1e1e', fg='#888888')
+        self.position_label.pack(side=tk.BOTTOM)
+        
+        # 视图模型中的控件名 -> 控件
+        self.quote_widgets = {
+            'name': self.name_label, 'price': self.price_label, 'change': self.change_label,
+            'open': self.open_label, 'high': self.high_label, 'low': self.low_label,
+            'yestclose': self.yestclose_label, 'volume': self.volume_label,
+            'turnover': self.turnover_label, 'time': self.time_label
+        }
     
     def toggle_display_mode(self):
         """切换显示模式（行情/K线）"""
@@ -220,6 +500,7 @@ class StockMonitor:
             self.display_mode = 'quote'
             self.toggle_btn.config(text="切换K线")
             self.show_quote()
+        self.update_subscriptions()
     
     def show_quote(self):
         """显示行情"""
@@ -234,6 +515,7 @@ class StockMonitor:
         
         if not self.kline_frame:
             self.kline_frame = tk.Frame(self.content_frame, bg='#1e1e1e')
+            self.kline_view = TkKLineView(self, self.kline_frame)
         
         self.kline_frame.pack(fill=tk.BOTH, expand=True)
         
@@ -244,111 +526,130 @@ class StockMonitor:
         self.load_kline_data(stock['code'], stock['market'])
     
     def load_kline_data(self, code, market):
-        """加载K线数据"""
-        # 清空现有内容
-        for widget in self.kline_frame.winfo_children():
-            widget.destroy()
-        
-        # 显示加载提示
-        loading_label = tk.Label(self.kline_frame, text="加载K线数据中...", 
-                                font=('Arial', 12), bg='#1e1e1e', fg='white')
-        loading_label.pack(expand=True)
-        
-        # 在新线程中加载数据
-        def load_data():
-            kline_data = self.api.get_kline_data(code, market, days=30)
-            
-            # 在主线程中更新UI
-            self.root.after(0, lambda: self.display_kline(kline_data))
-        
-        threading.Thread(target=load_data, daemon=True).start()
+        """加载K线数据（已有K线图时保留旧图，数据到达后在同一个图上重绘）"""
+        def is_current():
+            # 订阅期间可能已切换股票或显示模式
+            stock = self.current_stock()
+            return self.display_mode == 'kline' and stock and (stock['code'], stock['market']) == (code, market)
+        
+        adjust = self.config['settings'].get('kline_adjust', 'none')
+        self.kline_view.load(market, code, adjust, is_current)
     
-    def display_kline(self, kline_data):
-        """显示K线图"""
-        # 清空现有内容
-        for widget in self.kline_frame.winfo_children():
-            widget.destroy()
-        
-        if not kline_data:
-            error_label = tk.Label(self.kline_frame, text="无法获取K线数据", 
-                                  font=('Arial', 12), bg='#1e1e1e', fg='red')
-            error_label.pack(expand=True)
+    def on_adjust_changed(self, label):
+        """切换K线复权方式"""
+        mode = next(mode for mode, name in ADJUST_MODES.items() if name == label)
+        if mode == self.config['settings'].get('kline_adjust', 'none'):
             return
+        self.config['settings']['kline_adjust'] = mode
+        self.save_config()
         
-        # 创建K线图
-        chart = KLineChart(self.kline_frame, kline_data, bg='#1e1e1e')
-        chart.pack(fill=tk.BOTH, expand=True)
+        stock = self.current_stock()
+        if stock:
+            self.load_kline_data(stock['code'], stock['market'])
     
     def refresh_data(self):
-        """刷新数据"""
-        if not self.config['stocks']:
+        """立即重新获取当前股票的行情（由行情总线在后台获取，不阻塞界面）"""
+        stock = self.current_stock()
+        if not stock:
             return
         
-        stock = self.config['stocks'][self.current_stock_index]
-        data = self.api.get_realtime_data(stock['code'], stock['market'])
-        
-        if data:
-            self.update_quote_display(data)
+        self.bus.refresh(self.bus.quote_topic(stock['market'], stock['code']))
     
-    def update_quote_display(self, data):
-        """更新行情显示"""
+    def update_subscriptions(self):
+        """
+        按当前状态更新本窗口的行情订阅：行情模式下当前股票每2秒，其他持仓每10秒
+        同一品种被多个窗口订阅时总线只获取一次，取各订阅中最短的刷新间隔
+        """
+        # 订阅按 (市场, 代码) 区分，不持有股票配置字典：外部修改配置后字典会被整体替换
+        current = self.current_stock_key() if self.display_mode == 'quote' else None
+        wanted = {}
+        for stock in self.config['stocks']:
+            key = (stock['market'], stock['code'])
+            if key == current:
+                wanted[key] = 2
+            elif key in self.portfolio and key not in wanted:
+                wanted[key] = 10
+        
+        for key, subscription in list(self.quote_subscriptions.items()):
+            if wanted.get(key) != subscription.interval:
+                subscription.cancel()
+                del self.quote_subscriptions[key]
+        
+        for key, interval in wanted.items():
+            if key not in self.quote_subscriptions:
+                self.quote_subscriptions[key] = self.bus.subscribe(
+                    self.bus.quote_topic(*key), self.mailbox,
+                    lambda data, span, key=key: self.on_quote_received(key, data, span), interval=interval)
+        
+        # 离开K线模式时取消K线订阅
+        if self.display_mode != 'kline' and self.kline_view:
+            self.kline_view.cancel()
+    
+    def on_quote_received(self, key, data, span=None):
+        """行情数据到达（主线程），key 为 (市场, 代码)"""
+        self.quote_table[key] = data
+        
+        if key in self.portfolio:
+            self.portfolio.update({key: data})
+            self.update_portfolio_display()
+        
+        # 投递期间可能已切换股票
+        if key == self.current_stock_key():
+            with TRACER.span('render', parent=span, view='quote'):
+                self.update_quote_display(data)
+    
+    @timed(RENDER_TIME, view='quote')
+    def update_quote_display(self, data, stale=False):
+        """更新行情显示（stale为True表示显示的是上次保存的缓存数据），只有变化的控件在下一帧重绘"""
         if self.display_mode != 'quote':
             return
         
-        # 更新名称
-        self.name_label.config(text=f"{data['name']} ({data['code']})")
-        
-        # 更新价格
-        price = data['price']
-        self.price_label.config(text=f"{price:.2f}")
-        
-        # 更新涨跌幅
-        percent = data['percent']
-        updown = data['updown']
-        
-        # 根据涨跌设置颜色
-        if percent > 0:
-            color = '#ff4d4f'  # 红色（上涨）
-            sign = '+'
-        elif percent < 0:
-            color = '#52c41a'  # 绿色（下跌）
-            sign = ''
-        else:
-            color = 'white'
-            sign = ''
-        
-        self.price_label.config(fg=color)
-        self.change_label.config(text=f"{sign}{updown:.2f} ({sign}{percent:.2f}%)", fg=color)
-        
-        # 更新详细信息
-        self.open_label.config(text=f"今开: {data['open']:.2f}")
-        self.high_label.config(text=f"最高: {data['high']:.2f}")
-        self.low_label.config(text=f"最低: {data['low']:.2f}")
-        self.yestclose_label.config(text=f"昨收: {data['yestclose']:.2f}")
-        
-        # 格式化成交量和成交额
-        volume = data['volume']
-        turnover = data['turnover']
-        
-        if volume >= 100000000:
-            volume_str = f"{volume/100000000:.2f}亿"
-        elif volume >= 10000:
-            volume_str = f"{volume/10000:.2f}万"
-        else:
-            volume_str = f"{volume:.0f}"
+        self.renderer.render(self.quote_widgets, quote_view_model(data, stale))
+        self.update_portfolio_display()
         
-        if turnover >= 100000000:
-            turnover_str = f"{turnover/100000000:.2f}亿"
-        elif turnover >= 10000:
-            turnover_str = f"{turnover/10000:.2f}万"
+        if self.startup_bench:
+            self.report_startup_paint(stale or bool(data.get('degraded')))
+    
+    def update_portfolio_display(self):
+        """更新当前股票持仓和持仓合计（合计由估值引擎增量维护，这里只读取）"""
+        def signed_color(value):
+            return '#ff4d4f' if value > 0 else '#52c41a' if value < 0 else '#888888'
+        
+        stock = self.current_stock()
+        position = self.portfolio.position((stock['market'], stock['code'])) if stock else None
+        if position:
+            self.renderer.set(self.position_label,
+                              text=f"持仓 {position['quantity']:g} 市值 {position['market_value']:,.2f} "
+                                   f"当日 {position['day_pnl']:+,.2f} 盈亏 {position['total_pnl']:+,.2f}",
+                              fg=signed_color(position['day_pnl']))
         else:
-            turnover_str = f"{turnover:.0f}"
-        
-        self.volume_label.config(text=f"成交量: {volume_str}")
-        self.turnover_label.config(text=f"成交额: {turnover_str}")
-        
-        # 更新时间
-        self.time_label.config(text=f"更新时间: {data['time']}")
+            self.renderer.set(self.position_label, text="")
+        
+        parts = []
+        day_pnl = 0.0
+        for currency, totals in self.portfolio.totals().items():
+            if not totals['priced']:
+                continue
+            parts.append(f"{currency} 市值 {totals['market_value']:,.0f} 当日 {totals['day_pnl']:+,.0f} "
+                         f"盈亏 {totals['total_pnl']:+,.0f}")
+            day_pnl += totals['day_pnl']
+        self.renderer.set(self.portfolio_label, text=("合计: " + " | ".join(parts)) if parts else "",
+                          fg=signed_color(day_pnl))
+    
+    def rebuild_portfolio(self):
+        """自选股或持仓配置变化后重建估值数组"""
+        self.portfolio.rebuild(self.config['stocks'], self.quote_table)
+        self.update_portfolio_display()
+        self.update_subscriptions()
+    
+    def report_startup_paint(self, stale):
+        """基准测试模式：输出首次显示价格的时间点"""
+        self.renderer.flush()
+        self.root.update_idletasks()
+        print(f"STARTUP_PAINT {'stale' if stale else 'live'} {time.time():.6f}", flush=True)
+        
+        if not stale:
+            self.on_closing()
     
     def on_stock_changed(self, event):
         """股票选择改变事件"""
@@ -356,7 +657,11 @@ class StockMonitor:
         self.current_stock_index = selected
         
         if self.display_mode == 'quote':
-            self.refresh_data()
+            stock = self.current_stock()
+            data = self.quote_table.get((stock['market'], stock['code']))
+            if data:
+                self.update_quote_display(data, stale=True)
+            self.update_subscriptions()
         else:
             stock = self.config['stocks'][self.current_stock_index]
             self.load_kline_data(stock['code'], stock['market'])
@@ -376,24 +681,59 @@ class StockMonitor:
     
     def open_manage_window(self):
         """打开股票管理窗口"""
-        ManageWindow(self.root, self)
+        self.manage_window = ManageWindow(self.root, self)
     
-    def start_update_thread(self):
-        """启动数据更新线程（每2秒自动刷新当前行情）"""
-        def update_loop():
-            while self.is_running:
-                if self.display_mode == 'quote':
-                    self.root.after(0, self.refresh_data)
-                
-                # 固定2秒刷新间隔
-                time.sleep(2)
-        
-        self.update_thread = threading.Thread(target=update_loop, daemon=True)
-        self.update_thread.start()
+    def open_scanner_window(self):
+        """打开全市场扫描窗口（已打开时置前）"""
+        if self.scanner_window and self.scanner_window.is_running:
+            self.scanner_window.window.lift()
+            return
+        self.scanner_window = ScannerWindow(self.root, self.api)
+    
+    def toggle_profiler(self, event=None):
+        """开始/停止采样分析（停止时写出折叠栈文件）"""
+        written = self.profiler.toggle(self.profile_out)
+        if self.profiler.running:
+            self.root.title("股票行情监控 [采样中]")
+        else:
+            self.root.title("股票行情监控")
+            messagebox.showinfo("采样分析", f"已写入 {written}", parent=self.root)
     
     def on_closing(self):
-        """窗口关闭事件"""
+        """窗口关闭事件（关闭主窗口时同时关闭其他窗口）"""
         self.is_running = False
+        for subscription in self.quote_subscriptions.values():
+            subscription.cancel()
+        if self.kline_view:
+            self.kline_view.cancel()
+        self.mailbox.close()
+        self.renderer.close()
+        
+        if self.parent:
+            if self in self.parent.windows:
+                self.parent.windows.remove(self)
+            self.root.destroy()
+            return
+        
+        for window in list(self.windows):
+            window.on_closing()
+        self.bus.close()
+        if self.profiler.running:
+            self.profiler.stop()
+            print(f"采样分析结果已写入 {self.profiler.write(self.profile_out)}")
+        if not self.startup_bench:
+            self.save_snapshot()
+        self.config_store.close()
+        self.lag_monitor.stop()
+        if self.quote_recorder:
+            self.quote_recorder.close()
+        
+        if self.metrics_dump:
+            with open(self.metrics_dump, 'w', encoding='utf-8') as f:
+                f.write(dump_json())
+        if self.metrics_server:
+            self.metrics_server.stop()
+        
         self.root.destroy()
     
     def run(self):
@@ -401,6 +741,61 @@ class StockMonitor:
         self.root.mainloop()
 
 
+class TkKLineView(KLineView):
+    """K线视图的Tk部分：复权方式选择、过期数据提示和K线图"""
+    
+    def __init__(self, monitor, frame):
+        super().__init__(monitor.bus, monitor.mailbox, interval=monitor.api.kline_ttl)
+        self.monitor = monitor
+        self.frame = frame
+        self.adjust_var = None
+        self.status_label = None
+    
+    def clear(self):
+        for widget in self.frame.winfo_children():
+            widget.destroy()
+    
+    def show_message(self, text, error=False):
+        self.clear()
+        label = tk.Label(self.frame, text=text, font=('Arial', 12), bg='#1e1e1e', fg='red' if error else 'white')
+        label.pack(expand=True)
+    
+    def create_chart(self, kline_data):
+        global KLineChart
+        if KLineChart is None:
+            from kline_chart import KLineChart
+        
+        # 复权方式选择（K线已缓存，切换时在本地重新复权，不请求网络）
+        adjust_frame = tk.Frame(self.frame, bg='#1e1e1e')
+        adjust_frame.pack(fill=tk.X)
+        self.adjust_var = tk.StringVar()
+        adjust_combo = ttk.Combobox(adjust_frame, textvariable=self.adjust_var,
+                                    values=list(ADJUST_MODES.values()), state='readonly', width=8)
+        adjust_combo.pack(side=tk.RIGHT, padx=5)
+        adjust_combo.bind('<<ComboboxSelected>>',
+                          lambda event: self.monitor.on_adjust_changed(self.adjust_var.get()))
+        
+        # 过期或降级数据的提示（有数据时显示在图表上方）
+        self.status_label = tk.Label(self.frame, font=('Arial', 9), bg='#1e1e1e', fg='#ff9800')
+        
+        # 创建K线图
+        chart = KLineChart(self.frame, kline_data, bg='#1e1e1e')
+        chart.pack(fill=tk.BOTH, expand=True)
+        return chart
+    
+    def update_status(self, kline_data):
+        self.adjust_var.set(ADJUST_MODES.get(kline_data.adjust, ADJUST_MODES['none']))
+        
+        # 过期或降级数据显示提示
+        if kline_data.stale or kline_data.degraded:
+            fetched = time.strftime('%m-%d %H:%M', time.localtime(kline_data.fetched_at))
+            reason = "数据源异常，" if kline_data.degraded else ""
+            self.status_label.config(text=f"{reason}显示 {fetched} 获取的缓存数据（{kline_data.source}）")
+            self.status_label.pack(fill=tk.X, before=self.chart)
+        else:
+            self.status_label.pack_forget()
+
+
 class ManageWindow:
     """股票管理窗口"""
     
@@ -433,6 +828,8 @@ class ManageWindow:
         
         tk.Button(btn_frame, text="添加股票", command=self.add_stock).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="删除股票", command=self.delete_stock).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="相关性", command=self.show_correlation).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="总览", command=self.show_overview).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="关闭", command=self.window.destroy).pack(side=tk.RIGHT, padx=5)
     
     def load_stocks(self):
@@ -461,18 +858,27 @@ class ManageWindow:
             self.load_stocks()
             self.update_monitor()
     
+    def show_correlation(self):
+        """显示自选股收益率相关性热力图"""
+        CorrelationWindow(self.monitor.root, self.monitor.api, self.monitor.config['stocks'], bus=self.monitor.bus)
+    
+    def show_overview(self):
+        """显示全部自选股的迷你K线网格"""
+        SparklineWindow(self.monitor.root, self.monitor.api, self.monitor.config['stocks'])
+    
     def update_monitor(self):
-        """更新监控器"""
-        # 更新下拉框
+        """更新监控器（同一进程中的所有窗口）"""
         stock_options = [f"{s['name']} ({s['code']})" for s in self.monitor.config['stocks']]
-        self.monitor.stock_combo['values'] = stock_options
-        
-        if stock_options:
-            self.monitor.stock_combo.current(0)
-            self.monitor.current_stock_index = 0
-            self.monitor.refresh_data()
-        else:
-            self.monitor.stock_var.set("")
+        for monitor in self.monitor.all_windows():
+            # 更新下拉框
+            monitor.stock_combo['values'] = stock_options
+            if stock_options:
+                monitor.stock_combo.current(0)
+                monitor.current_stock_index = 0
+            else:
+                monitor.stock_var.set("")
+            monitor.rebuild_portfolio()
+            monitor.refresh_data()
 
 
 class AddStockDialog:
@@ -480,31 +886,47 @@ class AddStockDialog:
     
     def __init__(self, parent, manage_window):
         self.manage_window = manage_window
+        self.symbol_index = manage_window.monitor.symbol_index
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("添加股票")
-        self.dialog.geometry("350x200")
+        self.dialog.geometry("380x360")
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
+        # 联想列表中的候选项
+        self.suggestions = []
+        
         self.setup_ui()
     
     def setup_ui(self):
         """设置界面"""
-        # 股票代码
+        # 股票代码（输入代码、名称或拼音首字母进行联想）
         tk.Label(self.dialog, text="股票代码:").grid(row=0, column=0, padx=10, pady=10, sticky='e')
         self.code_entry = tk.Entry(self.dialog, width=20)
-        self.code_entry.grid(row=0, column=1, padx=10, pady=10)
+        self.code_entry.grid(row=0, column=1, padx=10, pady=10, sticky='w')
+        self.code_entry.bind('<KeyRelease>', self.on_query_changed)
+        self.code_entry.bind('<Down>', self.focus_suggestions)
+        self.code_entry.focus_set()
+        
+        # 联想列表
+        self.suggest_listbox = tk.Listbox(self.dialog, height=6, width=36, exportselection=False)
+        self.suggest_listbox.grid(row=1, column=0, columnspan=2, padx=10, sticky='we')
+        self.suggest_listbox.bind('<<ListboxSelect>>', self.on_suggestion_selected)
+        self.suggest_listbox.bind('<Return>', self.on_suggestion_selected)
+        
+        if not self.symbol_index.ready:
+            self.suggest_listbox.insert(tk.END, "证券代码表下载中，可直接手动输入...")
         
         # 股票名称
-        tk.Label(self.dialog, text="股票名称:").grid(row=1, column=0, padx=10, pady=10, sticky='e')
+        tk.Label(self.dialog, text="股票名称:").grid(row=2, column=0, padx=10, pady=10, sticky='e')
         self.name_entry = tk.Entry(self.dialog, width=20)
-        self.name_entry.grid(row=1, column=1, padx=10, pady=10)
+        self.name_entry.grid(row=2, column=1, padx=10, pady=10, sticky='w')
         
         # 市场类型
-        tk.Label(self.dialog, text="市场类型:").grid(row=2, column=0, padx=10, pady=10, sticky='e')
+        tk.Label(self.dialog, text="市场类型:").grid(row=3, column=0, padx=10, pady=10, sticky='e')
         self.market_var = tk.StringVar(value='sh')
         market_frame = tk.Frame(self.dialog)
-        market_frame.grid(row=2, column=1, padx=10, pady=10, sticky='w')
+        market_frame.grid(row=3, column=1, padx=10, pady=10, sticky='w')
         
         tk.Radiobutton(market_frame, text="上证(sh)", variable=self.market_var, value='sh').pack(side=tk.LEFT)
         tk.Radiobutton(market_frame, text="深证(sz)", variable=self.market_var, value='sz').pack(side=tk.LEFT)
@@ -513,11 +935,42 @@ class AddStockDialog:
         
         # 按钮
         btn_frame = tk.Frame(self.dialog)
-        btn_frame.grid(row=3, column=0, columnspan=2, pady=20)
+        btn_frame.grid(row=4, column=0, columnspan=2, pady=20)
         
         tk.Button(btn_frame, text="确定", command=self.confirm, width=10).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="取消", command=self.dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
     
+    def on_query_changed(self, event):
+        """输入变化时在本地索引中检索"""
+        if event.keysym in ('Down', 'Up', 'Return', 'Tab'):
+            return
+        
+        self.suggestions = self.symbol_index.search(self.code_entry.get())
+        self.suggest_listbox.delete(0, tk.END)
+        for item in self.suggestions:
+            self.suggest_listbox.insert(tk.END, f"{item['code']}  {item['name']}  ({item['market'].upper()})")
+    
+    def focus_suggestions(self, event):
+        """方向键移动到联想列表"""
+        if self.suggestions:
+            self.suggest_listbox.focus_set()
+            self.suggest_listbox.selection_clear(0, tk.END)
+            self.suggest_listbox.selection_set(0)
+            self.suggest_listbox.activate(0)
+    
+    def on_suggestion_selected(self, event):
+        """选中联想项后自动填写代码、名称和市场"""
+        selection = self.suggest_listbox.curselection()
+        if not selection or selection[0] >= len(self.suggestions):
+            return
+        
+        item = self.suggestions[selection[0]]
+        self.code_entry.delete(0, tk.END)
+        self.code_entry.insert(0, item['code'])
+        self.name_entry.delete(0, tk.END)
+        self.name_entry.insert(0, item['name'])
+        self.market_var.set(item['market'])
+    
     def confirm(self):
         """确认添加"""
         code = self.code_entry.get().strip()
@@ -528,6 +981,15 @@ class AddStockDialog:
             messagebox.showerror("错误", "请填写完整信息")
             return
         
+        # 校验代码是否存在于证券代码表中
+        if self.symbol_index.ready:
+            found = self.symbol_index.lookup(code, market)
+            if found:
+                code = found['code']
+            elif not messagebox.askyesno("确认", f"证券代码表中未找到 {code} ({market.upper()})，仍要添加吗？",
+                                         parent=self.dialog):
+                return
+        
         # 添加到配置
         new_stock = {
             "code": code,
@@ -544,6 +1006,31 @@ class AddStockDialog:
         messagebox.showinfo("成功", "股票添加成功")
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="股票行情悬浮窗监控")
+    parser.add_argument('--startup-bench', action='store_true',
+                        help="启动耗时测试模式：输出首次显示价格的时间点后退出")
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help="在本地端口提供指标服务（/metrics 为Prometheus格式，/metrics.json 为JSON）")
+    parser.add_argument('--metrics-dump', default=None,
+                        help="退出时把指标和链路追踪导出到指定JSON文件")
+    parser.add_argument('--profile', action='store_true',
+                        help="启动时开始采样分析（也可用 Ctrl+Shift+P 随时开始/停止）")
+    parser.add_argument('--profile-out', default=None,
+                        help="采样分析结果（折叠栈格式）的输出文件，默认 profile-时间.folded")
+    parser.add_argument('--record-quotes', nargs='?', const='quotes', default=None, metavar='DIR',
+                        help="把收到的行情记录到目录（默认 quotes），可用 export.py 导出为Arrow/Parquet")
+    parser.add_argument('--windows', type=int, default=1,
+                        help="启动时打开的监控窗口数（共享同一个行情总线，默认 1）")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    app = StockMonitor()
+    args = parse_args()
+    app = StockMonitor(startup_bench=args.startup_bench, metrics_port=args.metrics_port,
+                       metrics_dump=args.metrics_dump, profile=args.profile, profile_out=args.profile_out,
+                       record_quotes=args.record_quotes)
+    for _ in range(args.windows - 1):
+        app.open_window()
     app.run()
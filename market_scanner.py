@@ -0,0 +1,295 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+全市场扫描
+并行分页拉取全部A股行情，保存为列式快照，
+用堆增量维护涨幅榜、跌幅榜和成交额榜（每次扫描只对变化的行入堆）
+"""
+import heapq
+import math
+import threading
+import time
+import tkinter as tk
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from symbol_index import market_from_eastmoney
+
+# 沪深A股（不含指数）
+A_SHARE_FS = 'm:0+t:6,m:0+t:80,m:1+t:2,m:1+t:23,m:0+t:81+s:2048'
+
+# 代码、市场、名称、最新价、涨跌幅、成交额
+SCAN_FIELDS = 'f12,f13,f14,f2,f3,f6'
+
+
+def _to_float(value):
+    """东方财富停牌等无数据时返回'-'"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class TopK:
+    """
+    带延迟删除的堆：行的值变化时只把新值入堆，旧条目在查询时按版本号丢弃
+    查询代价 O(k log n)，更新代价 O(变化行数 log n)
+    """
+    
+    def __init__(self, values, versions, largest=True):
+        self.values = values  # 列数组（与快照共享）
+        self.versions = versions  # 行版本号数组（与快照共享）
+        self.sign = -1.0 if largest else 1.0
+        self.heap = []
+    
+    def push(self, row):
+        value = self.values[row]
+        if not math.isnan(value):
+            heapq.heappush(self.heap, (self.sign * value, self.versions[row], row))
+    
+    def rebuild(self):
+        """根据当前值重建堆（延迟删除的条目过多时压缩）"""
+        self.heap = [(self.sign * v, self.versions[i], i) for i, v in enumerate(self.values) if not math.isnan(v)]
+        heapq.heapify(self.heap)
+    
+    def top(self, k):
+        """前k行的行号"""
+        result = []
+        valid = []
+        while self.heap and len(result) < k:
+            entry = heapq.heappop(self.heap)
+            _, version, row = entry
+            if version != self.versions[row]:
+                continue  # 过期条目
+            result.append(row)
+            valid.append(entry)
+        
+        for entry in valid:
+            heapq.heappush(self.heap, entry)
+        return result
+
+
+class MarketSnapshot:
+    """列式行情快照"""
+    
+    def __init__(self):
+        self.codes = []
+        self.names = []
+        self.markets = []
+        self.price = array('d')
+        self.percent = array('d')
+        self.turnover = array('d')
+        self.versions = array('q')
+        self.row_of = {}  # (市场, 代码) -> 行号
+        
+        self.gainers = TopK(self.percent, self.versions, largest=True)
+        self.losers = TopK(self.percent, self.versions, largest=False)
+        self.turnover_leaders = TopK(self.turnover, self.versions, largest=True)
+        self._heaps = (self.gainers, self.losers, self.turnover_leaders)
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    def apply(self, rows):
+        """合并一次扫描的原始行，返回变化的行数"""
+        changed = []
+        for item in rows:
+            code = str(item.get('f12', ''))
+            if not code or code == '-':
+                continue
+            
+            market = market_from_eastmoney(item.get('f13', ''))
+            price = _to_float(item.get('f2'))
+            percent = _to_float(item.get('f3'))
+            turnover = _to_float(item.get('f6'))
+            
+            row = self.row_of.get((market, code))
+            if row is None:
+                row = len(self.codes)
+                self.row_of[(market, code)] = row
+                self.codes.append(code)
+                self.names.append(str(item.get('f14', '')))
+                self.markets.append(market)
+                self.price.append(price)
+                self.percent.append(percent)
+                self.turnover.append(turnover)
+                self.versions.append(0)
+                changed.append(row)
+                continue
+            
+            if (self._differs(self.price[row], price) or self._differs(self.percent[row], percent)
+                    or self._differs(self.turnover[row], turnover)):
+                self.price[row] = price
+                self.percent[row] = percent
+                self.turnover[row] = turnover
+                self.versions[row] += 1
+                changed.append(row)
+        
+        for heap in self._heaps:
+            if len(heap.heap) + len(changed) > 4 * len(self.codes) + 1000:
+                heap.rebuild()
+            else:
+                for row in changed:
+                    heap.push(row)
+        return len(changed)
+    
+    @staticmethod
+    def _differs(a, b):
+        if math.isnan(a) and math.isnan(b):
+            return False
+        return a != b
+    
+    def record(self, row):
+        """行号转换为字典"""
+        return {
+            'code': self.codes[row],
+            'name': self.names[row],
+            'market': self.markets[row],
+            'price': self.price[row],
+            'percent': self.percent[row],
+            'turnover': self.turnover[row]
+        }
+
+
+class MarketScanner:
+    """全市场扫描器"""
+    
+    def __init__(self, api, fs=A_SHARE_FS, page_size=100, max_workers=8):
+        self.api = api
+        self.fs = fs
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.snapshot = MarketSnapshot()
+        self._lock = threading.Lock()
+        
+        self.last_scan_seconds = None
+        self.last_changed = 0
+        self.last_scan_at = None
+    
+    def _fetch_page(self, page):
+        rows, _ = self.api.get_security_list_page(self.fs, SCAN_FIELDS, page, self.page_size)
+        return rows
+    
+    def scan(self):
+        """拉取全市场一次：先取第一页得到总数，其余页并行获取"""
+        start = time.perf_counter()
+        first_rows, total = self.api.get_security_list_page(self.fs, SCAN_FIELDS, 1, self.page_size)
+        pages = max(1, math.ceil(total / self.page_size))
+        
+        rows = list(first_rows)
+        if pages > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scanner') as pool:
+                for page_rows in pool.map(self._fetch_page, range(2, pages + 1)):
+                    rows.extend(page_rows)
+        
+        with self._lock:
+            self.last_changed = self.snapshot.apply(rows)
+        self.last_scan_seconds = time.perf_counter() - start
+        self.last_scan_at = time.time()
+        return self.last_changed
+    
+    def top(self, k=20):
+        """涨幅榜、跌幅榜、成交额榜"""
+        with self._lock:
+            snapshot = self.snapshot
+            return {
+                'gainers': [snapshot.record(r) for r in snapshot.gainers.top(k)],
+                'losers': [snapshot.record(r) for r in snapshot.losers.top(k)],
+                'turnover': [snapshot.record(r) for r in snapshot.turnover_leaders.top(k)]
+            }
+
+
+class ScannerWindow:
+    """全市场扫描窗口"""
+    
+    def __init__(self, parent, api, interval=30, k=20):
+        self.scanner = MarketScanner(api)
+        self.interval = interval
+        self.k = k
+        self.is_running = True
+        self.rescan_id = None  # 下一次扫描的after()定时器
+        
+        self.window = tk.Toplevel(parent, bg='#1e1e1e')
+        self.window.title("全市场扫描")
+        self.window.geometry("760x480")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        
+        self.setup_ui()
+        self.scan_in_background()
+    
+    def setup_ui(self):
+        """设置界面"""
+        self.status_label = tk.Label(self.window, text="扫描中...", font=('Arial', 9),
+                                     bg='#1e1e1e', fg='#888888', anchor='w')
+        self.status_label.pack(fill=tk.X, padx=10, pady=5)
+        
+        columns = tk.Frame(self.window, bg='#1e1e1e')
+        columns.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        self.listboxes = {}
+        for key, title in (('gainers', '涨幅榜'), ('losers', '跌幅榜'), ('turnover', '成交额榜')):
+            frame = tk.Frame(columns, bg='#1e1e1e')
+            frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+            tk.Label(frame, text=title, font=('Arial', 11, 'bold'), bg='#1e1e1e', fg='white').pack()
+            listbox = tk.Listbox(frame, bg='#2d2d2d', fg='white', font=('Consolas', 9), borderwidth=0)
+            listbox.pack(fill=tk.BOTH, expand=True)
+            self.listboxes[key] = listbox
+    
+    def scan_in_background(self):
+        """在后台线程中扫描，完成后刷新榜单"""
+        def run():
+            try:
+                self.scanner.scan()
+                result = self.scanner.top(self.k)
+                error = None
+            except Exception as e:
+                result, error = None, e
+            if self.is_running:
+                self.window.after(0, lambda: self.show(result, error))
+        
+        threading.Thread(target=run, name='market-scanner', daemon=True).start()
+    
+    def show(self, result, error):
+        """显示榜单"""
+        if not self.is_running:
+            return
+        
+        if error is not None:
+            self.status_label.config(text=f"扫描失败: {error}", fg='red')
+        else:
+            for key, listbox in self.listboxes.items():
+                listbox.delete(0, tk.END)
+                for item in result[key]:
+                    if key == 'turnover':
+                        value = f"{item['turnover'] / 100000000:.2f}亿"
+                    else:
+                        value = f"{item['percent']:+.2f}%"
+                    listbox.insert(tk.END, f"{item['code']} {item['name']:<6} {value:>9}")
+            
+            scanner = self.scanner
+            self.status_label.config(
+                text=f"共 {len(scanner.snapshot)} 只，本次变化 {scanner.last_changed} 只，"
+                     f"耗时 {scanner.last_scan_seconds:.2f} 秒，"
+                     f"{time.strftime('%H:%M:%S', time.localtime(scanner.last_scan_at))}",
+                fg='#888888')
+        
+        self.rescan_id = self.window.after(self.interval * 1000, self.scan_in_background)
+    
+    def close(self):
+        self.is_running = False
+        if self.rescan_id is not None:
+            self.window.after_cancel(self.rescan_id)
+            self.rescan_id = None
+        self.window.destroy()
@@ -0,0 +1,383 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+指标和链路追踪
+- 计数器 / 直方图，支持标签
+- 基于span的链路追踪，把一次刷新的请求、解析、绘制串联起来
+- 导出为Prometheus文本格式（本地HTTP端口）和JSON
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ''
+    parts = []
+    for name, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class Counter:
+    """计数器"""
+    
+    type_name = 'counter'
+    
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def prometheus_lines(self):
+        with self._lock:
+            values = dict(self._values)
+        return [f'{self.name}{_format_labels(key)} {value}' for key, value in sorted(values.items())]
+    
+    def to_dict(self):
+        with self._lock:
+            return [{'labels': dict(key), 'value': value} for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """直方图"""
+    
+    type_name = 'histogram'
+    
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        # 标签 -> [各分桶计数..., 总和, 总数]
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+    
+    def time(self, **labels):
+        """计时上下文管理器"""
+        return _Timer(self, labels)
+    
+    def prometheus_lines(self):
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        
+        lines = []
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(key, [("le", "+Inf")])} {state[-1]}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {state[-2]}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {state[-1]}')
+        return lines
+    
+    def to_dict(self):
+        with self._lock:
+            return [{
+                'labels': dict(key),
+                'buckets': dict(zip([str(b) for b in self.buckets], state[:-2])),
+                'sum': state[-2],
+                'count': state[-1]
+            } for key, state in sorted(self._values.items())]
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed(histogram, span_name=None, **labels):
+    """函数计时装饰器（可同时记录一个span）"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if span_name:
+                with TRACER.span(span_name, **labels), histogram.time(**labels):
+                    return func(*args, **kwargs)
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Registry:
+    """指标注册表"""
+    
+    def __init__(self, prefix='stock_monitor_'):
+        self.prefix = prefix
+        self._metrics = []
+    
+    def counter(self, name, help_text):
+        metric = Counter(self.prefix + name, help_text)
+        self._metrics.append(metric)
+        return metric
+    
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self.prefix + name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+    
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.prometheus_lines())
+        return '\n'.join(lines) + '\n'
+    
+    def to_dict(self):
+        return {metric.name: {'type': metric.type_name, 'help': metric.help, 'values': metric.to_dict()}
+                for metric in self._metrics}
+
+
+class Span:
+    """一次操作的追踪记录"""
+    
+    def __init__(self, tracer, name, trace_id, parent_id, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self.thread = threading.current_thread().name
+        self.error = None
+    
+    def __enter__(self):
+        self.tracer._push(self)
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = repr(exc)
+        self.duration = time.time() - self.start
+        self.tracer._pop(self)
+        return False
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration': self.duration,
+            'thread': self.thread,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class Tracer:
+    """
+    链路追踪
+    同一线程内嵌套的span自动形成父子关系；跨线程时把父span作为parent参数传入
+    """
+    
+    def __init__(self, max_spans=2000):
+        self._local = threading.local()
+        self._finished = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+    
+    def set_capacity(self, max_spans):
+        """调整保留的span数量（保留最近的）"""
+        with self._lock:
+            self._finished = deque(self._finished, maxlen=max_spans)
+    
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    
+    def _push(self, span):
+        self._stack().append(span)
+    
+    def _pop(self, span):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            self._finished.append(span)
+    
+    def current(self):
+        """当前线程正在进行的span"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+    
+    def span(self, name, parent=None, **attributes):
+        """创建span（用with语句包围被追踪的操作）"""
+        parent = parent or self.current()
+        if parent is not None:
+            return Span(self, name, parent.trace_id, parent.span_id, attributes)
+        return Span(self, name, os.urandom(8).hex(), None, attributes)
+    
+    def traces(self, limit=50):
+        """最近的链路：[{trace_id, spans: [...]}, ...]"""
+        with self._lock:
+            spans = list(self._finished)
+        
+        grouped = {}
+        for span in spans:
+            grouped.setdefault(span.trace_id, []).append(span.to_dict())
+        
+        traces = [{'trace_id': trace_id, 'spans': sorted(items, key=lambda s: s['start'])}
+                  for trace_id, items in grouped.items()]
+        traces.sort(key=lambda t: t['spans'][0]['start'])
+        return traces[-limit:]
+
+
+# 默认注册表和内置指标
+REGISTRY = Registry()
+TRACER = Tracer()
+
+HTTP_LATENCY = REGISTRY.histogram('http_request_duration_seconds', '上游请求延迟（按接口）')
+HTTP_BYTES = REGISTRY.counter('http_response_bytes_total', '上游响应字节数（按接口）')
+HTTP_ERRORS = REGISTRY.counter('http_errors_total', '上游请求错误数（按接口和原因）')
+PARSE_TIME = REGISTRY.histogram('parse_duration_seconds', '响应解析耗时（按数据类型）')
+RENDER_TIME = REGISTRY.histogram('render_duration_seconds', '界面绘制耗时（按视图）')
+WIDGET_UPDATES = REGISTRY.counter('widget_updates_total', 'Tk控件更新数（applied / skipped / coalesced）')
+EVENT_LOOP_LAG = REGISTRY.histogram('tk_event_loop_lag_seconds', 'Tk事件循环延迟',
+                                    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+def dump_json(registry=REGISTRY, tracer=TRACER):
+    """导出全部指标和最近的链路为JSON字符串"""
+    return json.dumps({
+        'time': time.time(),
+        'metrics': registry.to_dict(),
+        'traces': tracer.traces()
+    }, ensure_ascii=False, indent=2)
+
+
+class EventLoopLagMonitor:
+    """周期性调度after回调，测量实际执行时间与预期时间的差值"""
+    
+    def __init__(self, root, interval_ms=100, histogram=EVENT_LOOP_LAG):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.histogram = histogram
+        self.max_lag = 0.0
+        self._expected = None
+        self._after_id = None
+    
+    def start(self):
+        self._schedule()
+    
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+    
+    def _schedule(self):
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+    
+    def _tick(self):
+        lag = max(0.0, time.perf_counter() - self._expected)
+        self.max_lag = max(self.max_lag, lag)
+        self.histogram.observe(lag)
+        self._schedule()
+
+
+class MetricsServer:
+    """本地指标HTTP服务：/metrics（Prometheus文本）、/metrics.json（JSON）"""
+    
+    def __init__(self, port, host='127.0.0.1', registry=REGISTRY, tracer=TRACER):
+        self.registry = registry
+        self.tracer = tracer
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] == '/metrics':
+                    body = server.registry.to_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.split('?')[0] == '/metrics.json':
+                    body = dump_json(server.registry, server.tracer).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+    
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+    
+    def start(self):
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,157 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+持仓估值
+持仓（数量、成本价、币种）来自配置文件中自选股的 holding 字段，
+按行保存在NumPy数组中，与行情表使用同一个 (市场, 代码) 键；
+每批行情只重算变化行的市值、当日盈亏和总盈亏，并把差值累加到各币种合计，
+合计无需每次全量重算
+"""
+import numpy as np
+
+# 各市场的默认币种（holding 中未指定 currency 时使用）
+DEFAULT_CURRENCY = {'sh': 'CNY', 'sz': 'CNY', 'us': 'USD', 'hf': 'USD'}
+
+# 合计字段
+TOTAL_FIELDS = ('cost', 'market_value', 'day_pnl', 'total_pnl')
+
+
+class Portfolio:
+    """持仓估值引擎"""
+    
+    def __init__(self, stocks=()):
+        self.rebuild(stocks)
+    
+    def __len__(self):
+        return len(self.keys)
+    
+    def __contains__(self, key):
+        return key in self.row_of
+    
+    def rebuild(self, stocks, quotes=None):
+        """
+        根据自选股配置重建持仓数组（配置变化时调用）
+        quotes: 已有的行情表 (市场, 代码) -> 行情数据，用于保留已知价格
+        """
+        holdings = [s for s in stocks if s.get('holding') and s['holding'].get('quantity')]
+        
+        self.keys = [(s['market'], s['code']) for s in holdings]
+        self.row_of = {key: row for row, key in enumerate(self.keys)}
+        self.currencies = []
+        currency_ids = []
+        for stock in holdings:
+            currency = (stock['holding'].get('currency') or DEFAULT_CURRENCY.get(stock['market'], 'CNY')).upper()
+            if currency not in self.currencies:
+                self.currencies.append(currency)
+            currency_ids.append(self.currencies.index(currency))
+        
+        n = len(holdings)
+        self.currency = np.array(currency_ids, dtype=np.intp)
+        self.quantity = np.array([float(s['holding']['quantity']) for s in holdings], dtype=np.float64)
+        self.cost_price = np.array([float(s['holding'].get('cost', 0)) for s in holdings], dtype=np.float64)
+        self.cost = self.quantity * self.cost_price
+        
+        self.price = np.full(n, np.nan)
+        self.prev_close = np.full(n, np.nan)
+        self.market_value = np.zeros(n)
+        self.day_pnl = np.zeros(n)
+        self.total_pnl = np.zeros(n)
+        self.priced = np.zeros(n, dtype=bool)
+        
+        # 各币种合计（只累加已有行情的行）
+        self._totals = {field: np.zeros(len(self.currencies)) for field in TOTAL_FIELDS}
+        self._positions = np.bincount(self.currency, minlength=len(self.currencies))
+        self._priced = np.zeros(len(self.currencies), dtype=np.int64)
+        
+        if quotes:
+            self.update({key: quotes[key] for key in self.keys if key in quotes})
+    
+    def update(self, quotes):
+        """
+        合并一批行情：quotes 为 (市场, 代码) -> 行情数据
+        只处理持仓中的行，代价与变化行数成正比；返回更新的行数
+        """
+        rows = []
+        prices = []
+        prev_closes = []
+        for key, data in quotes.items():
+            row = self.row_of.get(key)
+            if row is None or not data:
+                continue
+            rows.append(row)
+            prices.append(data['price'])
+            prev_closes.append(data['yestclose'])
+        
+        if not rows:
+            return 0
+        
+        rows = np.array(rows, dtype=np.intp)
+        price = np.array(prices, dtype=np.float64)
+        prev_close = np.array(prev_closes, dtype=np.float64)
+        quantity = self.quantity[rows]
+        
+        market_value = quantity * price
+        day_pnl = quantity * (price - prev_close)
+        total_pnl = market_value - self.cost[rows]
+        
+        # 先把旧值从合计中减去（首次有行情的行旧值为0，且需计入成本）
+        currency = self.currency[rows]
+        newly_priced = ~self.priced[rows]
+        np.add.at(self._totals['cost'], currency, np.where(newly_priced, self.cost[rows], 0.0))
+        np.add.at(self._priced, currency, newly_priced)
+        np.add.at(self._totals['market_value'], currency, market_value - self.market_value[rows])
+        np.add.at(self._totals['day_pnl'], currency, day_pnl - self.day_pnl[rows])
+        np.add.at(self._totals['total_pnl'], currency, total_pnl - self.total_pnl[rows])
+        
+        self.price[rows] = price
+        self.prev_close[rows] = prev_close
+        self.market_value[rows] = market_value
+        self.day_pnl[rows] = day_pnl
+        self.total_pnl[rows] = total_pnl
+        self.priced[rows] = True
+        return len(rows)
+    
+    def recompute(self):
+        """按当前各行数值全量重算合计（用于校验或消除累计误差）"""
+        priced = self.priced
+        size = len(self.currencies)
+        for field in TOTAL_FIELDS:
+            values = getattr(self, field)
+            self._totals[field] = np.bincount(self.currency[priced], weights=values[priced], minlength=size)
+        self._priced = np.bincount(self.currency[priced], minlength=size)
+    
+    def position(self, key):
+        """单个持仓的估值，不在持仓中或尚无行情时返回None"""
+        row = self.row_of.get(key)
+        if row is None or not self.priced[row]:
+            return None
+        return {
+            'quantity': float(self.quantity[row]),
+            'cost_price': float(self.cost_price[row]),
+            'currency': self.currencies[self.currency[row]],
+            'price': float(self.price[row]),
+            'market_value': float(self.market_value[row]),
+            'day_pnl': float(self.day_pnl[row]),
+            'total_pnl': float(self.total_pnl[row])
+        }
+    
+    def totals(self):
+        """各币种合计：币种 -> {cost, market_value, day_pnl, total_pnl, priced, positions}"""
+        result = {}
+        for index, currency in enumerate(self.currencies):
+            result[currency] = {field: float(self._totals[field][index]) for field in TOTAL_FIELDS}
+            result[currency]['positions'] = int(self._positions[index])
+            result[currency]['priced'] = int(self._priced[index])
+        return result
@@ -0,0 +1,143 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+采样分析器
+后台线程定时采集所有线程的调用栈，输出flamegraph工具可读的折叠栈格式：
+    线程名;外层函数;...;内层函数 采样次数
+未启动时没有任何开销，启动后默认每10毫秒采样一次
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+class SamplingProfiler:
+    """全线程采样分析器"""
+    
+    def __init__(self, interval=0.01, max_depth=128):
+        self.interval = interval
+        self.max_depth = max_depth
+        
+        self._counts = {}
+        self._labels = {}  # code对象 -> 栈帧标签（缓存，避免每次格式化）
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.sampling_time = 0.0  # 采样本身消耗的时间，用于估算开销
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """开始采样（已在运行时忽略）"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self.started_at = time.perf_counter()
+        self.stopped_at = None
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """停止采样"""
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self.stopped_at = time.perf_counter()
+    
+    def reset(self):
+        """清空已采集的数据"""
+        with self._lock:
+            self._counts = {}
+        self.samples = 0
+        self.sampling_time = 0.0
+    
+    def overhead(self):
+        """采样开销占运行时间的比例"""
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.stopped_at or time.perf_counter()) - self.started_at
+        return self.sampling_time / elapsed if elapsed > 0 else 0.0
+    
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+            self._labels[code] = label
+        return label
+    
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            start = time.perf_counter()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == own_ident:
+                    continue
+                
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}').replace(';', ':'))
+                stack.reverse()
+                stacks.append(tuple(stack))
+            
+            with self._lock:
+                for stack in stacks:
+                    self._counts[stack] = self._counts.get(stack, 0) + 1
+            self.samples += 1
+            self.sampling_time += time.perf_counter() - start
+    
+    def collapsed(self):
+        """折叠栈文本（每行：栈;帧 计数）"""
+        with self._lock:
+            counts = dict(self._counts)
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(counts.items()))
+    
+    def write(self, path=None):
+        """写出折叠栈文件，返回文件路径"""
+        if path is None:
+            path = datetime.now().strftime('profile-%Y%m%d-%H%M%S.folded')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.collapsed())
+        return path
+    
+    def toggle(self, path=None):
+        """切换采样状态：停止时写出文件并返回路径，开始时返回None"""
+        if self.running:
+            self.stop()
+            written = self.write(path)
+            print(f"采样分析已停止: {self.samples} 次采样，开销 {self.overhead() * 100:.2f}%，已写入 {written}")
+            self.reset()
+            return written
+        
+        self.reset()
+        self.start()
+        print("采样分析已开始")
+        return None
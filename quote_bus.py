@@ -0,0 +1,288 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+进程内行情总线
+- 按品种分主题：('quote', 市场, 代码) 为实时行情，('kline', 市场, 代码) 为不复权日K线
+- 每个主题只有一个获取者：不论有多少窗口订阅同一品种，上游请求数只与不同品种的数量有关
+- 主题的刷新间隔取所有订阅者要求的最小值；休市期间已有收盘后的数据时不再轮询
+- K线经客户端的缓存获取（先返回缓存、过期时后台重新获取），投递时按各订阅的复权方式在本地复权，
+  切换复权方式不需要重新下载
+- 获取时的 refresh span 随数据投递，订阅者可以把界面绘制记录为它的子span
+- 投递给Tk窗口时按窗口合并：同一订阅只保留最新的一条消息，一批消息在Tk线程中一次处理；
+  发布方只写入各窗口的待投递表，不等待任何订阅者，慢的窗口不会拖慢其他窗口
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import TRACER
+
+
+class TkMailbox:
+    """一个Tk窗口的投递队列（线程安全，按订阅合并，批量投递）"""
+    
+    def __init__(self, root):
+        self.root = root
+        self.closed = False
+        self.delivered = 0
+        self.coalesced = 0
+        self._pending = {}  # Subscription -> (最新消息, refresh span)
+        self._scheduled = False
+        self._lock = threading.Lock()
+    
+    def post(self, subscription, data, span=None):
+        """任意线程：放入待投递表，需要时安排一次Tk线程中的批量投递"""
+        with self._lock:
+            if self.closed:
+                return
+            if subscription in self._pending:
+                self.coalesced += 1
+            self._pending[subscription] = (data, span)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        
+        try:
+            self.root.after(0, self._drain)
+        except Exception:
+            # 窗口已销毁
+            self.close()
+    
+    def _drain(self):
+        """Tk线程：投递这一批消息"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._scheduled = False
+        
+        for subscription, (data, span) in batch.items():
+            if subscription.active:
+                try:
+                    subscription.callback(data, span)
+                except Exception as e:
+                    print(f"处理行情消息失败 {subscription.topic}: {e}")
+                self.delivered += 1
+    
+    def close(self):
+        with self._lock:
+            self.closed = True
+            self._pending = {}
+
+
+class Subscription:
+    """一个订阅：主题、回调 callback(data, span)、要求的刷新间隔和K线复权方式"""
+    
+    def __init__(self, bus, topic, mailbox, callback, interval, days, adjust='none'):
+        self.bus = bus
+        self.topic = topic
+        self.mailbox = mailbox
+        self.callback = callback
+        self.interval = interval
+        self.days = days
+        self.adjust = adjust
+        self.active = True
+    
+    def cancel(self):
+        self.bus.unsubscribe(self)
+
+
+class _Topic:
+    """主题状态"""
+    
+    def __init__(self):
+        self.subscriptions = []
+        self.last = None  # 最近一次发布的数据
+        self.fetched_at = 0.0
+        self.due = 0.0
+        self.in_flight = False
+    
+    @property
+    def interval(self):
+        return min(s.interval for s in self.subscriptions)
+    
+    @property
+    def days(self):
+        return max(s.days or 0 for s in self.subscriptions)
+
+
+class QuoteBus:
+    """行情总线：每个主题一个获取者，结果发布给所有订阅者"""
+    
+    def __init__(self, api, max_workers=8, recorder=None, tick=0.2):
+        self.api = api
+        self.recorder = recorder
+        self.tick = tick
+        self.fetches = 0
+        self.published = 0
+        self.skipped_closed = 0
+        
+        self._topics = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = True
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='quote-bus')
+        self._thread = threading.Thread(target=self._loop, name='quote-bus-scheduler', daemon=True)
+        self._thread.start()
+    
+    @staticmethod
+    def quote_topic(market, code):
+        return ('quote', market.lower(), code.upper())
+    
+    @staticmethod
+    def kline_topic(market, code):
+        return ('kline', market.lower(), code.upper())
+    
+    def subscribe(self, topic, mailbox, callback, interval=2, days=None, adjust='none'):
+        """
+        订阅主题，callback(data, span) 在mailbox所属的Tk线程中调用（span为获取时的refresh span，可能为None）
+        已有数据时立即投递一次最近的数据；没有数据或数据已过刷新间隔时尽快获取
+        adjust: K线主题的复权方式 none / qfq / hfq，投递前在本地复权
+        """
+        subscription = Subscription(self, topic, mailbox, callback, interval, days, adjust)
+        with self._lock:
+            state = self._topics.setdefault(topic, _Topic())
+            state.subscriptions.append(subscription)
+            last = state.last
+            enough = topic[0] != 'kline' or last is None or len(last) >= (days or 0)
+            state.due = min(state.due, state.fetched_at + state.interval) if enough else 0.0
+        
+        if last is not None and enough:
+            if subscription.adjust != 'none':
+                # 复权可能要获取分红送转表，不在调用方（Tk）线程中进行
+                self._pool.submit(self._deliver, topic, [subscription], last)
+            else:
+                mailbox.post(subscription, last)
+        self._wakeup.set()
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        """取消订阅（主题的最近数据保留，重新订阅时可以立即显示）"""
+        subscription.active = False
+        with self._lock:
+            state = self._topics.get(subscription.topic)
+            if state and subscription in state.subscriptions:
+                state.subscriptions.remove(subscription)
+    
+    def refresh(self, topic):
+        """立即重新获取主题（例如手动刷新）"""
+        with self._lock:
+            state = self._topics.get(topic)
+            if state:
+                state.due = 0.0
+        self._wakeup.set()
+    
+    def subscriber_count(self, topic=None):
+        with self._lock:
+            if topic is not None:
+                state = self._topics.get(topic)
+                return len(state.subscriptions) if state else 0
+            return sum(len(state.subscriptions) for state in self._topics.values())
+    
+    def _loop(self):
+        """调度线程：把到期的主题交给线程池获取"""
+        while self._running:
+            now = time.time()
+            due = []
+            with self._lock:
+                for topic, state in self._topics.items():
+                    if state.subscriptions and not state.in_flight and now >= state.due:
+                        state.due = now + state.interval
+                        if not self._market_moved(topic, state):
+                            self.skipped_closed += 1
+                            continue
+                        state.in_flight = True
+                        due.append((topic, state.days))
+            
+            for topic, days in due:
+                self._pool.submit(self._fetch, topic, days)
+            
+            self._wakeup.wait(self.tick)
+            self._wakeup.clear()
+    
+    def _market_moved(self, topic, state):
+        """最近一次获取之后市场是否交易过（休市期间已有收盘后的行情或K线时返回False）"""
+        data = state.last
+        if not data:
+            return True
+        if topic[0] == 'quote':
+            degraded, fetched_at = data.get('degraded'), data.get('fetched_at')
+        else:
+            degraded, fetched_at = data.degraded, data.fetched_at
+        if degraded or fetched_at is None:
+            return True
+        _, market, code = topic
+        return self.api.get_calendar(code, market).has_traded_since(fetched_at)
+    
+    def _fetch(self, topic, days):
+        """线程池：获取一个主题并发布"""
+        data = span = None
+        try:
+            with TRACER.span('refresh', code=topic[2], market=topic[1], trigger='bus', topic=topic[0]) as span:
+                if topic[0] == 'quote':
+                    data = self.api.get_realtime_data(topic[2], topic[1])
+                    if self.recorder:
+                        self.recorder.record(data)
+                else:
+                    # 有足够的缓存时先发布缓存，缓存过期且之后有交易时段时后台重新获取，完成后再次发布
+                    data = self.api.get_kline_data(topic[2], topic[1], days=days or 30, swr=True,
+                                                   on_update=lambda series: self.publish(topic, series))
+        except Exception as e:
+            print(f"获取 {topic} 失败: {e}")
+        finally:
+            with self._lock:
+                state = self._topics.get(topic)
+                if state:
+                    state.in_flight = False
+            self.fetches += 1
+        
+        # 订阅者已有数据时不再发布过期的缓存，等后台重新获取完成后发布新数据
+        if topic[0] == 'kline' and data is not None and data.stale and not data.degraded:
+            with self._lock:
+                state = self._topics.get(topic)
+                if state and state.last is not None:
+                    return
+        
+        # K线获取失败时也发布（降级的缓存或空序列），由订阅者显示数据源异常
+        if data is not None:
+            self.publish(topic, data, span)
+    
+    def publish(self, topic, data, span=None):
+        """发布数据：只写入各订阅者的待投递表，不等待订阅者处理"""
+        with self._lock:
+            state = self._topics.setdefault(topic, _Topic())
+            state.last = data
+            state.fetched_at = time.time()
+            subscriptions = list(state.subscriptions)
+        
+        self._deliver(topic, subscriptions, data, span)
+        self.published += 1
+    
+    def _deliver(self, topic, subscriptions, data, span=None):
+        """投递给各订阅者；K线按订阅的复权方式复权，同一复权方式只计算一次"""
+        adjusted = {'none': data}
+        for subscription in subscriptions:
+            if subscription.adjust not in adjusted:
+                adjusted[subscription.adjust] = self.api.adjust_kline(data, topic[2], topic[1], subscription.adjust)
+            subscription.mailbox.post(subscription, adjusted[subscription.adjust], span)
+    
+    def stats(self):
+        with self._lock:
+            topics = sum(1 for state in self._topics.values() if state.subscriptions)
+        return {'topics': topics, 'subscriptions': self.subscriber_count(), 'fetches': self.fetches,
+                'published': self.published, 'skipped_closed': self.skipped_closed}
+    
+    def close(self):
+        self._running = False
+        self._wakeup.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,71 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+实时行情记录
+把收到的每条行情追加到按日期分文件的JSON Lines中（quotes/YYYY-MM-DD.jsonl），
+可用 export.py 导出为Arrow/Parquet
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+# 记录的字段
+QUOTE_FIELDS = ('market', 'code', 'price', 'open', 'high', 'low', 'yestclose', 'percent', 'volume', 'turnover')
+
+
+class QuoteRecorder:
+    """行情记录器（线程安全，每天一个文件）"""
+    
+    def __init__(self, directory='quotes'):
+        self.directory = directory
+        self.records = 0
+        self._file = None
+        self._day = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def path(self, day):
+        return os.path.join(self.directory, f'{day}.jsonl')
+    
+    def record(self, data):
+        """记录一条行情（缓存或降级数据不记录）"""
+        if not data or data.get('degraded') or data.get('stale'):
+            return
+        
+        fetched_at = data.get('fetched_at')
+        if fetched_at is None:
+            return
+        
+        line = {'time': fetched_at}
+        line.update({field: data.get(field) for field in QUOTE_FIELDS})
+        day = datetime.fromtimestamp(fetched_at).strftime('%Y-%m-%d')
+        
+        with self._lock:
+            if day != self._day:
+                if self._file:
+                    self._file.close()
+                self._file = open(self.path(day), 'a', encoding='utf-8')
+                self._day = day
+            self._file.write(json.dumps(line, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self.records += 1
+    
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+                self._day = None
@@ -0,0 +1,143 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+界面渲染调度
+- 视图模型：控件名 -> 控件选项（text、fg 等），由数据计算得到，与Tk无关
+- 与上次实际渲染的选项逐项比较，只对变化的控件调用 .config()，相同的计为跳过
+- 控件更新按帧率合并：两帧之间的多次更新只保留每个控件的最新选项
+- 每帧有时间预算，一次变化的控件太多时剩余的留到下一帧
+"""
+import time
+import tkinter as tk
+
+from metrics import RENDER_TIME, WIDGET_UPDATES
+
+_UNSET = object()
+
+
+class RenderScheduler:
+    """按帧率和帧时间预算把视图模型的变化应用到Tk控件"""
+    
+    def __init__(self, root, fps=30, budget_ms=4):
+        self.root = root
+        self.frame_interval = 1.0 / fps
+        self.budget = budget_ms / 1000
+        self.applied = 0    # 实际调用 .config() 的次数
+        self.skipped = 0    # 与已渲染内容相同而跳过的控件更新数
+        self.coalesced = 0  # 同一帧内被后来的更新合并的控件更新数
+        self.frames = 0
+        self.deferred = 0   # 帧时间预算用完、剩余控件推迟到下一帧的次数
+        
+        self._rendered = {}  # 控件 -> 已渲染的选项
+        self._pending = {}   # 控件 -> 待渲染的选项（按加入顺序渲染）
+        self._after_id = None
+        self._last_frame = 0.0
+    
+    def render(self, widgets, model):
+        """
+        渲染视图模型：widgets 为 控件名 -> 控件，model 为 控件名 -> 选项字典
+        只把与已渲染（或待渲染）内容不同的选项加入下一帧
+        """
+        for name, options in model.items():
+            self.set(widgets[name], **options)
+    
+    def set(self, widget, **options):
+        """设置一个控件的选项（下一帧生效）；与已渲染内容相同时跳过"""
+        pending = self._pending.get(widget, {})
+        rendered = self._rendered.get(widget, {})
+        changed = {key: value for key, value in options.items()
+                   if pending.get(key, rendered.get(key, _UNSET)) != value}
+        
+        if not changed:
+            self.skipped += 1
+            WIDGET_UPDATES.inc(result='skipped')
+            return
+        
+        if widget in self._pending:
+            # 上一次更新还没有渲染，合并为一次 .config()
+            self.coalesced += 1
+            WIDGET_UPDATES.inc(result='coalesced')
+            pending.update(changed)
+        else:
+            self._pending[widget] = changed
+        self._schedule()
+    
+    def _schedule(self):
+        """安排下一帧（帧率上限：距上一帧不足一帧间隔时延后）"""
+        if self._after_id is not None:
+            return
+        wait = self._last_frame + self.frame_interval - time.perf_counter()
+        try:
+            self._after_id = self.root.after(max(0, int(wait * 1000)), self._frame)
+        except tk.TclError:
+            # 窗口已销毁
+            self._pending.clear()
+    
+    def _frame(self):
+        """渲染一帧：在时间预算内依次应用待渲染的控件（每帧至少一个）"""
+        self._after_id = None
+        start = self._last_frame = time.perf_counter()
+        applied = 0
+        
+        while self._pending:
+            if applied and time.perf_counter() - start > self.budget:
+                self.deferred += 1
+                break
+            widget = next(iter(self._pending))
+            self._apply(widget, self._pending.pop(widget))
+            applied += 1
+        
+        self.frames += 1
+        RENDER_TIME.observe(time.perf_counter() - start, view='frame')
+        if self._pending:
+            self._schedule()
+    
+    def _apply(self, widget, options):
+        try:
+            widget.config(**options)
+        except tk.TclError:
+            # 控件已销毁
+            self._rendered.pop(widget, None)
+            return
+        self._rendered.setdefault(widget, {}).update(options)
+        self.applied += 1
+        WIDGET_UPDATES.inc(result='applied')
+    
+    def flush(self):
+        """立即应用全部待渲染的控件（例如需要马上显示结果的基准测试）"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        while self._pending:
+            widget = next(iter(self._pending))
+            self._apply(widget, self._pending.pop(widget))
+    
+    def forget(self, widget):
+        """控件被销毁或被其他代码直接修改后，下次渲染时不再跳过"""
+        self._rendered.pop(widget, None)
+        self._pending.pop(widget, None)
+    
+    def stats(self):
+        return {'applied': self.applied, 'skipped': self.skipped, 'coalesced': self.coalesced,
+                'frames': self.frames, 'deferred': self.deferred, 'pending': len(self._pending)}
+    
+    def close(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self._pending.clear()
@@ -0,0 +1,274 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+上游请求容错层（按主机区分）
+- 滚动统计请求延迟分位数
+- 请求耗时超过p95仍未返回时发出对冲请求，取先返回的结果
+- 连续失败后熔断，熔断期间请求立即失败，不再逐个等待超时
+- 可选的令牌桶限速（批量任务避免触发上游限流）
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class LatencyTracker:
+    """滚动窗口延迟统计"""
+    
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def __len__(self):
+        return len(self._samples)
+    
+    def percentile(self, p):
+        """返回第p百分位的延迟（秒），无样本时返回None"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class RateLimiter:
+    """令牌桶限速器（线程安全）"""
+    
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """取得一个令牌，没有令牌时阻塞等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait_time = (1.0 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class CircuitBreaker:
+    """熔断器：closed -> open -> half_open -> closed"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        """是否允许发起请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_running = False
+            
+            # 半开状态只放行一个试探请求
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class HostResilience:
+    """单个上游主机的延迟统计、对冲请求和熔断"""
+    
+    # 样本数达到该值后才启用对冲
+    MIN_SAMPLES_FOR_HEDGE = 20
+    
+    def __init__(self, host, executor, hedge_percentile=95):
+        self.host = host
+        self.executor = executor
+        self.hedge_percentile = hedge_percentile
+        # 单次上游请求的延迟（用于决定对冲时机）
+        self.latency = LatencyTracker()
+        # 调用方实际等待的延迟（含对冲效果）
+        self.served_latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        self.rate_limiter = None
+        
+        self.requests = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+    
+    def hedge_delay(self):
+        """对冲等待时间（p95延迟），样本不足或主机已限速时返回None"""
+        # 限速的主机不对冲：对冲请求要再占一个令牌和一个工作线程，只会让限速更紧
+        if self.rate_limiter is not None or len(self.latency) < self.MIN_SAMPLES_FOR_HEDGE:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+    
+    def call(self, fn):
+        """
+        执行请求函数fn（返回requests.Response）
+        熔断打开时抛出CircuitOpenError
+        """
+        if not self.breaker.allow():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(f"{self.host} 熔断中，请求被拒绝")
+        
+        with self._lock:
+            self.requests += 1
+        
+        # 在提交请求之前取得令牌，令牌等待不计入对冲计时
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        
+        def attempt():
+            attempt_start = time.monotonic()
+            response = fn()
+            if response.status_code < 500:
+                self.latency.record(time.monotonic() - attempt_start)
+            return response
+        
+        start = time.monotonic()
+        primary = self.executor.submit(attempt)
+        futures = [primary]
+        
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = wait(futures, timeout=delay)
+            if not done:
+                futures.append(self.executor.submit(attempt))
+                with self._lock:
+                    self.hedges += 1
+        
+        # 取第一个成功的结果；全部失败时抛出最后一个异常
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                
+                if response.status_code >= 500:
+                    error = requests.HTTPError(f"{self.host} 返回 {response.status_code}")
+                    continue
+                
+                self.served_latency.record(time.monotonic() - start)
+                self.breaker.record_success()
+                if future is not primary:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return response
+        
+        with self._lock:
+            self.failures += 1
+        self.breaker.record_failure()
+        raise error
+    
+    def stats(self):
+        """统计信息"""
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+        
+        return {
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'requests': self.requests,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'p50_ms': ms(self.latency.percentile(50)),
+            'p95_ms': ms(self.latency.percentile(95)),
+            'p99_ms': ms(self.latency.percentile(99)),
+            'served_p99_ms': ms(self.served_latency.percentile(99)),
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'hedge_win_rate': round(self.hedge_wins / self.hedges, 3) if self.hedges else None
+        }
+
+
+class ResilienceManager:
+    """按主机管理容错状态"""
+    
+    def __init__(self, max_workers=16):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upstream')
+        self._hosts = {}
+        self._lock = threading.Lock()
+    
+    def host(self, url):
+        """获取url对应主机的容错状态"""
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostResilience(host, self.executor)
+            return self._hosts[host]
+    
+    def set_rate_limit(self, url, rate, burst=None):
+        """限制url所在主机的请求速率（每秒rate个），rate为None时取消限速"""
+        self.host(url).rate_limiter = RateLimiter(rate, burst) if rate else None
+    
+    def get(self, url, **kwargs):
+        """带对冲和熔断的GET请求，参数同requests.get"""
+        return self.host(url).call(lambda: requests.get(url, **kwargs))
+    
+    def stats(self):
+        """所有主机的统计信息：主机 -> 统计字典"""
+        with self._lock:
+            hosts = dict(self._hosts)
+        return {host: state.stats() for host, state in hosts.items()}
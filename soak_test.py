@@ -0,0 +1,598 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+长时间运行（soak）测试
+在加速的模拟时间里连续运行多个模拟交易日，完全离线：
+- 上游：本地HTTP测试桩（子进程），模拟实时行情、日K线、分时和分红送转接口，价格随机游走，
+  每个模拟交易日前3/4为交易时段、其余为休市
+- 程序：真实的API客户端 + 行情总线 + 渲染调度 + 主程序的K线视图（KLineView）；Tk事件循环换成无界面的事件循环，
+  K线图和分时图在Agg画布上创建和更新，每个模拟交易日各窗口切换一次股票
+- 定期记录 tracemalloc、线程数、matplotlib Figure数、文件描述符数；预热之后对各项做线性拟合，
+  增长超过阈值时输出增长最多的内存分配位置并以状态1退出
+
+用法：python soak_test.py --days 20 --day-seconds 5 --windows 2
+"""
+import argparse
+import gc
+import heapq
+import itertools
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from api_client import NetEaseFinanceAPI
+from intraday_chart import IntradayPlot
+from kline_chart import KLinePlot
+from kline_view import KLineView
+from main import quote_view_model
+from metrics import TRACER
+from quote_bus import QuoteBus, TkMailbox
+from render_scheduler import RenderScheduler
+
+# 交易时段占模拟交易日的比例，一个交易日241分钟（与A股分时相同）
+OPEN_FRACTION = 0.75
+SESSION_MINUTES = 241
+HISTORY_DAYS = 400
+FIRST_DAY = date(2025, 1, 1)
+
+DEFAULT_SYMBOLS = 'sh:600000,sz:000001,sh:600519,sz:300750,sh:601318'
+
+
+class SimClock:
+    """加速的模拟时钟：start起每day_seconds秒为一个模拟交易日"""
+    
+    def __init__(self, start, day_seconds):
+        self.start = start
+        self.day_seconds = day_seconds
+    
+    def elapsed_days(self, t=None):
+        return ((time.time() if t is None else t) - self.start) / self.day_seconds
+    
+    def day(self, t=None):
+        return int(self.elapsed_days(t))
+    
+    def minute(self, t=None):
+        """当前模拟交易日已经走过的分钟序号（休市后为最后一分钟）"""
+        phase = self.elapsed_days(t) % 1
+        if phase >= OPEN_FRACTION:
+            return SESSION_MINUTES - 1
+        return min(SESSION_MINUTES - 1, int(phase / OPEN_FRACTION * SESSION_MINUTES))
+
+
+class SimCalendar:
+    """模拟时钟上的交易日历（接口与 trading_calendar.TradingCalendar 中总线和客户端用到的部分相同）"""
+    
+    def __init__(self, clock):
+        self.clock = clock
+    
+    def is_open(self, t=None):
+        return self.clock.elapsed_days(t) % 1 < OPEN_FRACTION
+    
+    def has_traded_since(self, timestamp, t=None):
+        """timestamp 到 t 之间是否有交易时段"""
+        begin, end = self.clock.elapsed_days(timestamp), self.clock.elapsed_days(t)
+        if end <= begin:
+            return False
+        day = int(begin)
+        while day < end:
+            if begin < day + OPEN_FRACTION and end > day:
+                return True
+            day += 1
+        return False
+
+
+# ---------------------------------------------------------------- 上游测试桩
+
+class StubMarket:
+    """测试桩的行情数据：按secid确定的随机游走，同一时刻的结果总是相同"""
+    
+    def __init__(self, clock, days):
+        self.clock = clock
+        self.days = days
+        self._closes = {}
+        self._lock = threading.Lock()
+    
+    def closes(self, secid):
+        """各交易日收盘价（含 HISTORY_DAYS 天历史）"""
+        with self._lock:
+            closes = self._closes.get(secid)
+            if closes is None:
+                rng = np.random.default_rng(zlib.crc32(secid.encode()))
+                base = rng.uniform(5, 200)
+                returns = rng.normal(0, 0.015, HISTORY_DAYS + self.days + 2)
+                closes = self._closes[secid] = np.round(base * np.exp(np.cumsum(returns)), 2)
+            return closes
+    
+    def intraday(self, secid, day):
+        """某个模拟交易日的分钟价格（从前收到当日收盘的布朗桥）"""
+        closes = self.closes(secid)
+        index = HISTORY_DAYS + min(day, self.days)
+        open_price, close = closes[index - 1], closes[index]
+        rng = np.random.default_rng([zlib.crc32(secid.encode()), index])
+        t = np.linspace(0, 1, SESSION_MINUTES)
+        noise = np.cumsum(rng.normal(0, 0.001, SESSION_MINUTES))
+        prices = open_price + (close - open_price) * t + (noise - t * noise[-1]) * open_price
+        return np.round(np.maximum(prices, 0.01), 2)
+    
+    def bar(self, secid, day, minute=SESSION_MINUTES - 1):
+        """某个模拟交易日（截至minute）的日K线：(日期, 开, 收, 高, 低, 量)"""
+        prices = self.intraday(secid, day)[:minute + 1]
+        return ((FIRST_DAY + timedelta(days=day)).isoformat(), prices[0], prices[-1],
+                prices.max(), prices.min(), 10000 + 10 * minute)
+    
+    def quote(self, secid):
+        day, minute = self.clock.day(), self.clock.minute()
+        _, open_price, price, high, low, volume = self.bar(secid, day, minute)
+        yestclose = self.closes(secid)[HISTORY_DAYS + min(day, self.days) - 1]
+        code = secid.split('.', 1)[1]
+        return {
+            'f43': round(price * 100), 'f44': round(high * 100), 'f45': round(low * 100),
+            'f46': round(open_price * 100), 'f47': volume, 'f48': volume * price * 100,
+            'f57': code, 'f58': f'测试{code}', 'f60': round(yestclose * 100),
+            'f170': round((price / yestclose - 1) * 10000)
+        }
+    
+    def klines(self, secid, limit):
+        day, minute = self.clock.day(), self.clock.minute()
+        first = max(day - limit + 1, -HISTORY_DAYS + 1)
+        bars = [self.bar(secid, d) for d in range(first, day)] + [self.bar(secid, day, minute)]
+        return [f'{d},{o:.2f},{c:.2f},{h:.2f},{l:.2f},{v}' for d, o, c, h, l, v in bars]
+    
+    def trends(self, secid):
+        day, minute = self.clock.day(), self.clock.minute()
+        prices = self.intraday(secid, day)[:minute + 1]
+        today = (FIRST_DAY + timedelta(days=day)).isoformat()
+        lines = []
+        for i, price in enumerate(prices):
+            # 9:30 为第0分钟，11:30 为第120分钟，13:01 为第121分钟
+            start, offset = (9 * 60 + 30, i) if i <= 120 else (13 * 60, i - 120)
+            hhmm = f'{(start + offset) // 60:02d}:{(start + offset) % 60:02d}'
+            lines.append(f'{today} {hhmm},{price:.2f},{price:.2f},{price:.2f},{price:.2f},100,1000,{price:.2f}')
+        return {'preClose': float(self.closes(secid)[HISTORY_DAYS + min(day, self.days) - 1]), 'trends': lines}
+
+
+def make_handler(market):
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            secid = params.get('secid', '1.600000')
+            
+            if url.path == '/api/qt/stock/get':
+                body = f"jQuery({json.dumps({'data': market.quote(secid)})})"
+            elif url.path == '/api/qt/stock/kline/get':
+                body = json.dumps({'data': {'klines': market.klines(secid, int(params.get('lmt', 30)))}})
+            elif url.path == '/api/qt/stock/trends2/get':
+                body = json.dumps({'data': market.trends(secid)})
+            elif url.path == '/api/data/v1/get':
+                ex_date = (FIRST_DAY + timedelta(days=3)).isoformat()
+                body = json.dumps({'result': {'data': [
+                    {'EX_DIVIDEND_DATE': f'{ex_date} 00:00:00', 'PRETAX_BONUS_RMB': 2.0, 'BONUS_IT_RATIO': 0}]}})
+            else:
+                self.send_error(404)
+                return
+            
+            content = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    return StubHandler
+
+
+def serve_stub(start, day_seconds, days):
+    """子进程：运行上游测试桩，把端口号写到标准输出"""
+    market = StubMarket(SimClock(start, day_seconds), days)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(market))
+    server.daemon_threads = True
+    print(f"PORT {server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+def start_stub(start, day_seconds, days):
+    """启动测试桩子进程，返回 (进程, 上游地址)"""
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve',
+                             '--start', repr(start), '--day-seconds', str(day_seconds), '--days', str(days)],
+                            stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line.startswith('PORT'):
+        proc.kill()
+        raise RuntimeError("测试桩启动失败")
+    return proc, f"http://127.0.0.1:{line.split()[1]}"
+
+
+# ---------------------------------------------------------------- 被测程序
+
+class HeadlessLoop:
+    """无界面的事件循环：提供 TkMailbox / RenderScheduler 用到的 after / after_cancel（线程安全）"""
+    
+    def __init__(self):
+        self._queue = []
+        self._ids = itertools.count(1)
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self.max_callback = 0.0  # 最长的一次回调（秒），相当于Tk事件循环被阻塞的时间
+    
+    def after(self, ms, callback):
+        with self._lock:
+            after_id = next(self._ids)
+            heapq.heappush(self._queue, (time.perf_counter() + ms / 1000, after_id, callback))
+        return after_id
+    
+    def after_cancel(self, after_id):
+        with self._lock:
+            self._cancelled.add(after_id)
+    
+    def run_for(self, seconds):
+        """在主线程中运行到期的回调，最多运行seconds秒（回调跟不上时剩余的留到下一次）"""
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            with self._lock:
+                due = self._queue and self._queue[0][0] <= time.perf_counter()
+                if due:
+                    _, after_id, callback = heapq.heappop(self._queue)
+                    if after_id in self._cancelled:
+                        self._cancelled.discard(after_id)
+                        continue
+            if due:
+                started = time.perf_counter()
+                callback()
+                self.max_callback = max(self.max_callback, time.perf_counter() - started)
+            else:
+                time.sleep(0.002)
+
+
+class HeadlessLabel:
+    """代替 tk.Label：记录 .config() 的选项"""
+    
+    def __init__(self):
+        self.options = {}
+    
+    def config(self, **options):
+        self.options.update(options)
+
+
+class SoakKLineView(KLineView):
+    """主程序的K线视图（KLineView：订阅替换、图表创建和复用），图表换成Agg画布上的KLinePlot"""
+    
+    def __init__(self, bus, mailbox, interval):
+        super().__init__(bus, mailbox, interval)
+        self.errors = 0
+    
+    def create_chart(self, kline_data):
+        # 与 KLineChart 相同：每个图表一个Figure，图表销毁后Figure随之释放
+        figure = Figure(figsize=(6, 4), dpi=80)
+        canvas = FigureCanvasAgg(figure)
+        plot = KLinePlot(figure, canvas, kline_data)
+        canvas.draw()
+        return plot
+    
+    def show_message(self, text, error=False):
+        if error:
+            self.errors += 1
+
+
+class SoakWindow:
+    """一个监控窗口的数据流：订阅 -> 批量投递 -> 视图模型 -> 渲染调度 / K线图 / 分时图"""
+    
+    def __init__(self, index, loop, api, bus, symbols, quote_interval, adjust):
+        self.api = api
+        self.bus = bus
+        self.symbols = symbols
+        self.quote_interval = quote_interval
+        self.adjust = adjust
+        self.current = index % len(symbols)
+        
+        self.mailbox = TkMailbox(loop)
+        self.renderer = RenderScheduler(loop, fps=30)
+        self.widgets = {name: HeadlessLabel() for name in
+                        ('name', 'price', 'change', 'open', 'high', 'low', 'yestclose', 'volume', 'turnover', 'time')}
+        self.quote_subscriptions = []
+        # K线视图与主程序共用 KLineView，切换股票时替换订阅、复用图表
+        self.kline_view = SoakKLineView(bus, self.mailbox, interval=api.kline_ttl)
+        
+        # 分时图的Figure，切换股票时在同一个Figure上重建
+        self.intraday_figure = Figure(figsize=(6, 4), dpi=80)
+        self.intraday_canvas = FigureCanvasAgg(self.intraday_figure)
+        self.intraday_plot = None
+        
+        self.quotes = 0
+    
+    def switch(self, step=1):
+        """切换到下一个股票：重新订阅，重建分时图"""
+        self.current = (self.current + step) % len(self.symbols)
+        market, code = self.symbols[self.current]
+        
+        for subscription in self.quote_subscriptions:
+            subscription.cancel()
+        self.quote_subscriptions = []
+        for i, (m, c) in enumerate(self.symbols):
+            # 当前股票按行情间隔刷新，其他（持仓）慢5倍
+            interval = self.quote_interval if i == self.current else self.quote_interval * 5
+            callback = (lambda data, span, key=(m, c): self.on_quote(key, data))
+            self.quote_subscriptions.append(self.bus.subscribe(self.bus.quote_topic(m, c), self.mailbox,
+                                                               callback, interval=interval))
+        
+        self.kline_view.load(market, code, self.adjust, is_current=lambda: self.symbols[self.current] == (market, code))
+        
+        self.intraday_figure.clear()
+        self.intraday_plot = IntradayPlot(self.intraday_figure, self.intraday_canvas,
+                                          self.api.get_intraday_data(code, market))
+        self.intraday_canvas.draw()
+    
+    def on_quote(self, key, data):
+        self.quotes += 1
+        if key != self.symbols[self.current]:
+            return
+        self.renderer.render(self.widgets, quote_view_model(data))
+        if self.intraday_plot is not None:
+            self.intraday_plot.append_minutes([{'time': data['time'][:5], 'price': data['price'],
+                                               'yestclose': data['yestclose']}])
+    
+    def close(self):
+        for subscription in self.quote_subscriptions:
+            subscription.cancel()
+        self.kline_view.close()
+        self.mailbox.close()
+        self.renderer.close()
+
+
+# ---------------------------------------------------------------- 资源跟踪
+
+def count_fds():
+    """本进程打开的文件描述符数（没有 /proc 的平台返回None）"""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def count_figures():
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, Figure))
+
+
+class ResourceTracker:
+    """定期采样资源用量，预热之后对各项做线性拟合"""
+    
+    # 指标 -> (说明, 单位换算, 单位)
+    METRICS = {
+        'memory': ('tracemalloc', 1 / 1024, 'KiB'),
+        'threads': ('线程数', 1, ''),
+        'figures': ('Figure数', 1, ''),
+        'fds': ('文件描述符数', 1, '')
+    }
+    
+    def __init__(self, clock):
+        self.clock = clock
+        self.samples = []  # (模拟天数, {指标: 值})
+        self.baseline = None  # 预热结束时的 tracemalloc 快照
+        self.warm_index = None
+    
+    def sample(self):
+        gc.collect()
+        values = {
+            'memory': tracemalloc.get_traced_memory()[0],
+            'threads': threading.active_count(),
+            'figures': count_figures(),
+            'fds': count_fds()
+        }
+        self.samples.append((self.clock.elapsed_days(), values))
+        return values
+    
+    def mark_warm(self):
+        self.baseline = tracemalloc.take_snapshot()
+        self.warm_index = len(self.samples)
+    
+    def growth(self):
+        """预热之后各项的拟合增长：{指标: (每模拟日增长, 整个测量期增长)}"""
+        if self.warm_index is None:
+            return {}
+        measured = self.samples[self.warm_index:]
+        if len(measured) < 3:
+            return {}
+        days = np.array([day for day, _ in measured])
+        result = {}
+        for name in self.METRICS:
+            values = [values[name] for _, values in measured]
+            if any(value is None for value in values):
+                continue
+            slope = np.polyfit(days, np.array(values, dtype=np.float64), 1)[0]
+            result[name] = (slope, slope * (days[-1] - days[0]))
+        return result
+    
+    def top_allocations(self, limit=10):
+        """预热之后增长最多的分配位置"""
+        if self.baseline is None:
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')
+        ])
+        stats = snapshot.compare_to(self.baseline, 'lineno')
+        return sorted(stats, key=lambda stat: stat.size_diff, reverse=True)[:limit]
+
+
+# ---------------------------------------------------------------- 主流程
+
+def parse_symbols(text):
+    return [tuple(item.split(':', 1)) for item in text.split(',') if item]
+
+
+def run_soak(args):
+    """运行soak测试，返回是否通过"""
+    # 测试环境可能没有中文字体，缺字警告与本测试无关
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    warnings.filterwarnings('ignore', message='Glyph')
+    
+    start = time.time() + 1.0  # 留出测试桩启动时间，模拟第0天从这里开始
+    clock = SimClock(start, args.day_seconds)
+    stub, upstream = start_stub(start, args.day_seconds, args.days)
+    
+    class SoakAPI(NetEaseFinanceAPI):
+        def get_calendar(self, code, market):
+            return calendar
+    
+    calendar = SimCalendar(clock)
+    # 链路缓冲区有上限，缩小后在预热期内即可填满，不会被算作增长
+    TRACER.set_capacity(args.trace_spans)
+    tracemalloc.start()
+    tracker = ResourceTracker(clock)
+    windows = []
+    bus = None
+    try:
+        api = SoakAPI(upstream=upstream)
+        api.realtime_ttl = args.quote_interval
+        api.kline_ttl = args.day_seconds / 2
+        bus = QuoteBus(api, tick=min(0.05, args.quote_interval / 2))
+        loop = HeadlessLoop()
+        symbols = parse_symbols(args.symbols)
+        
+        time.sleep(max(0.0, start - time.time()))
+        adjust_modes = ('none', 'qfq', 'hfq')
+        windows = [SoakWindow(i, loop, api, bus, symbols, args.quote_interval, adjust_modes[i % 3])
+                   for i in range(args.windows)]
+        for window in windows:
+            window.switch(step=0)
+        
+        print(f"soak测试：{args.days}个模拟交易日，每日{args.day_seconds}秒，{args.windows}个窗口，"
+              f"{len(symbols)}个品种，上游测试桩 {upstream}")
+        day = 0
+        next_sample = time.time()
+        while clock.elapsed_days() < args.days:
+            loop.run_for(0.02)
+            
+            if clock.day() != day:
+                day = clock.day()
+                for window in windows:
+                    window.switch()
+                if day == args.warmup_days:
+                    tracker.mark_warm()
+            
+            if time.time() >= next_sample:
+                next_sample += args.sample_seconds
+                values = tracker.sample()
+                print(f"第{clock.elapsed_days():5.1f}天  内存 {values['memory'] / 1024:8.0f}KiB  "
+                      f"线程 {values['threads']:3d}  Figure {values['figures']:3d}  "
+                      f"文件描述符 {values['fds'] if values['fds'] is not None else '-'}  "
+                      f"最长回调 {loop.max_callback * 1000:4.0f}ms  总线 {bus.stats()['fetches']}次获取", flush=True)
+                loop.max_callback = 0.0
+        
+        print()
+        print(f"总线: {bus.stats()}")
+        print(f"渲染: {windows[0].renderer.stats()}")
+        print("窗口: " + ", ".join(f"{w.quotes}条行情/{w.kline_view.created}次创建K线图/"
+                                   f"{w.kline_view.updated}次K线重绘" for w in windows))
+        return report(tracker, args, windows)
+    finally:
+        for window in windows:
+            window.close()
+        if bus:
+            bus.close()
+        stub.kill()
+        stub.wait()
+
+
+def report(tracker, args, windows=()):
+    """输出各项的增长趋势，超过阈值或K线图没有复用时返回False"""
+    limits = {'memory': args.max_memory_kib * 1024, 'threads': args.max_threads,
+              'figures': args.max_figures, 'fds': args.max_fds}
+    passed = True
+    
+    print()
+    print("预热后增长趋势（线性拟合）：")
+    growth = tracker.growth()
+    if not growth:
+        print("  采样点不足，请增加 --days 或减小 --sample-seconds")
+        return False
+    
+    for name, (label, scale, unit) in ResourceTracker.METRICS.items():
+        if name not in growth:
+            print(f"  {label:<12} 不支持（本平台无法统计）")
+            continue
+        per_day, total = growth[name]
+        ok = total <= limits[name]
+        passed = passed and ok
+        print(f"  {label:<12} 每日 {per_day * scale:+9.2f}{unit}  测量期 {total * scale:+9.2f}{unit}  "
+              f"上限 {limits[name] * scale:g}{unit}  {'通过' if ok else '失败'}")
+    
+    # 每个窗口只应创建一次K线图（数据源异常销毁图表后除外），之后都在同一个图表上重绘
+    for index, window in enumerate(windows):
+        view = window.kline_view
+        if view.created > 1 + view.errors:
+            passed = False
+            print(f"  窗口{index} 创建了 {view.created} 次K线图（数据源异常 {view.errors} 次），K线图没有复用  失败")
+    
+    if not passed:
+        print()
+        print("预热后增长最多的内存分配位置：")
+        for stat in tracker.top_allocations():
+            print(f"  {stat}")
+    
+    print()
+    print("通过" if passed else "失败：资源用量持续增长或K线图没有复用")
+    return passed
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="长时间运行（soak）测试：加速的模拟交易日、本地上游测试桩、资源增长检测")
+    parser.add_argument('--days', type=int, default=20, help="模拟交易日数（默认 20）")
+    parser.add_argument('--day-seconds', type=float, default=5.0, help="每个模拟交易日的实际秒数（默认 5）")
+    parser.add_argument('--windows', type=int, default=2, help="监控窗口数（默认 2）")
+    parser.add_argument('--symbols', default=DEFAULT_SYMBOLS, help="品种列表，如 sh:600000,sz:000001")
+    parser.add_argument('--quote-interval', type=float, default=0.25, help="当前股票的行情刷新间隔（秒，默认 0.25）")
+    parser.add_argument('--sample-seconds', type=float, default=2.0, help="资源采样间隔（秒，默认 2）")
+    parser.add_argument('--warmup-days', type=int, default=5, help="预热天数，不计入趋势（默认 5）")
+    parser.add_argument('--max-memory-kib', type=float, default=1024, help="测量期内允许的内存增长（KiB，默认 1024）")
+    parser.add_argument('--max-threads', type=float, default=1.5, help="测量期内允许的线程数增长（默认 1.5）")
+    parser.add_argument('--max-figures', type=float, default=0.5, help="测量期内允许的Figure数增长（默认 0.5）")
+    parser.add_argument('--max-fds', type=float, default=2, help="测量期内允许的文件描述符数增长（默认 2）")
+    parser.add_argument('--trace-spans', type=int, default=200, help="保留的链路span数（默认 200）")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--start', type=float, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    if args.serve:
+        serve_stub(args.start, args.day_seconds, args.days)
+        return
+    sys.exit(0 if run_soak(args) else 1)
+
+
+if __name__ == '__main__':
+    main()
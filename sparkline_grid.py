@@ -0,0 +1,259 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+迷你K线网格视图
+- 每个品种的迷你图在进程池中用Agg后端离屏绘制为PNG，不在Tk线程中创建Figure
+- 绘制结果按 (品种, 数据版本) 缓存为PhotoImage，数据版本不变时不重新绘制
+- Tk线程只负责把缓存的位图贴到网格单元中
+"""
+import base64
+import queue
+import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+
+from metrics import RENDER_TIME
+
+# 单元格尺寸（像素）
+CELL_WIDTH = 160
+CELL_HEIGHT = 60
+
+
+def render_sparkline(opens, highs, lows, closes, width=CELL_WIDTH, height=CELL_HEIGHT, candles=False):
+    """
+    子进程：离屏绘制迷你图，返回PNG字节
+    candles为False时绘制收盘价折线，为True时绘制迷你蜡烛图
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    dpi = 50
+    figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi, facecolor='#2d2d2d')
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_axes([0, 0, 1, 1])
+    ax.set_facecolor('#2d2d2d')
+    ax.set_axis_off()
+    
+    closes = np.asarray(closes, dtype=float)
+    x = np.arange(len(closes))
+    color = '#ff4d4f' if closes[-1] >= closes[0] else '#52c41a'
+    
+    if candles:
+        opens = np.asarray(opens, dtype=float)
+        up = closes >= opens
+        colors = np.where(up, '#ff4d4f', '#52c41a')
+        ax.vlines(x, lows, highs, colors=colors, linewidth=0.8)
+        ax.bar(x, np.maximum(np.abs(closes - opens), 1e-9), bottom=np.minimum(opens, closes),
+               width=0.7, color=colors, linewidth=0)
+        ax.set_ylim(min(lows) * 0.998, max(highs) * 1.002)
+    else:
+        ax.plot(x, closes, color=color, linewidth=1.2)
+        ax.fill_between(x, closes, closes.min(), color=color, alpha=0.15, linewidth=0)
+        ax.set_ylim(closes.min(), closes.max() if closes.max() > closes.min() else closes.min() + 1)
+    ax.set_xlim(-0.5, len(closes) - 0.5)
+    
+    output = BytesIO()
+    canvas.print_png(output)
+    return output.getvalue()
+
+
+def data_version(bars):
+    """K线数据版本（最后一根K线变化或数量变化时改变）"""
+    if not bars:
+        return None
+    last = bars[-1]
+    return (len(bars), last['date'], last['close'], last['high'], last['low'])
+
+
+class SparklineRenderer:
+    """
+    迷你图渲染器：进程池离屏绘制 + PhotoImage缓存
+    绘制完成的PNG通过队列交给Tk线程，由Tk线程创建PhotoImage
+    """
+    
+    def __init__(self, root, workers=None, candles=False):
+        self.root = root
+        self.candles = candles
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.images = {}  # 品种 -> (数据版本, PhotoImage)
+        self.rendered = 0
+        self.cache_hits = 0
+        self._pending = {}  # 品种 -> 正在绘制的数据版本
+        self._results = queue.Queue()
+        self._callbacks = {}
+        self._after_id = None
+        self._poll()
+    
+    def request(self, symbol, bars, callback):
+        """
+        请求品种的迷你图，callback(PhotoImage) 在Tk线程中调用
+        数据版本未变时直接使用缓存；同一版本正在绘制时不重复提交
+        """
+        version = data_version(bars)
+        if version is None:
+            return
+        
+        cached = self.images.get(symbol)
+        if cached and cached[0] == version:
+            self.cache_hits += 1
+            callback(cached[1])
+            return
+        
+        self._callbacks[symbol] = callback
+        if self._pending.get(symbol) == version:
+            return
+        self._pending[symbol] = version
+        
+        columns = [[bar[field] for bar in bars] for field in ('open', 'high', 'low', 'close')]
+        future = self.pool.submit(render_sparkline, *columns, candles=self.candles)
+        future.add_done_callback(lambda f: self._results.put((symbol, version, f)))
+    
+    def _poll(self):
+        """Tk线程：取出绘制完成的结果，创建PhotoImage并回调"""
+        while True:
+            try:
+                symbol, version, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            
+            if self._pending.get(symbol) != version:
+                continue  # 已有更新的版本在绘制
+            del self._pending[symbol]
+            
+            try:
+                png = future.result()
+            except Exception as e:
+                print(f"绘制迷你图失败 {symbol}: {e}")
+                continue
+            
+            with RENDER_TIME.time(view='sparkline_blit'):
+                image = tk.PhotoImage(data=base64.b64encode(png))
+            self.images[symbol] = (version, image)
+            self.rendered += 1
+            
+            callback = self._callbacks.pop(symbol, None)
+            if callback:
+                callback(image)
+        
+        self._after_id = self.root.after(30, self._poll)
+    
+    def close(self):
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SparklineWindow:
+    """自选股迷你K线网格窗口"""
+    
+    def __init__(self, parent, api, stocks, columns=4, days=60, interval=60):
+        self.api = api
+        self.stocks = list(stocks)
+        self.columns = columns
+        self.days = days
+        self.interval = interval
+        self.is_running = True
+        
+        self.window = tk.Toplevel(parent, bg='#1e1e1e')
+        self.window.title("总览")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        # 父窗口被销毁时窗口随之销毁，此时也要停止刷新和后台进程
+        self.window.bind('<Destroy>', self.on_destroy)
+        
+        self.renderer = SparklineRenderer(self.window)
+        self.loader = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sparkline-loader')
+        
+        self.status_label = tk.Label(self.window, text="加载中...", font=('Arial', 9),
+                                     bg='#1e1e1e', fg='#888888', anchor='w')
+        self.status_label.grid(row=0, column=0, columnspan=columns, sticky='we', padx=5)
+        
+        # 空白占位图，使单元格在位图到达前就按像素尺寸布局
+        self.placeholder = tk.PhotoImage(width=CELL_WIDTH, height=CELL_HEIGHT)
+        self.cells = {}
+        for index, stock in enumerate(self.stocks):
+            self.cells[self.symbol(stock)] = self.create_cell(index, stock)
+        
+        self.refresh()
+    
+    @staticmethod
+    def symbol(stock):
+        return f"{stock['market']}:{stock['code']}"
+    
+    def create_cell(self, index, stock):
+        """创建网格单元：标题 + 迷你图"""
+        frame = tk.Frame(self.window, bg='#2d2d2d')
+        frame.grid(row=1 + index // self.columns, column=index % self.columns, padx=3, pady=3)
+        
+        title = tk.Label(frame, text=f"{stock['name']} ({stock['code']})", font=('Arial', 9),
+                         bg='#2d2d2d', fg='white', anchor='w')
+        title.pack(fill=tk.X)
+        chart = tk.Label(frame, image=self.placeholder, bg='#2d2d2d', borderwidth=0)
+        chart.pack()
+        return title, chart
+    
+    def refresh(self):
+        """后台加载各品种K线，数据到达后请求绘制"""
+        if not self.is_running:
+            return
+        
+        for stock in self.stocks:
+            self.loader.submit(self.load_one, stock)
+        self.refresh_id = self.window.after(self.interval * 1000, self.refresh)
+    
+    def load_one(self, stock):
+        bars = self.api.get_kline_data(stock['code'], stock['market'], days=self.days, swr=True)
+        if bars and self.is_running:
+            self.window.after(0, lambda: self.show(stock, bars))
+    
+    def show(self, stock, bars):
+        """Tk线程：更新标题并请求迷你图（版本未变时直接贴缓存的位图）"""
+        if not self.is_running:
+            return
+        
+        title, chart = self.cells[self.symbol(stock)]
+        first, last = bars[0]['close'], bars[-1]['close']
+        percent = (last / first - 1) * 100 if first else 0
+        color = '#ff4d4f' if percent > 0 else '#52c41a' if percent < 0 else 'white'
+        title.config(text=f"{stock['name']} {last:.2f} {percent:+.2f}%", fg=color)
+        
+        def blit(image):
+            if self.is_running:
+                chart.config(image=image)
+        
+        self.renderer.request(self.symbol(stock), bars, blit)
+        self.status_label.config(
+            text=f"{len(self.stocks)} 个品种，已绘制 {self.renderer.rendered} 次，缓存命中 {self.renderer.cache_hits} 次")
+    
+    def on_destroy(self, event):
+        if event.widget is self.window and self.is_running:
+            self.close()
+    
+    def close(self):
+        if not self.is_running:
+            return
+        self.is_running = False
+        self.loader.shutdown(wait=False, cancel_futures=True)
+        self.renderer.close()
+        try:
+            self.window.after_cancel(self.refresh_id)
+            self.window.destroy()
+        except tk.TclError:
+            pass
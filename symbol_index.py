@@ -0,0 +1,282 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+本地证券代码索引
+从东方财富证券列表批量下载A股、美股、期货代码表，压缩保存在本地，
+支持按代码前缀、名称前缀和拼音首字母进行输入联想（纯内存检索，不访问网络）
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from futures_registry import FUTURES_FS
+
+# 证券列表分段：段名 -> 东方财富市场过滤串
+SEGMENTS = {
+    'a': 'm:1+t:2,m:1+t:23,m:0+t:6,m:0+t:80,m:0+t:81+s:2048,m:1+s:2,m:0+t:5',
+    'us': 'm:105,m:106,m:107',
+    'hf': FUTURES_FS
+}
+
+# 各分段的刷新周期（秒）
+SEGMENT_TTL = 24 * 3600
+
+# GB2312一级汉字按拼音排序，每个字母的起始区位码
+_PINYIN_BOUNDARIES = [
+    (0xB0A1, 'A'), (0xB0C5, 'B'), (0xB2C1, 'C'), (0xB4EE, 'D'), (0xB6EA, 'E'),
+    (0xB7A2, 'F'), (0xB8C1, 'G'), (0xB9FE, 'H'), (0xBBF7, 'J'), (0xBFA6, 'K'),
+    (0xC0AC, 'L'), (0xC2E8, 'M'), (0xC4C3, 'N'), (0xC5B6, 'O'), (0xC5BE, 'P'),
+    (0xC6DA, 'Q'), (0xC8BB, 'R'), (0xC8F6, 'S'), (0xCBFA, 'T'), (0xCDDA, 'W'),
+    (0xCEF4, 'X'), (0xD1B9, 'Y'), (0xD4D1, 'Z')
+]
+_PINYIN_CODES = [b for b, _ in _PINYIN_BOUNDARIES]
+_GB2312_LEVEL1_END = 0xD7F9
+
+# 证券名称中常见的多音字
+_PINYIN_OVERRIDES = {
+    '行': 'H',  # 银行
+    '长': 'C',
+    '乐': 'L'
+}
+
+
+def pinyin_initials(text):
+    """获取字符串的拼音首字母（英文和数字原样保留，无法识别的字符跳过）"""
+    result = []
+    for ch in text:
+        if ch.isascii():
+            if ch.isalnum():
+                result.append(ch.upper())
+            continue
+
+        if ch in _PINYIN_OVERRIDES:
+            result.append(_PINYIN_OVERRIDES[ch])
+            continue
+
+        try:
+            encoded = ch.encode('gb2312')
+        except UnicodeEncodeError:
+            continue
+
+        if len(encoded) != 2:
+            continue
+
+        value = (encoded[0] << 8) | encoded[1]
+        if _PINYIN_CODES[0] <= value <= _GB2312_LEVEL1_END:
+            pos = bisect_left(_PINYIN_CODES, value + 1) - 1
+            result.append(_PINYIN_BOUNDARIES[pos][1])
+
+    return ''.join(result)
+
+
+def market_from_eastmoney(market_id):
+    """东方财富市场ID转换为本程序的市场类型"""
+    market_id = str(market_id)
+    if market_id == '1':
+        return 'sh'
+    if market_id == '0':
+        return 'sz'
+    if market_id in ('105', '106', '107'):
+        return 'us'
+    return 'hf'
+
+
+class _IndexSnapshot:
+    """不可变的索引快照（后台构建完成后整体替换）"""
+
+    def __init__(self, entries):
+        # entries: [(code, name, market, secid, pinyin), ...]
+        self.entries = entries
+        self.code_keys, self.code_ids = self._build(lambda e: e[0].upper())
+        self.pinyin_keys, self.pinyin_ids = self._build(lambda e: e[4])
+        self.name_keys, self.name_ids = self._build(lambda e: e[1])
+        self.by_code = {}
+        for i, entry in enumerate(entries):
+            self.by_code.setdefault((entry[0].upper(), entry[2]), i)
+
+    def _build(self, key_func):
+        """构建有序键数组和对应的条目下标数组"""
+        pairs = sorted((key_func(e), i) for i, e in enumerate(self.entries) if key_func(e))
+        return [k for k, _ in pairs], [i for _, i in pairs]
+
+
+class SymbolIndex:
+    """证券代码索引（前缀 / 拼音首字母检索）"""
+
+    def __init__(self, api, cache_file='symbols.tsv.gz'):
+        self.api = api
+        self.cache_file = cache_file
+
+        # 分段数据：段名 -> [(code, name, market, secid, pinyin), ...]
+        self._segments = {}
+        # 分段更新时间：段名 -> 时间戳
+        self._updated = {}
+
+        self._snapshot = _IndexSnapshot([])
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+        self.load()
+
+    @property
+    def ready(self):
+        """索引中是否已有数据"""
+        return bool(self._snapshot.entries)
+
+    def __len__(self):
+        return len(self._snapshot.entries)
+
+    def load(self):
+        """从本地缓存文件加载索引"""
+        if not os.path.exists(self.cache_file):
+            return
+
+        try:
+            segments = {}
+            with gzip.open(self.cache_file, 'rt', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                for line in f:
+                    parts = line.rstrip('\n').split('\t')
+                    if len(parts) != 6:
+                        continue
+                    segment, code, name, market, secid, pinyin = parts
+                    segments.setdefault(segment, []).append((code, name, market, secid, pinyin))
+
+            with self._lock:
+                self._segments = segments
+                self._updated = header.get('updated', {})
+                self._rebuild()
+        except Exception as e:
+            print(f"加载证券代码索引失败: {e}")
+
+    def save(self):
+        """保存索引到本地缓存文件（gzip压缩的制表符分隔文本）"""
+        with self._lock:
+            segments = dict(self._segments)
+            header = {'version': 1, 'updated': dict(self._updated)}
+
+        tmp_file = self.cache_file + '.tmp'
+        with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(header) + '\n')
+            for segment, entries in segments.items():
+                for entry in entries:
+                    f.write(segment + '\t' + '\t'.join(entry) + '\n')
+        os.replace(tmp_file, self.cache_file)
+
+    def _rebuild(self):
+        """根据分段数据重建索引快照（调用方需持有锁）"""
+        entries = []
+        for segment in sorted(self._segments):
+            entries.extend(self._segments[segment])
+        self._snapshot = _IndexSnapshot(entries)
+
+    def _fetch_segment(self, segment):
+        """下载一个分段的证券列表"""
+        entries = []
+        for row in self.api.get_security_list(SEGMENTS[segment]):
+            code = str(row.get('f12', '')).strip()
+            name = str(row.get('f14', '')).strip()
+            market_id = row.get('f13', '')
+            if not code or not name or code == '-':
+                continue
+
+            market = market_from_eastmoney(market_id)
+            secid = f'{market_id}.{code}'
+            entries.append((code, name, market, secid, pinyin_initials(name)))
+        return entries
+
+    def stale_segments(self, now=None):
+        """返回已过期需要刷新的分段"""
+        now = now or time.time()
+        return [s for s in SEGMENTS if now - self._updated.get(s, 0) >= SEGMENT_TTL]
+
+    def refresh(self, force=False):
+        """增量刷新：只重新下载过期的分段，下载完成后整体替换索引"""
+        segments = list(SEGMENTS) if force else self.stale_segments()
+        changed = False
+
+        for segment in segments:
+            try:
+                entries = self._fetch_segment(segment)
+            except Exception as e:
+                print(f"下载证券列表失败({segment}): {e}")
+                continue
+
+            if not entries:
+                continue
+
+            with self._lock:
+                self._segments[segment] = entries
+                self._updated[segment] = time.time()
+                self._rebuild()
+            changed = True
+
+        if changed:
+            try:
+                self.save()
+            except Exception as e:
+                print(f"保存证券代码索引失败: {e}")
+        return changed
+
+    def refresh_in_background(self, force=False):
+        """在后台线程中刷新索引"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+
+        self._refresh_thread = threading.Thread(target=self.refresh, args=(force,), daemon=True)
+        self._refresh_thread.start()
+
+    def search(self, query, limit=20):
+        """
+        按代码前缀、拼音首字母前缀、名称前缀检索
+        返回: [{'code', 'name', 'market', 'secid'}, ...]
+        """
+        query = query.strip()
+        if not query:
+            return []
+
+        snapshot = self._snapshot
+        upper = query.upper()
+        seen = set()
+        result = []
+
+        for keys, ids, prefix in ((snapshot.code_keys, snapshot.code_ids, upper),
+                                  (snapshot.pinyin_keys, snapshot.pinyin_ids, upper),
+                                  (snapshot.name_keys, snapshot.name_ids, query)):
+            pos = bisect_left(keys, prefix)
+            while pos < len(keys) and len(result) < limit and keys[pos].startswith(prefix):
+                idx = ids[pos]
+                if idx not in seen:
+                    seen.add(idx)
+                    result.append(idx)
+                pos += 1
+
+        return [self._to_dict(snapshot.entries[i]) for i in result]
+
+    def lookup(self, code, market):
+        """精确查找代码，找不到返回None"""
+        snapshot = self._snapshot
+        idx = snapshot.by_code.get((code.strip().upper(), market.lower()))
+        if idx is None:
+            return None
+        return self._to_dict(snapshot.entries[idx])
+
+    @staticmethod
+    def _to_dict(entry):
+        code, name, market, secid, _ = entry
+        return {'code': code, 'name': name, 'market': market, 'secid': secid}
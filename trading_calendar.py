@@ -0,0 +1,345 @@
+# Copyright 2026 Windows Stock Monitor Contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+交易日历
+为各市场预先生成交易时段表（UTC分钟数组），查询是否开市、下次开市时间、交易日内分钟序号均为O(1)：
+按UTC日期预先记录当天第一个未结束的时段，查询时只需检查当天的少数几个时段
+
+- cn：沪深A股，9:30-11:30、13:00-15:00（北京时间），节假日见 CN_HOLIDAYS
+- us：美股，9:30-16:00（美东时间，按夏令时规则换算），NYSE节假日和半日市按规则计算
+- cn_futures：国内期货，日盘 9:00-10:15、10:30-11:30、13:30-15:00，
+  夜盘 21:00-次日2:30（按最晚收盘的品种计算），属于下一个交易日，长假前一晚没有夜盘
+- cme：国际期货，美东时间周日至周五 18:00-次日17:00，每天17:00-18:00休市，
+  美国节假日提前到13:00收盘，耶稣受难日、圣诞节、元旦休市
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# 沪深交易所休市日期（不含周末），每年年底交易所公布下一年的安排后需要补充
+CN_HOLIDAYS = {
+    2024: [('2024-01-01', '2024-01-01'), ('2024-02-09', '2024-02-17'), ('2024-04-04', '2024-04-06'),
+           ('2024-05-01', '2024-05-05'), ('2024-06-10', '2024-06-10'), ('2024-09-15', '2024-09-17'),
+           ('2024-10-01', '2024-10-07')],
+    2025: [('2025-01-01', '2025-01-01'), ('2025-01-28', '2025-02-04'), ('2025-04-04', '2025-04-06'),
+           ('2025-05-01', '2025-05-05'), ('2025-05-31', '2025-06-02'), ('2025-10-01', '2025-10-08')],
+    2026: [('2026-01-01', '2026-01-03'), ('2026-02-15', '2026-02-23'), ('2026-04-04', '2026-04-06'),
+           ('2026-05-01', '2026-05-05'), ('2026-06-19', '2026-06-21'), ('2026-09-25', '2026-09-27'),
+           ('2026-10-01', '2026-10-07')]
+}
+
+# 东方财富期货市场ID -> 日历
+CN_FUTURES_MARKETS = {'113', '114', '115', '142', '220', '225'}
+
+# 时区偏移（分钟）
+CST_OFFSET = 8 * 60
+EST_OFFSET = -5 * 60
+EDT_OFFSET = -4 * 60
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_MINUTES_PER_DAY = 1440
+_FAR_FUTURE = np.iinfo(np.int64).max // 2
+
+
+def _day(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """某月第n个星期几（n为-1表示最后一个），weekday: 周一为0"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """复活节（格里高利历，匿名算法）"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def _observed(day):
+    """美国节假日的调休：周六提前到周五，周日顺延到周一"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def us_holidays(year):
+    """NYSE休市日 -> 节日名称"""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): 'mlk',
+        _nth_weekday(year, 2, 0, 3): 'presidents',
+        _easter(year) - timedelta(days=2): 'good_friday',
+        _nth_weekday(year, 5, 0, -1): 'memorial',
+        _observed(date(year, 7, 4)): 'independence',
+        _nth_weekday(year, 9, 0, 1): 'labor',
+        _nth_weekday(year, 11, 3, 4): 'thanksgiving',
+        _observed(date(year, 12, 25)): 'christmas'
+    }
+    # 元旦是周六时不调休（前一天是上一年的最后一个交易日）
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays[_observed(new_year)] = 'new_year'
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = 'juneteenth'
+    return holidays
+
+
+def us_half_days(year):
+    """NYSE 13:00提前收盘的日期：独立日前一天、感恩节次日、平安夜"""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 5 and day not in us_holidays(year):
+            days.add(day)
+    return days
+
+
+def us_eastern_offset(day):
+    """美东时间相对UTC的偏移（分钟）：3月第二个周日至11月第一个周日为夏令时"""
+    start = _nth_weekday(day.year, 3, 6, 2)
+    end = _nth_weekday(day.year, 11, 6, 1)
+    return EDT_OFFSET if start <= day < end else EST_OFFSET
+
+
+_warned_years = set()
+
+
+def cn_holidays(year):
+    if year not in CN_HOLIDAYS and year not in _warned_years:
+        # 没有休市安排时该年的节假日按交易日处理（休市期间仍会轮询），需要补充 CN_HOLIDAYS
+        _warned_years.add(year)
+        print(f"警告: 没有{year}年的沪深交易所休市安排（CN_HOLIDAYS），该年的节假日将按交易日计算")
+    days = set()
+    for start, end in CN_HOLIDAYS.get(year, []):
+        day = _day(start)
+        while day <= _day(end):
+            days.add(day)
+            day += timedelta(days=1)
+    return days
+
+
+def _weekdays(first_year, last_year):
+    day = date(first_year, 1, 1)
+    while day.year <= last_year:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def cn_sessions(first_year, last_year):
+    """沪深A股：(交易日, [(开始, 结束), ...]，时刻为当地时间距交易日0点的分钟数, 时区偏移)"""
+    holidays = set().union(*(cn_holidays(year) for year in range(first_year, last_year + 1)))
+    for day in _weekdays(first_year, last_year):
+        if day not in holidays:
+            yield day, [(570, 690), (780, 900)], CST_OFFSET
+
+
+def us_sessions(first_year, last_year):
+    """美股常规交易时段"""
+    holidays, half_days = set(), set()
+    for year in range(first_year, last_year + 1):
+        holidays.update(us_holidays(year))
+        half_days.update(us_half_days(year))
+    for day in _weekdays(first_year, last_year):
+        if day not in holidays:
+            yield day, [(570, 780 if day in half_days else 960)], us_eastern_offset(day)
+
+
+def cn_futures_sessions(first_year, last_year):
+    """国内期货：日盘 + 前一个交易日晚上的夜盘（两个交易日之间有休市日时没有夜盘）"""
+    previous = None
+    for day, _, offset in cn_sessions(first_year, last_year):
+        segments = []
+        if previous is not None and ((day - previous).days == 1 or (previous.weekday() == 4 and (day - previous).days == 3)):
+            night = (previous - day).days * _MINUTES_PER_DAY
+            segments.append((night + 1260, night + _MINUTES_PER_DAY + 150))
+        segments.extend([(540, 615), (630, 690), (810, 900)])
+        previous = day
+        yield day, segments, offset
+
+
+def cme_sessions(first_year, last_year):
+    """国际期货（CME Globex）：交易日D为 D-1 18:00 至 D 17:00（美东时间），周一的交易日从周日18:00开始"""
+    holidays = {}
+    for year in range(first_year, last_year + 1):
+        holidays.update(us_holidays(year))
+    for day in _weekdays(first_year, last_year):
+        name = holidays.get(day)
+        if name in ('good_friday', 'christmas', 'new_year'):
+            continue
+        close = 780 if name else 1020
+        yield day, [(-360, close)], us_eastern_offset(day)
+
+
+SESSION_BUILDERS = {
+    'cn': cn_sessions,
+    'us': us_sessions,
+    'cn_futures': cn_futures_sessions,
+    'cme': cme_sessions
+}
+
+
+class TradingCalendar:
+    """
+    预先计算的交易时段表
+    时段按UTC分钟保存在有序数组中：seg_start / seg_end（半开区间）、seg_day（所属交易日）、
+    seg_offset（交易日内此前各时段的分钟数之和）；day_first[i] 为第i个UTC日第一个未结束的时段
+    """
+    
+    def __init__(self, name, first_year, last_year):
+        self.name = name
+        self.first_year = first_year
+        self.last_year = last_year
+        
+        starts, ends, days, offsets, totals = [], [], [], [], {}
+        for day, segments, tz_offset in SESSION_BUILDERS[name](first_year, last_year):
+            midnight = (day.toordinal() - _EPOCH_ORDINAL) * _MINUTES_PER_DAY - tz_offset
+            elapsed = 0
+            for start, end in segments:
+                starts.append(midnight + start)
+                ends.append(midnight + end)
+                days.append(day.toordinal() - _EPOCH_ORDINAL)
+                offsets.append(elapsed)
+                elapsed += end - start
+            totals[days[-1]] = elapsed
+        
+        # 末尾的哨兵时段，查询时不需要判断越界
+        self.seg_start = np.array(starts + [_FAR_FUTURE], dtype=np.int64)
+        self.seg_end = np.array(ends + [_FAR_FUTURE], dtype=np.int64)
+        self.seg_day = np.array(days + [-1], dtype=np.int64)
+        self.seg_offset = np.array(offsets + [0], dtype=np.int64)
+        self.day_minutes = totals
+        
+        self.base_day = (date(first_year, 1, 1).toordinal() - _EPOCH_ORDINAL) - 1
+        last_day = date(last_year + 1, 1, 2).toordinal() - _EPOCH_ORDINAL
+        day_starts = np.arange(self.base_day, last_day + 1, dtype=np.int64) * _MINUTES_PER_DAY
+        self.day_first = np.searchsorted(self.seg_end, day_starts, side='right')
+        
+        # 转为Python列表，单次查询时按下标读取比NumPy标量更快
+        self._start = self.seg_start.tolist()
+        self._end = self.seg_end.tolist()
+        self._day_first = self.day_first.tolist()
+    
+    def _segment(self, minute):
+        """minute之后（含）第一个未结束的时段下标"""
+        day = minute // _MINUTES_PER_DAY - self.base_day
+        if day < 0:
+            return 0
+        if day >= len(self._day_first):
+            return len(self._start) - 1
+        i = self._day_first[day]
+        # 同一UTC日内最多只有几个时段
+        while self._end[i] <= minute:
+            i += 1
+        return i
+    
+    @staticmethod
+    def _minute(t):
+        return int((time.time() if t is None else t) // 60)
+    
+    def is_open(self, t=None):
+        """t（时间戳，默认当前时间）是否在交易时段内"""
+        minute = self._minute(t)
+        return self._start[self._segment(minute)] <= minute
+    
+    def next_open(self, t=None):
+        """下一次开市的时间戳（已开市时返回t本身），超出日历范围返回None"""
+        now = time.time() if t is None else t
+        i = self._segment(self._minute(now))
+        start = self._start[i]
+        if start == _FAR_FUTURE:
+            return None
+        return now if start * 60 <= now else start * 60
+    
+    def last_close(self, t=None):
+        """t之前最近一次收盘（包括午间休市）的时间戳，没有则返回None"""
+        minute = self._minute(t)
+        i = self._segment(minute) - 1
+        return self._end[i] * 60 if i >= 0 else None
+    
+    def has_traded_since(self, timestamp, t=None):
+        """timestamp之后到t之间是否有过交易（用于判断休市期间的缓存是否仍然有效）"""
+        if self.is_open(t):
+            return True
+        closed_at = self.last_close(t)
+        return closed_at is not None and closed_at > timestamp
+    
+    def minute_index(self, t=None):
+        """
+        t在所属交易日内的分钟序号（不计休市时间），第一分钟为0，时段收盘时刻也计入
+        （例如A股 9:30 为0、11:30 为120、13:01 为121、15:00 为240），不在交易时段内返回None
+        """
+        minute = self._minute(t)
+        i = self._segment(minute)
+        if self._start[i] <= minute:
+            return int(self.seg_offset[i]) + minute - self._start[i]
+        if i > 0 and self._end[i - 1] == minute:
+            return int(self.seg_offset[i - 1]) + minute - self._start[i - 1]
+        return None
+    
+    def trading_day(self, t=None):
+        """t所属（休市时为下一个，收盘时刻仍属于当天）交易日，1970-01-01起的天数"""
+        minute = self._minute(t)
+        i = self._segment(minute)
+        if self._start[i] > minute and i > 0 and self._end[i - 1] == minute:
+            i -= 1
+        return int(self.seg_day[i])
+    
+    def session_minutes(self, t=None):
+        """t所属交易日的分钟数（含收盘时刻，A股为241，半日市较少）"""
+        return self.day_minutes.get(self.trading_day(t), 0) + 1
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+
+def get_calendar(name):
+    """
+    取得日历（首次使用时生成去年至明年的时段表，之后复用）
+    进入时段表的最后一年后重新生成，超出时段表后查询结果不再正确（has_traded_since 总是返回False）
+    """
+    with _calendars_lock:
+        calendar = _calendars.get(name)
+        year = date.today().year
+        if calendar is None or year >= calendar.last_year:
+            calendar = _calendars[name] = TradingCalendar(name, year - 1, year + 1)
+        return calendar
+
+
+def calendar_name(market, secid=None):
+    """市场（和东方财富secid，期货需要）对应的日历名称"""
+    market = market.lower()
+    if market in ('sh', 'sz'):
+        return 'cn'
+    if market == 'us':
+        return 'us'
+    if secid and secid.split('.', 1)[0] in CN_FUTURES_MARKETS:
+        return 'cn_futures'
+    return 'cme'